@@ -0,0 +1,75 @@
+"""
+Data behind the main dashboard page, in a fixed number of queries.
+
+Every figure comes from one of these queries, whatever the user's history:
+
+1. today/week/month totals, by conditional aggregation over the daily spend rollup
+2. this month's per-category totals (rollup)
+3. recent expenses with their categories
+4. recent receipts
+5. receipt counts per processing status, in one grouped query
+6. active budgets, resolved by category id in memory
+"""
+from datetime import timedelta
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from expenses import rollups
+from expenses.models import Budget, DailySpend, Expense, Receipt
+
+
+DASHBOARD_QUERY_BUDGET = 6
+
+RECEIPT_STATUSES = ('success', 'failed', 'pending')
+
+
+def period_totals(user, today):
+    """Today, this week and this month totals in one query."""
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+
+    totals = DailySpend.objects.filter(user=user, day__gte=min(week_start, month_start)).aggregate(
+        today=Sum('total', filter=Q(day=today)),
+        week=Sum('total', filter=Q(day__gte=week_start)),
+        month=Sum('total', filter=Q(day__gte=month_start)),
+    )
+    return {period: total or 0 for period, total in totals.items()}
+
+
+def receipt_counts(user):
+    """Total and per-status receipt counts in one grouped query."""
+    counts = dict.fromkeys(RECEIPT_STATUSES, 0)
+    rows = Receipt.objects.filter(user=user).values('processing_status').annotate(count=Count('id')).order_by()
+    for row in rows:
+        counts[row['processing_status']] = row['count']
+    counts['total'] = sum(counts.values())
+    return counts
+
+
+def get_dashboard_metrics(user, today=None, recent_expenses=10, recent_receipts=5):
+    """Everything the dashboard renders, in at most ``DASHBOARD_QUERY_BUDGET`` queries."""
+    today = today or timezone.now().date()
+    totals = period_totals(user, today)
+
+    category_data = rollups.category_totals(user, today.replace(day=1))
+    for item in category_data:
+        item['percentage'] = 0
+        if totals['month']:
+            item['percentage'] = round((float(item['total']) / float(totals['month'])) * 100, 1)
+
+    return {
+        'today_total': totals['today'],
+        'week_total': totals['week'],
+        'month_total': totals['month'],
+        'category_data': category_data,
+        'recent_expenses': list(
+            Expense.objects.filter(user=user, is_deleted=False).select_related('category')[:recent_expenses]
+        ),
+        'recent_receipts': list(Receipt.objects.filter(user=user).order_by('-created_at')[:recent_receipts]),
+        'receipt_counts': receipt_counts(user),
+        'budget_limits': {
+            budget.category_id: float(budget.monthly_limit)
+            for budget in Budget.objects.filter(user=user, is_active=True).only('category_id', 'monthly_limit')
+        },
+    }
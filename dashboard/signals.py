@@ -0,0 +1,36 @@
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from expenses.models import Budget, Category, Expense, Receipt
+from expenses.signals import expenses_bulk_created
+
+from .snapshots import invalidate_user_snapshots
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_delete, sender=Expense)
+@receiver(post_save, sender=Budget)
+@receiver(post_delete, sender=Budget)
+@receiver(post_save, sender=Receipt)
+@receiver(post_delete, sender=Receipt)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_snapshots_on_change(sender, instance, **kwargs):
+    # After commit, so a page rendered mid-transaction can't cache pre-commit data under the new version.
+    transaction.on_commit(partial(invalidate_user_snapshots, instance.user_id))
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_snapshots_on_profile_change(sender, instance, created, **kwargs):
+    # Pages embed the currency symbol and WhatsApp status
+    if not created:
+        transaction.on_commit(partial(invalidate_user_snapshots, instance.pk))
+
+
+@receiver(expenses_bulk_created)
+def invalidate_snapshots_on_bulk_expenses(sender, user_id, **kwargs):
+    invalidate_user_snapshots(user_id)
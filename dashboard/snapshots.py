@@ -0,0 +1,83 @@
+"""
+Per-user cached snapshots of the dashboard, analytics and budget page contexts.
+
+Snapshots are stored in the default cache under ``(page, user, version,
+today)``, where the version is ``User.data_version``. Any write to the user's
+expenses, budgets, receipts, categories or profile bumps that column once its
+transaction commits (see ``dashboard.signals``), in whichever process made the
+write, so the inbound WhatsApp worker invalidates the web process's snapshots
+too. The version arrives with the user row the auth middleware already loads,
+so a page load is a single cache read until something changes. The date in
+the key rolls snapshots over at midnight, and ``DASHBOARD_SNAPSHOT_TTL``
+bounds how long an idle snapshot is kept.
+
+Counters in ``metrics``: ``dashboard.snapshot.hits``/``misses``/
+``invalidations`` and ``dashboard.snapshot.staleness_ms`` (summed age of the
+snapshots served from cache); ``stats()`` derives the hit ratio and mean
+staleness from them across every process.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import F
+from django.utils import timezone
+
+from whatsapp_integration import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+def invalidate_user_snapshots(user_id):
+    """Bump the user's data version so every page recomputes on next load."""
+    if not user_id:
+        return
+    get_user_model().objects.filter(pk=user_id).update(data_version=F('data_version') + 1)
+    metrics.incr('dashboard.snapshot.invalidations')
+
+
+def get_snapshot(user, page, build):
+    """Return ``build(user)`` for ``page``, cached until the user's data changes."""
+    if not getattr(settings, 'DASHBOARD_SNAPSHOT_ENABLED', True):
+        return build(user)
+
+    today = timezone.now().date().isoformat()
+    key = f'dashboard:snapshot:{page}:{user.pk}:{user.data_version}:{today}'
+
+    try:
+        snapshot = cache.get(key)
+    except Exception as e:
+        logger.warning('Dashboard snapshot read failed: %s', e)
+        snapshot = None
+
+    if snapshot is not None:
+        metrics.incr('dashboard.snapshot.hits')
+        metrics.incr('dashboard.snapshot.staleness_ms', int((time.time() - snapshot['built_at']) * 1000))
+        return snapshot['context']
+
+    metrics.incr('dashboard.snapshot.misses')
+    context = build(user)
+    try:
+        cache.set(
+            key,
+            {'built_at': time.time(), 'context': context},
+            getattr(settings, 'DASHBOARD_SNAPSHOT_TTL', 3600),
+        )
+    except Exception as e:
+        logger.warning('Dashboard snapshot write failed: %s', e)
+    return context
+
+
+def stats():
+    """Hit ratio and mean staleness (ms) of the snapshots served by every process."""
+    counters = metrics.snapshot('dashboard.snapshot.')
+    hits = counters.get('dashboard.snapshot.hits', 0)
+    misses = counters.get('dashboard.snapshot.misses', 0)
+    staleness_ms = counters.get('dashboard.snapshot.staleness_ms', 0)
+    return {
+        'dashboard.snapshot.hit_ratio': round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        'dashboard.snapshot.mean_staleness_ms': round(staleness_ms / hits) if hits else 0,
+    }
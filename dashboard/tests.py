@@ -1,3 +1,185 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses.models import Budget, Category, Expense, Receipt
+from users.models import User
+
+from .services import DASHBOARD_QUERY_BUDGET, get_dashboard_metrics
+
+
+class DashboardQueryCountTests(TestCase):
+    """The dashboard must cost a fixed number of queries however much data a user has."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='heavy', password='secret')
+        today = timezone.now().date()
+        categories = [
+            Category.objects.create(user=cls.user, name=f'Category {n}', icon='💰')
+            for n in range(8)
+        ]
+        for n, category in enumerate(categories):
+            Budget.objects.create(user=cls.user, category=category, monthly_limit=Decimal('1000'))
+            for day in range(12):
+                Expense.objects.create(
+                    user=cls.user,
+                    category=category,
+                    amount=Decimal('10.25') + n,
+                    description=f'expense {n}-{day}',
+                    date=today - timedelta(days=day),
+                )
+        for n, status in enumerate(['success', 'success', 'failed', 'pending', 'success']):
+            Receipt.objects.create(user=cls.user, image=f'receipts/{n}.jpg', processing_status=status)
+
+    def test_metrics_stay_within_query_budget(self):
+        with self.assertNumQueries(DASHBOARD_QUERY_BUDGET):
+            metrics = get_dashboard_metrics(self.user)
+
+        self.assertEqual(len(metrics['category_data']), 8)
+        self.assertEqual(
+            metrics['receipt_counts'],
+            {'success': 3, 'failed': 1, 'pending': 1, 'total': 5},
+        )
+        today = timezone.now().date()
+        expected_today = sum(Decimal('10.25') + n for n in range(8))
+        self.assertEqual(metrics['today_total'], expected_today)
+        month_expected = sum(
+            expense.amount
+            for expense in Expense.objects.filter(user=self.user, date__gte=today.replace(day=1))
+        )
+        self.assertEqual(metrics['month_total'], month_expected)
+
+    @override_settings(DASHBOARD_SNAPSHOT_ENABLED=False)
+    def test_dashboard_page_query_count(self):
+        self.client.force_login(self.user)
+        # Session and user lookups on top of the metrics themselves
+        with self.assertNumQueries(DASHBOARD_QUERY_BUDGET + 2):
+            response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(response.status_code, 200)
+
+
+class DashboardSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='snapshot', password='secret')
+        cls.category = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+        Expense.objects.create(user=cls.user, category=cls.category, amount=Decimal('50'), description='lunch')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_repeat_load_is_served_from_snapshot(self):
+        self.client.get(reverse('dashboard:dashboard'))
+        # Only the session and user lookups remain
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(response.context['month_total'], Decimal('50'))
+
+    def test_expense_write_invalidates_snapshot(self):
+        self.client.get(reverse('dashboard:dashboard'))
+        with self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=self.user, category=self.category, amount=Decimal('25'), description='chai')
+
+        response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(response.context['month_total'], Decimal('75'))
+
+    def test_write_from_another_process_invalidates_snapshot(self):
+        self.client.get(reverse('dashboard:dashboard'))
+
+        # The inbound worker runs in its own process with its own cache
+        worker_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker'}}
+        with override_settings(CACHES=worker_cache), self.captureOnCommitCallbacks(execute=True):
+            Expense.objects.create(user=self.user, category=self.category, amount=Decimal('100'), description='rent')
+
+        response = self.client.get(reverse('dashboard:dashboard'))
+        self.assertEqual(response.context['month_total'], Decimal('150'))
+
+
+class LoginOtpTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='otp', password='secret', whatsapp_number='919876543210')
+
+    @mock.patch('dashboard.views.send_text_message_now', return_value=True)
+    def test_otp_sent(self, send):
+        response = self.client.post(reverse('dashboard:login'), {'phone_number': '919876543210'}, follow=True)
+        self.assertTrue(send.called)
+        self.assertContains(response, 'OTP sent to your WhatsApp number.')
+
+    @override_settings(DEBUG=True)
+    @mock.patch('dashboard.views.send_text_message_now', return_value=False)
+    def test_failed_send_shows_otp_in_development(self, send):
+        response = self.client.post(reverse('dashboard:login'), {'phone_number': '919876543210'}, follow=True)
+        self.assertContains(response, 'WhatsApp send failed in development.')
+
+
+class TransactionsLedgerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ledger', password='secret')
+        category = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+        today = timezone.now().date()
+        # Several rows per day so the cursor has to break ties on created_at and id
+        for n in range(45):
+            Expense.objects.create(
+                user=cls.user,
+                category=category,
+                amount=Decimal('10') + n,
+                description=f'expense {n}',
+                date=today - timedelta(days=n // 4),
+            )
+        cls.ordered = list(
+            Expense.objects.filter(user=cls.user)
+            .order_by('-date', '-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _page(self, **params):
+        response = self.client.get(reverse('dashboard:transactions'), params)
+        self.assertEqual(response.status_code, 200)
+        page = response.context['transactions']
+        return [row['id'] for row in page.object_list], page
+
+    def test_cursor_walk_covers_every_row_once(self):
+        seen, sizes = [], []
+        ids, page = self._page()
+        while True:
+            seen.extend(ids)
+            sizes.append(len(ids))
+            if not page.next_cursor:
+                break
+            ids, page = self._page(cursor=page.next_cursor)
+
+        self.assertEqual(seen, self.ordered)
+        self.assertEqual(sizes, [20, 20, 5])
+
+        ids, page = self._page(cursor=page.previous_cursor)
+        self.assertEqual(ids, self.ordered[20:40])
+
+    def test_page_number_falls_back_to_offset_with_cursors(self):
+        ids, page = self._page(page=2)
+        self.assertEqual(ids, self.ordered[20:40])
+
+        self.assertEqual(self._page(cursor=page.previous_cursor)[0], self.ordered[:20])
+        self.assertEqual(self._page(cursor=page.next_cursor)[0], self.ordered[40:])
+
+    def test_invalid_cursor_shows_first_page(self):
+        ids, page = self._page(cursor='not-a-cursor')
+        self.assertEqual(ids, self.ordered[:20])
+        self.assertIsNone(page.previous_cursor)
+        self.assertIsNotNone(page.next_cursor)
+
+    def test_links_keep_the_search_filter(self):
+        response = self.client.get(reverse('dashboard:transactions'), {'q': 'expense'})
+        page = response.context['transactions']
+        self.assertContains(response, f'?q=expense&cursor={page.next_cursor}')
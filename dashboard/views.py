@@ -4,6 +4,7 @@ import os
 import csv
 from datetime import timedelta
 from decimal import Decimal
+from urllib.parse import urlencode
 
 from django.conf import settings
 from django.contrib import messages
@@ -11,24 +12,31 @@ from django.contrib.auth import login, logout
 from django.contrib.auth.decorators import login_required
 from django.core.cache import cache
 from django.core.paginator import Paginator
-from django.db.models import Count, Sum
-from django.db.models.functions import TruncMonth
+from django.db.models import Sum
 from django.http import JsonResponse
 from django.http import HttpResponse
 from django.shortcuts import redirect, render
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
+from expenses import rollups
 from expenses.models import Budget, Category, Expense, Receipt
+from expenses.pagination import InvalidCursor, KeysetPaginator
 from users.models import OTPVerification, User, WhatsAppMapping
 from users.services import generate_otp_for_user, normalize_whatsapp_number, verify_otp_for_user
 from whatsapp_integration.exceptions import AICategoriaztionException, AmountNotFoundException, OCRException
 from whatsapp_integration.receipt_processor import process_receipt
-from whatsapp_integration.whatsapp_service import WhatsAppService
+from whatsapp_integration.outbound_dispatcher import queue_template_message, queue_text_message, send_text_message_now
+
+from .services import get_dashboard_metrics
+from .snapshots import get_snapshot
 
 
 logger = logging.getLogger(__name__)
 
+TRANSACTIONS_PER_PAGE = 20
+
+
 # --- WhatsApp Spend Reminder ---
 @login_required
 def send_spend_reminder(request):
@@ -38,21 +46,20 @@ def send_spend_reminder(request):
         messages.error(request, 'No WhatsApp number linked to your account.')
         return redirect('dashboard:dashboard')
 
-    whatsapp_service = WhatsAppService()
     # Use template message for sandbox, or free-form for production
     if settings.DEBUG:
         message = "Please reply with your expense details via WhatsApp. Example: 120 petrol lunch"
-        result = whatsapp_service.send_message(whatsapp_number, message)
+        result = queue_text_message(whatsapp_number, message)
     else:
         # Replace 'remind_spend' with your approved template name
-        result = whatsapp_service.send_template_message(
+        result = queue_template_message(
             whatsapp_number,
             template_name='remind_spend',
             language_code='en_US'
         )
 
     if result:
-        messages.success(request, f'Reminder sent to {whatsapp_number}!')
+        messages.success(request, f'Reminder queued for {whatsapp_number}, it will arrive on WhatsApp shortly.')
     else:
         messages.error(request, 'Failed to send WhatsApp reminder.')
     return redirect('dashboard:dashboard')
@@ -167,10 +174,8 @@ def user_login(request):
             '— *TechSpark*'
         )
 
-        whatsapp_service = WhatsAppService()
-        send_result = whatsapp_service.send_message(normalized_number, otp_message)
-
-        if send_result:
+        # Sent right away rather than queued so a failure is reported here.
+        if send_text_message_now(normalized_number, otp_message):
             messages.success(request, 'OTP sent to your WhatsApp number.')
         else:
             if settings.DEBUG:
@@ -262,42 +267,27 @@ def user_logout(request):
 @login_required
 def dashboard(request):
     """Main dashboard"""
-    user = request.user
-    today = timezone.now().date()
-    
-    # Date ranges
-    week_start = today - timedelta(days=today.weekday())
-    month_start = today.replace(day=1)
-    
-    # Expenses
-    today_expenses = Expense.objects.filter(user=user, date=today, is_deleted=False)
-    week_expenses = Expense.objects.filter(user=user, date__gte=week_start, is_deleted=False)
-    month_expenses = Expense.objects.filter(user=user, date__gte=month_start, is_deleted=False)
-    
-    # Totals
-    today_total = today_expenses.aggregate(total=Sum('amount'))['total'] or 0
-    week_total = week_expenses.aggregate(total=Sum('amount'))['total'] or 0
-    month_total = month_expenses.aggregate(total=Sum('amount'))['total'] or 0
-    
-    # Category breakdown (monthly)
-    category_data = list(month_expenses.values('category__name', 'category__icon', 'category__color').annotate(
-        total=Sum('amount')
-    ).order_by('-total'))
+    context = get_snapshot(request.user, 'dashboard', _dashboard_context)
+    return render(request, 'dashboard/dashboard.html', context)
 
-    for item in category_data:
-        item['percentage'] = 0
-        if month_total:
-            item['percentage'] = round((float(item['total']) / float(month_total)) * 100, 1)
+
+def _dashboard_context(user):
+    """Dashboard page context (cached per user by ``get_snapshot``)"""
+    today = timezone.now().date()
     
-    # Recent expenses
-    recent_expenses = Expense.objects.filter(user=user, is_deleted=False).select_related('category')[:10]
+    metrics = get_dashboard_metrics(user, today)
+    today_total = metrics['today_total']
+    week_total = metrics['week_total']
+    month_total = metrics['month_total']
+    category_data = metrics['category_data']
+    recent_expenses = metrics['recent_expenses']
 
     # Receipt analytics
-    recent_receipts = Receipt.objects.filter(user=user).order_by('-created_at')[:5]
-    receipt_total = Receipt.objects.filter(user=user).count()
-    receipt_success = Receipt.objects.filter(user=user, processing_status='success').count()
-    receipt_failed = Receipt.objects.filter(user=user, processing_status='failed').count()
-    receipt_pending = Receipt.objects.filter(user=user, processing_status='pending').count()
+    recent_receipts = metrics['recent_receipts']
+    receipt_total = metrics['receipt_counts']['total']
+    receipt_success = metrics['receipt_counts']['success']
+    receipt_failed = metrics['receipt_counts']['failed']
+    receipt_pending = metrics['receipt_counts']['pending']
 
     top_category = category_data[0] if category_data else None
     
@@ -361,19 +351,13 @@ def dashboard(request):
             'icon': icon_map.get(category_name, 'payments'),
         })
 
-    budget_map = {
-        b.category_id: float(b.monthly_limit)
-        for b in Budget.objects.filter(user=user, is_active=True).select_related('category')
-    }
+    budget_map = metrics['budget_limits']
     color_cycle = ['emerald-500', 'cyan-500', 'amber-500', 'rose-500', 'indigo-500']
     category_breakdown = []
     for idx, item in enumerate(category_data[:6]):
         category_name = item.get('category__name') or 'Other'
         spent = float(item.get('total') or 0)
-        limit = budget_map.get(
-            next((c.id for c in Category.objects.filter(user=user, name=category_name)[:1]), None),
-            max(spent * 1.2, spent),
-        )
+        limit = budget_map.get(item['category_id'], max(spent * 1.2, spent))
         percent = round((spent / limit) * 100, 1) if limit else 0
         category_breakdown.append({
             'name': category_name,
@@ -430,38 +414,30 @@ def dashboard(request):
         'active_page': 'dashboard',
     }
     
-    return render(request, 'dashboard/dashboard.html', context)
+    return context
 
 
 @login_required
 def analytics(request):
     """Analytics page with trends and category summaries."""
-    user = request.user
+    context = get_snapshot(request.user, 'analytics', _analytics_context)
+    return render(request, 'dashboard/analytics.html', context)
+
+
+def _analytics_context(user):
+    """Analytics page context (cached per user by ``get_snapshot``)."""
     today = timezone.now().date()
     month_start = today.replace(day=1)
 
-    month_expenses = Expense.objects.filter(user=user, date__gte=month_start, is_deleted=False)
-    month_total = month_expenses.aggregate(total=Sum('amount'))['total'] or 0
-
-    category_data = list(
-        month_expenses
-        .values('category__name', 'category__icon', 'category__color')
-        .annotate(total=Sum('amount'))
-        .order_by('-total')
-    )
+    month_total = rollups.period_total(user, month_start)
+    category_data = rollups.category_totals(user, month_start)
 
     for item in category_data:
         item['percentage'] = 0
         if month_total:
             item['percentage'] = round((float(item['total']) / float(month_total)) * 100, 1)
 
-    trend_qs = (
-        Expense.objects.filter(user=user, is_deleted=False)
-        .annotate(month=TruncMonth('date'))
-        .values('month')
-        .annotate(total=Sum('amount'), count=Count('id'))
-        .order_by('-month')[:6]
-    )
+    trend_qs = rollups.monthly_totals(user, months=6)
 
     monthly_trend = []
     for row in reversed(list(trend_qs)):
@@ -500,11 +476,7 @@ def analytics(request):
 
     top_category_name = category_data[0].get('category__name') if category_data else 'None'
     previous_month_start = (month_start - timedelta(days=1)).replace(day=1)
-    previous_month_total = (
-        Expense.objects.filter(user=user, date__gte=previous_month_start, date__lt=month_start, is_deleted=False)
-        .aggregate(total=Sum('amount'))['total']
-        or 0
-    )
+    previous_month_total = rollups.period_total(user, previous_month_start, month_start - timedelta(days=1))
     trend_pct = 0
     if previous_month_total:
         trend_pct = round(((float(month_total) - float(previous_month_total)) / float(previous_month_total)) * 100, 1)
@@ -557,7 +529,7 @@ def analytics(request):
         'outflow_shifts': outflow_shifts,
         'active_page': 'analytics',
     }
-    return render(request, 'dashboard/analytics.html', context)
+    return context
 
 
 @login_required
@@ -600,7 +572,7 @@ def transactions(request):
     expenses = (
         Expense.objects.filter(user=request.user, is_deleted=False)
         .select_related('category')
-        .order_by('-date', '-created_at')
+        .order_by('-date', '-created_at', '-id')
     )
     q = (request.GET.get('q') or '').strip()
     kind = (request.GET.get('kind') or 'all').lower()
@@ -611,32 +583,32 @@ def transactions(request):
     elif kind == 'expenses':
         expenses = expenses
 
-    tx_rows = []
-    for item in expenses:
-        category_name = item.category.name if item.category else 'Other'
-        tx_rows.append({
-            'id': item.id,
-            'merchant': item.description or category_name,
-            'datetime': f"{item.date.strftime('%d %b %Y')} • {item.created_at.strftime('%I:%M %p')}",
-            'category': category_name,
-            'category_style': 'bg-emerald-100 text-emerald-800',
-            'status': 'Posted',
-            'status_color': 'text-emerald-600',
-            'payment_method': item.source.upper(),
-            'payment_icon': 'account_balance_wallet' if item.source == 'web' else 'chat',
-            'amount': f"{float(item.amount):,.2f}",
-            'is_income': False,
-            'icon': 'payments',
-        })
-
-    paginator = Paginator(tx_rows, 20)
-    page_obj = paginator.get_page(request.GET.get('page'))
+    # Only the visible page is fetched and formatted. ?cursor= (used by the
+    # Previous/Next links) seeks by (date, created_at, id) at any depth, while
+    # ?page=N falls back to LIMIT/OFFSET for direct page numbers.
+    keyset = KeysetPaginator(expenses, TRANSACTIONS_PER_PAGE)
+    page_obj = None
+    if request.GET.get('cursor'):
+        try:
+            page_obj = keyset.page(request.GET['cursor'])
+        except InvalidCursor:
+            page_obj = None
+    if page_obj is None:
+        page_obj = Paginator(expenses, TRANSACTIONS_PER_PAGE).get_page(request.GET.get('page'))
+        rows = list(page_obj.object_list)
+        page_obj.object_list = rows
+        page_obj.next_cursor = keyset.encode_cursor(rows[-1], 'next') if rows and page_obj.has_next() else None
+        page_obj.previous_cursor = keyset.encode_cursor(rows[0], 'previous') if rows and page_obj.has_previous() else None
+
+    page_obj.object_list = [_transaction_row(item) for item in page_obj.object_list]
+    total_outbound = expenses.aggregate(total=Sum('amount'))['total'] or 0
     categories_list = Category.objects.filter(user=request.user, is_active=True).order_by('name')
 
     context = {
         'transactions': page_obj,
+        'ledger_query': urlencode({key: value for key, value in (('q', q), ('kind', request.GET.get('kind'))) if value}),
         'ledger_subtitle': 'Detailed transaction history with source and status.',
-        'total_outbound': f"{sum(float(e.amount) for e in expenses):,.0f}",
+        'total_outbound': f"{total_outbound:,.0f}",
         'expenses': expenses[:100],
         'categories': categories_list,
         'today': timezone.now().date(),
@@ -645,6 +617,24 @@ def transactions(request):
     return render(request, 'dashboard/transactions.html', context)
 
 
+def _transaction_row(item):
+    category_name = item.category.name if item.category else 'Other'
+    return {
+        'id': item.id,
+        'merchant': item.description or category_name,
+        'datetime': f"{item.date.strftime('%d %b %Y')} • {item.created_at.strftime('%I:%M %p')}",
+        'category': category_name,
+        'category_style': 'bg-emerald-100 text-emerald-800',
+        'status': 'Posted',
+        'status_color': 'text-emerald-600',
+        'payment_method': item.source.upper(),
+        'payment_icon': 'account_balance_wallet' if item.source == 'web' else 'chat',
+        'amount': f"{float(item.amount):,.2f}",
+        'is_income': False,
+        'icon': 'payments',
+    }
+
+
 @login_required
 def budget(request):
     """Monthly budget page with category-level limits."""
@@ -683,16 +673,21 @@ def budget(request):
 
         return redirect('dashboard:budget')
 
+    context = get_snapshot(request.user, 'budget', _budget_context)
+    return render(request, 'dashboard/budget.html', context)
+
+
+def _budget_context(user):
+    """Budget page context (cached per user by ``get_snapshot``)."""
     today = timezone.now().date()
     month_start = today.replace(day=1)
-    month_expenses = Expense.objects.filter(user=request.user, date__gte=month_start, is_deleted=False)
     spent_by_category = {
-        row['category']: float(row['total'] or 0)
-        for row in month_expenses.values('category').annotate(total=Sum('amount'))
+        row['category_id']: float(row['total'] or 0)
+        for row in rollups.category_totals(user, month_start)
     }
 
     active_budgets = (
-        Budget.objects.filter(user=request.user, is_active=True)
+        Budget.objects.filter(user=user, is_active=True)
         .select_related('category')
         .order_by('category__name')
     )
@@ -739,7 +734,7 @@ def budget(request):
     total_remaining = max(total_limit - total_spent, 0)
 
     context = {
-        'categories': Category.objects.filter(user=request.user, is_active=True).order_by('name'),
+        'categories': list(Category.objects.filter(user=user, is_active=True).order_by('name')),
         'budget_rows': budget_rows,
         'budgets': budget_cards,
         'current_month': current_month,
@@ -753,7 +748,7 @@ def budget(request):
         'advisor_quote': 'Your fixed spending looks healthy. Consider reducing variable food and transport budgets by <strong>5-8%</strong> to improve quarterly savings.',
         'active_page': 'budgets',
     }
-    return render(request, 'dashboard/budget.html', context)
+    return context
 
 
 @login_required
@@ -859,14 +854,13 @@ def link_whatsapp(request):
         otp = request.user.generate_otp()
         
         # Send OTP via WhatsApp
-        whatsapp_service = WhatsAppService()
         message = f"Your OTP for Expense Tracker verification is: {otp}\n\nThis OTP is valid for 10 minutes."
         
         import logging
         logger = logging.getLogger(__name__)
         logger.info(f"Attempting to send OTP to {whatsapp_number}")
         
-        result = whatsapp_service.send_message(whatsapp_number, message)
+        result = send_text_message_now(whatsapp_number, message)
         
         # For development: Show OTP since test accounts can only send template messages
         if settings.DEBUG:
@@ -142,12 +142,130 @@ WHATSAPP_PHONE_NUMBER_ID = config('WHATSAPP_PHONE_NUMBER_ID', default='')
 WHATSAPP_ACCESS_TOKEN = config('WHATSAPP_ACCESS_TOKEN', default='')
 WHATSAPP_VERIFY_TOKEN = config('WHATSAPP_VERIFY_TOKEN', default='change-this-verify-token')
 
+# Shared Graph API HTTP pool (point WHATSAPP_GRAPH_API_URL at a local stand-in for testing)
+WHATSAPP_GRAPH_API_URL = config('WHATSAPP_GRAPH_API_URL', default='https://graph.facebook.com/v22.0')
+WHATSAPP_HTTP_POOL_SIZE = config('WHATSAPP_HTTP_POOL_SIZE', default=20, cast=int)
+WHATSAPP_HTTP_RETRIES = config('WHATSAPP_HTTP_RETRIES', default=3, cast=int)
+WHATSAPP_HTTP_CONNECT_TIMEOUT = config('WHATSAPP_HTTP_CONNECT_TIMEOUT', default=3.05, cast=float)
+WHATSAPP_HTTP_TIMEOUT = config('WHATSAPP_HTTP_TIMEOUT', default=10, cast=float)
+
+# Inbound webhook queue: deliveries are stored and processed by
+# `python manage.py process_inbound_messages` instead of inline.
+WHATSAPP_INBOUND_QUEUE_ENABLED = config('WHATSAPP_INBOUND_QUEUE_ENABLED', default=True, cast=bool)
+WHATSAPP_INBOUND_WORKERS = config('WHATSAPP_INBOUND_WORKERS', default=4, cast=int)
+WHATSAPP_INBOUND_POOL = config('WHATSAPP_INBOUND_POOL', default='thread')
+WHATSAPP_INBOUND_MAX_ATTEMPTS = config('WHATSAPP_INBOUND_MAX_ATTEMPTS', default=3, cast=int)
+# Seconds before a delivery (and its in-flight message claims) left by a dead worker is retried
+WHATSAPP_INBOUND_VISIBILITY_TIMEOUT = config('WHATSAPP_INBOUND_VISIBILITY_TIMEOUT', default=300, cast=int)
+# Processed deliveries are kept this long (seconds) for debugging, then removed
+# by `python manage.py purge_inbound_messages`.
+WHATSAPP_INBOUND_RETENTION = config('WHATSAPP_INBOUND_RETENTION', default=24 * 60 * 60, cast=int)
+
+# Processed-message ledger used to drop Meta redeliveries (TTL in seconds)
+WHATSAPP_MESSAGE_LEDGER_TTL = config('WHATSAPP_MESSAGE_LEDGER_TTL', default=7 * 24 * 60 * 60, cast=int)
+WHATSAPP_MESSAGE_LEDGER_LRU_SIZE = config('WHATSAPP_MESSAGE_LEDGER_LRU_SIZE', default=10000, cast=int)
+
+# Outbound dispatcher: replies, OTPs and reminders are queued and sent by
+# `python manage.py dispatch_outbound_messages` (rate is per phone number id).
+WHATSAPP_OUTBOUND_QUEUE_ENABLED = config('WHATSAPP_OUTBOUND_QUEUE_ENABLED', default=True, cast=bool)
+WHATSAPP_OUTBOUND_RATE_PER_SECOND = config('WHATSAPP_OUTBOUND_RATE_PER_SECOND', default=20, cast=float)
+WHATSAPP_OUTBOUND_BURST = config('WHATSAPP_OUTBOUND_BURST', default=40, cast=int)
+WHATSAPP_OUTBOUND_MAX_ATTEMPTS = config('WHATSAPP_OUTBOUND_MAX_ATTEMPTS', default=5, cast=int)
+WHATSAPP_OUTBOUND_BACKOFF_BASE = config('WHATSAPP_OUTBOUND_BACKOFF_BASE', default=2, cast=float)
+WHATSAPP_OUTBOUND_BACKOFF_CAP = config('WHATSAPP_OUTBOUND_BACKOFF_CAP', default=300, cast=float)
+# Sent messages are kept this long (seconds), then removed by `python manage.py purge_outbound_messages`
+WHATSAPP_OUTBOUND_RETENTION = config('WHATSAPP_OUTBOUND_RETENTION', default=7 * 24 * 60 * 60, cast=int)
+
+# Read receipts are coalesced per conversation and flushed in the background
+WHATSAPP_READ_RECEIPT_FLUSH_INTERVAL = config('WHATSAPP_READ_RECEIPT_FLUSH_INTERVAL', default=0.5, cast=float)
+
 # Webhook Security
 WEBHOOK_SECRET = config('WEBHOOK_SECRET', default='change-this-webhook-secret-key')
 
 # Gemini API Configuration
 GEMINI_API_KEY = config('GEMINI_API_KEY', default='')
 
+# Cross-user cache of Gemini categorization results (see whatsapp_integration/gemini_cache.py).
+# The in-process LRU sits in front of the shared 'gemini' cache; point
+# GEMINI_CACHE_BACKEND/LOCATION at Redis or memcached to share it across workers.
+GEMINI_CACHE_ENABLED = config('GEMINI_CACHE_ENABLED', default=True, cast=bool)
+GEMINI_CACHE_TTL = config('GEMINI_CACHE_TTL', default=30 * 24 * 60 * 60, cast=int)
+GEMINI_CACHE_LRU_SIZE = config('GEMINI_CACHE_LRU_SIZE', default=5000, cast=int)
+
+# The default cache carries cross-process invalidations (categorization indexes) and
+# the dashboard snapshots; point DEFAULT_CACHE_BACKEND/LOCATION at Redis, memcached or
+# the database cache when running the web and worker processes separately.
+CACHES = {
+    'default': {
+        'BACKEND': config('DEFAULT_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('DEFAULT_CACHE_LOCATION', default=''),
+    },
+    'gemini': {
+        'BACKEND': config('GEMINI_CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('GEMINI_CACHE_LOCATION', default='gemini-results'),
+        'TIMEOUT': GEMINI_CACHE_TTL,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('GEMINI_CACHE_MAX_ENTRIES', default=100000, cast=int),
+        },
+    },
+}
+
+# Concurrent tier 3 misses are collected for GEMINI_BATCH_WINDOW_MS and sent as one prompt
+GEMINI_BATCH_ENABLED = config('GEMINI_BATCH_ENABLED', default=True, cast=bool)
+GEMINI_BATCH_WINDOW_MS = config('GEMINI_BATCH_WINDOW_MS', default=20, cast=int)
+GEMINI_BATCH_MAX_ITEMS = config('GEMINI_BATCH_MAX_ITEMS', default=20, cast=int)
+
+# Quota circuit breaker shared by every Gemini call site; the cooldown comes from the
+# retry delay in the 429 response when present, otherwise doubles from the base.
+GEMINI_BREAKER_BASE_COOLDOWN = config('GEMINI_BREAKER_BASE_COOLDOWN', default=30, cast=int)
+GEMINI_BREAKER_MAX_COOLDOWN = config('GEMINI_BREAKER_MAX_COOLDOWN', default=3600, cast=int)
+
+# Per-user categorization index cached in each process, versioned by
+# User.categorization_version so category/keyword edits from any process invalidate it.
+CATEGORIZATION_INDEX_MAX_AGE = config('CATEGORIZATION_INDEX_MAX_AGE', default=300, cast=int)
+CATEGORIZATION_INDEX_MAX_USERS = config('CATEGORIZATION_INDEX_MAX_USERS', default=1000, cast=int)
+
+# Global keyword -> category table rebuilt nightly by `manage.py build_global_keywords`
+GLOBAL_KEYWORD_MIN_USERS = config('GLOBAL_KEYWORD_MIN_USERS', default=3, cast=int)
+GLOBAL_KEYWORD_MIN_SHARE = config('GLOBAL_KEYWORD_MIN_SHARE', default=0.6, cast=float)
+GLOBAL_KEYWORD_MAX_AGE = config('GLOBAL_KEYWORD_MAX_AGE', default=3600, cast=int)
+
+# Local naive Bayes tier trained on expense descriptions (needs numpy). The global
+# prior is rebuilt by `manage.py train_expense_classifiers`; per-user models train
+# in the background on first use, and new expenses are folded in every
+# EXPENSE_CLASSIFIER_LEARNING_FLUSH_INTERVAL seconds (at once when not deferred).
+EXPENSE_CLASSIFIER_ENABLED = config('EXPENSE_CLASSIFIER_ENABLED', default=True, cast=bool)
+EXPENSE_CLASSIFIER_MIN_CONFIDENCE = config('EXPENSE_CLASSIFIER_MIN_CONFIDENCE', default=0.85, cast=float)
+EXPENSE_CLASSIFIER_PRIOR_STRENGTH = config('EXPENSE_CLASSIFIER_PRIOR_STRENGTH', default=20, cast=int)
+EXPENSE_CLASSIFIER_MAX_EXAMPLES = config('EXPENSE_CLASSIFIER_MAX_EXAMPLES', default=5000, cast=int)
+EXPENSE_CLASSIFIER_MAX_AGE = config('EXPENSE_CLASSIFIER_MAX_AGE', default=600, cast=int)
+EXPENSE_CLASSIFIER_MAX_USERS = config('EXPENSE_CLASSIFIER_MAX_USERS', default=1000, cast=int)
+EXPENSE_CLASSIFIER_LEARNING_DEFERRED = config('EXPENSE_CLASSIFIER_LEARNING_DEFERRED', default=True, cast=bool)
+EXPENSE_CLASSIFIER_LEARNING_FLUSH_INTERVAL = config('EXPENSE_CLASSIFIER_LEARNING_FLUSH_INTERVAL', default=5.0, cast=float)
+
+# Per-message budget for the categorization pipeline: at most this many Gemini
+# requests, and none started once the message has taken this long.
+EXPENSE_PIPELINE_MAX_LLM_CALLS = config('EXPENSE_PIPELINE_MAX_LLM_CALLS', default=2, cast=int)
+EXPENSE_PIPELINE_MAX_LATENCY_MS = config('EXPENSE_PIPELINE_MAX_LATENCY_MS', default=8000, cast=int)
+
+# Keywords learned from AI categorizations: at most this many new words per message,
+# inserted in one statement (or buffered and flushed in the background when deferred).
+EXPENSE_KEYWORD_LEARNING_MAX_PER_MESSAGE = config('EXPENSE_KEYWORD_LEARNING_MAX_PER_MESSAGE', default=5, cast=int)
+EXPENSE_KEYWORD_LEARNING_DEFERRED = config('EXPENSE_KEYWORD_LEARNING_DEFERRED', default=False, cast=bool)
+EXPENSE_KEYWORD_LEARNING_FLUSH_INTERVAL = config('EXPENSE_KEYWORD_LEARNING_FLUSH_INTERVAL', default=5.0, cast=float)
+
+# Minimum similarity (0-1) for the local fuzzy tier to accept a misspelled category word
+EXPENSE_FUZZY_MATCH_THRESHOLD = config('EXPENSE_FUZZY_MATCH_THRESHOLD', default=0.75, cast=float)
+
+# Pipeline counters (fuzzy hits, Gemini calls, ...) are flushed from every process to
+# the shared PipelineCounter table this often (seconds); 0 keeps them per process.
+PIPELINE_METRICS_FLUSH_INTERVAL = config('PIPELINE_METRICS_FLUSH_INTERVAL', default=10, cast=float)
+
+# Per-user snapshots of the dashboard/analytics/budget page data in the default
+# cache, versioned by User.data_version so writes from any process invalidate them.
+DASHBOARD_SNAPSHOT_ENABLED = config('DASHBOARD_SNAPSHOT_ENABLED', default=True, cast=bool)
+DASHBOARD_SNAPSHOT_TTL = config('DASHBOARD_SNAPSHOT_TTL', default=3600, cast=int)
+
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
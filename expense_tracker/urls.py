@@ -21,11 +21,13 @@ from django.conf.urls.static import static
 from rest_framework.routers import DefaultRouter
 from dashboard import views as dashboard_views
 from whatsapp_integration import views as whatsapp_views
+from expenses.serializers_expenses import ExpenseViewSet
 from expenses.serializers_keywords import CategoryKeywordViewSet
 
 # DRF Router for API endpoints
 api_router = DefaultRouter()
 api_router.register(r'category-keywords', CategoryKeywordViewSet, basename='category-keywords')
+api_router.register(r'expenses', ExpenseViewSet, basename='expenses')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Budget, Category, CategoryKeyword, Expense, Receipt
+from .models import Budget, Category, CategoryKeyword, DailySpend, Expense, GlobalKeywordCategory, Receipt
 
 
 @admin.register(Category)
@@ -47,3 +47,16 @@ class CategoryKeywordAdmin(admin.ModelAdmin):
     readonly_fields = ('created_at',)
 
 
+@admin.register(GlobalKeywordCategory)
+class GlobalKeywordCategoryAdmin(admin.ModelAdmin):
+    list_display = ('keyword', 'category_name', 'users', 'share', 'updated_at')
+    search_fields = ('keyword', 'category_name')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(DailySpend)
+class DailySpendAdmin(admin.ModelAdmin):
+    list_display = ('user', 'category', 'day', 'total', 'count')
+    list_filter = ('day',)
+    search_fields = ('user__username', 'category__name')
+    date_hierarchy = 'day'
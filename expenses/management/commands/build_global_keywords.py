@@ -0,0 +1,83 @@
+"""
+Management command to rebuild the global keyword -> category table.
+
+Aggregates every user's CategoryKeyword rows and keeps, for each keyword, the
+category name most users agree on. Run nightly (e.g. from cron).
+
+Usage:
+    python manage.py build_global_keywords
+    python manage.py build_global_keywords --min-users 5 --min-share 0.7
+"""
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from expenses.models import CategoryKeyword, GlobalKeywordCategory
+
+
+class Command(BaseCommand):
+    help = 'Aggregate learned keywords across users into the global keyword table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-users',
+            type=int,
+            default=getattr(settings, 'GLOBAL_KEYWORD_MIN_USERS', 3),
+            help='Minimum number of users that must agree on a mapping',
+        )
+        parser.add_argument(
+            '--min-share',
+            type=float,
+            default=getattr(settings, 'GLOBAL_KEYWORD_MIN_SHARE', 0.6),
+            help='Minimum fraction of users with the keyword that must agree',
+        )
+
+    def handle(self, *args, **options):
+        rows = (
+            CategoryKeyword.objects
+            .filter(category__is_active=True)
+            .values('keyword', 'category__name')
+            .annotate(users=Count('category__user', distinct=True))
+            .order_by()
+        )
+
+        # keyword -> canonical name (lowercase) -> {'users': n, 'names': {display name: n}}
+        votes = defaultdict(lambda: defaultdict(lambda: {'users': 0, 'names': defaultdict(int)}))
+        for row in rows.iterator(chunk_size=5000):
+            keyword = ' '.join((row['keyword'] or '').lower().split())
+            name = (row['category__name'] or '').strip()
+            if not keyword or not name:
+                continue
+            vote = votes[keyword][name.lower()]
+            vote['users'] += row['users']
+            vote['names'][name] += row['users']
+
+        entries = []
+        for keyword, candidates in votes.items():
+            total = sum(vote['users'] for vote in candidates.values())
+            vote = max(candidates.values(), key=lambda vote: vote['users'])
+            share = vote['users'] / total
+            if vote['users'] < options['min_users'] or share < options['min_share']:
+                continue
+            display_name = max(vote['names'].items(), key=lambda item: item[1])[0]
+            entries.append(
+                GlobalKeywordCategory(
+                    keyword=keyword,
+                    category_name=display_name,
+                    users=vote['users'],
+                    share=round(share, 4),
+                )
+            )
+
+        with transaction.atomic():
+            GlobalKeywordCategory.objects.all().delete()
+            GlobalKeywordCategory.objects.bulk_create(entries, batch_size=1000)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Done! {len(entries)} global keyword(s) from {len(votes)} distinct keyword(s)."
+            )
+        )
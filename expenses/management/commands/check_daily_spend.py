@@ -0,0 +1,68 @@
+"""
+Management command to verify the daily spend rollup against the expenses table.
+
+Exits with an error when any (user, category, day) total or count differs;
+``--fix`` rebuilds the affected users.
+
+Usage:
+    python manage.py check_daily_spend
+    python manage.py check_daily_spend --user 42 --fix
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses import rollups
+
+
+class Command(BaseCommand):
+    help = 'Report (and optionally repair) drift between the spend rollup and expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='Only check this user id (repeatable)',
+        )
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Rebuild the rollup for every user with drift',
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=20,
+            help='Maximum number of differences to print',
+        )
+
+    def handle(self, *args, **options):
+        drift = rollups.find_drift(options['users'])
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('✅ Rollup matches expenses.'))
+            return
+
+        for (user_id, category_id, day), expected, actual in drift[:options['show']]:
+            self.stdout.write(
+                f"• user {user_id} category {category_id} {day}: "
+                f"expected {self._describe(expected)}, rollup has {self._describe(actual)}"
+            )
+
+        affected = sorted({user_id for (user_id, _, _), _, _ in drift})
+        if options['fix']:
+            rollups.rebuild(affected)
+            self.stdout.write(
+                self.style.SUCCESS(f"✅ Rebuilt rollup for {len(affected)} user(s) ({len(drift)} row(s) differed).")
+            )
+            return
+
+        raise CommandError(
+            f"{len(drift)} rollup row(s) differ for {len(affected)} user(s); "
+            f"run with --fix or `manage.py rebuild_daily_spend`."
+        )
+
+    def _describe(self, value):
+        if value is None:
+            return 'nothing'
+        total, count = value
+        return f"{total} over {count}"
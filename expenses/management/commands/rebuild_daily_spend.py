@@ -0,0 +1,39 @@
+"""
+Management command to rebuild the daily spend rollup from the expenses table.
+
+Use it to backfill after bulk imports or queryset updates that bypass
+``Expense.save`` (and whenever ``check_daily_spend`` reports drift). Run it
+at a quiet time: expenses written while a rebuild is in progress may need a
+second pass.
+
+Usage:
+    python manage.py rebuild_daily_spend
+    python manage.py rebuild_daily_spend --user 42 --user 43
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from expenses import rollups
+
+
+class Command(BaseCommand):
+    help = 'Recompute the (user, category, day) spend rollup from expenses'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='Only rebuild this user id (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rollups.rebuild(options['users'])
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ Done! Wrote {written} rollup row(s) in {time.perf_counter() - started:.1f}s."
+            )
+        )
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0006_remove_categorykeyword_unique_category_keyword_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GlobalKeywordCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100, unique=True)),
+                ('category_name', models.CharField(max_length=50)),
+                ('users', models.PositiveIntegerField(default=0)),
+                ('share', models.FloatField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Global Keyword Category',
+                'verbose_name_plural': 'Global Keyword Categories',
+                'db_table': 'global_keyword_categories',
+                'ordering': ['keyword'],
+            },
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_daily_spend(apps, schema_editor):
+    Expense = apps.get_model('expenses', 'Expense')
+    DailySpend = apps.get_model('expenses', 'DailySpend')
+
+    rows = (
+        Expense.objects.filter(is_deleted=False)
+        .values('user_id', 'category_id', 'date')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    DailySpend.objects.bulk_create(
+        (
+            DailySpend(
+                user_id=row['user_id'],
+                category_id=row['category_id'],
+                day=row['date'],
+                total=row['total'],
+                count=row['count'],
+            )
+            for row in rows.iterator(chunk_size=5000)
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expenses', '0007_global_keyword_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_spend', to='expenses.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_spend', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Daily Spend',
+                'verbose_name_plural': 'Daily Spend',
+                'db_table': 'daily_spend_rollups',
+                'ordering': ['-day'],
+                'indexes': [models.Index(fields=['user', 'day'], name='daily_spend_user_id_cc8bfd_idx')],
+                'unique_together': {('user', 'category', 'day')},
+            },
+        ),
+        migrations.RunPython(backfill_daily_spend, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,8 @@
-from django.db import models
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 
@@ -58,11 +62,52 @@ class Expense(models.Model):
             models.Index(fields=['user', 'date']),
             models.Index(fields=['user', 'category']),
             models.Index(fields=['is_deleted']),
+            # Keyset pagination order (see expenses.pagination)
+            models.Index(fields=['user', '-date', '-created_at', '-id'], name='expenses_user_keyset_idx'),
         ]
 
     def __str__(self):
         return f"{self.user.currency_symbol}{self.amount} - {self.category.name} ({self.date})"
 
+    def _rollup_key(self):
+        """``(user_id, category_id, day, amount)`` this row adds to the daily rollup, or None"""
+        if self.is_deleted or self.amount is None or self.date is None:
+            return None
+        day = self._meta.get_field('date').to_python(self.date)
+        amount = self._meta.get_field('amount').to_python(self.amount)
+        return (self.user_id, self.category_id, day, amount)
+
+    def _stored_rollup_key(self, using=None):
+        """Rollup key of the row as stored, locked until the transaction ends"""
+        stored = (
+            Expense.objects.using(using)
+            .select_for_update()
+            .filter(pk=self.pk)
+            .values('user_id', 'category_id', 'date', 'amount', 'is_deleted')
+            .first()
+        )
+        if not stored or stored['is_deleted']:
+            return None
+        return (stored['user_id'], stored['category_id'], stored['date'], stored['amount'])
+
+    @staticmethod
+    def _rollup_deltas(old, new):
+        if old == new:
+            return []
+        deltas = []
+        if old:
+            deltas.append((*old[:3], -old[3], -1))
+        if new:
+            deltas.append((*new[:3], new[3], 1))
+        return deltas
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using')
+        with transaction.atomic(using=using):
+            old = None if self._state.adding else self._stored_rollup_key(using)
+            super().save(*args, **kwargs)
+            DailySpend.objects.db_manager(using).apply(self._rollup_deltas(old, self._rollup_key()))
+
     def delete(self, using=None, keep_parents=False):
         """Soft delete implementation"""
         self.is_deleted = True
@@ -71,7 +116,70 @@ class Expense(models.Model):
 
     def hard_delete(self):
         """Permanent deletion"""
-        super().delete()
+        with transaction.atomic():
+            old = self._stored_rollup_key()
+            super().delete()
+            DailySpend.objects.apply(self._rollup_deltas(old, None))
+
+
+class DailySpendManager(models.Manager):
+    def apply(self, deltas):
+        """
+        Add ``(user_id, category_id, day, amount, count)`` deltas to the rollup.
+
+        Must run in the same transaction as the expense write. Rows whose count
+        drops to zero are removed.
+        """
+        merged = defaultdict(lambda: [Decimal('0'), 0])
+        for user_id, category_id, day, amount, count in deltas:
+            entry = merged[(user_id, category_id, day)]
+            entry[0] += amount
+            entry[1] += count
+
+        for (user_id, category_id, day), (amount, count) in merged.items():
+            if not amount and not count:
+                continue
+            rows = self.filter(user_id=user_id, category_id=category_id, day=day)
+            if rows.update(total=F('total') + amount, count=F('count') + count):
+                if count < 0:
+                    rows.filter(count__lte=0).delete()
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(user_id=user_id, category_id=category_id, day=day, total=amount, count=count)
+            except IntegrityError:
+                # Created concurrently by another writer since the update above
+                rows.update(total=F('total') + amount, count=F('count') + count)
+
+
+class DailySpend(models.Model):
+    """
+    Per ``(user, category, day)`` total and count of live (not soft-deleted)
+    expenses, kept in step by ``Expense.save``/``hard_delete`` and
+    ``bulk_record_expenses``. Queryset ``update()``/``delete()`` on expenses
+    bypass it; ``rebuild_daily_spend`` recomputes it from scratch and
+    ``check_daily_spend`` reports drift.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_spend')
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='daily_spend')
+    day = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    objects = DailySpendManager()
+
+    class Meta:
+        db_table = 'daily_spend_rollups'
+        verbose_name = 'Daily Spend'
+        verbose_name_plural = 'Daily Spend'
+        unique_together = ('user', 'category', 'day')
+        ordering = ['-day']
+        indexes = [
+            models.Index(fields=['user', 'day']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.category_id} {self.day}: {self.total} ({self.count})"
 
 
 class Receipt(models.Model):
@@ -129,6 +237,27 @@ class CategoryKeyword(models.Model):
         return f"{self.category.name} → {self.keyword} ({self.added_by})"
 
 
+class GlobalKeywordCategory(models.Model):
+    """
+    Keyword -> category name agreed on across users, rebuilt nightly from
+    every user's ``CategoryKeyword`` rows by ``build_global_keywords``.
+    """
+    keyword = models.CharField(max_length=100, unique=True)
+    category_name = models.CharField(max_length=50)
+    users = models.PositiveIntegerField(default=0)  # users mapping keyword to category_name
+    share = models.FloatField(default=0)  # fraction of users with this keyword who agree
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'global_keyword_categories'
+        verbose_name = 'Global Keyword Category'
+        verbose_name_plural = 'Global Keyword Categories'
+        ordering = ['keyword']
+
+    def __str__(self):
+        return f"{self.keyword} → {self.category_name} ({self.users} users, {self.share:.0%})"
+
+
 class Budget(models.Model):
     """Monthly budget amount mapped to a user category."""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='budgets')
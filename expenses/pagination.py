@@ -0,0 +1,120 @@
+"""
+Keyset (cursor) pagination.
+
+``OFFSET`` pagination makes the database walk past every earlier row, so deep
+pages of a long history get slower the further back they go. A keyset page
+instead continues from the ordering values of the last row it showed::
+
+    WHERE (date, created_at, id) < (:date, :created_at, :id)
+    ORDER BY date DESC, created_at DESC, id DESC LIMIT :n
+
+which an index on the ordering columns answers directly at any depth. The
+ordering must end in a unique field (``id``) so every row has a distinct
+position. Cursors are opaque URL-safe strings encoding that position and the
+direction to read in.
+"""
+import base64
+import json
+
+from django.db.models import Q
+
+
+DEFAULT_ORDERING = ('-date', '-created_at', '-id')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """One page of rows plus the cursors of its neighbours (None at either end)."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """Paginate ``queryset`` by ``ordering`` (field names, ``-`` for descending)."""
+
+    def __init__(self, queryset, per_page, ordering=DEFAULT_ORDERING):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = [name.startswith('-') for name in self.ordering]
+
+    def encode_cursor(self, obj, direction='next'):
+        model_fields = [self.queryset.model._meta.get_field(name) for name in self.fields]
+        values = [field.value_to_string(obj) for field in model_fields]
+        payload = json.dumps({'v': values, 'd': direction}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            values, direction = payload['v'], payload['d']
+            if len(values) != len(self.fields) or direction not in ('next', 'previous'):
+                raise ValueError(cursor)
+            model_fields = [self.queryset.model._meta.get_field(name) for name in self.fields]
+            return [field.to_python(value) for field, value in zip(model_fields, values)], direction
+        except Exception as e:
+            raise InvalidCursor(f'Invalid cursor: {cursor!r}') from e
+
+    def _after(self, values, reverse=False):
+        """Rows strictly after ``values`` in the ordering (before, when ``reverse``)."""
+        condition = Q()
+        for position, (field, descending) in enumerate(zip(self.fields, self.descending)):
+            lookup = 'lt' if descending != reverse else 'gt'
+            term = Q(**{f'{field}__{lookup}': values[position]})
+            for earlier, value in zip(self.fields[:position], values):
+                term &= Q(**{earlier: value})
+            condition |= term
+        return condition
+
+    def page(self, cursor=None):
+        """Fetch one page in a single query; ``cursor`` comes from a previous page."""
+        direction, values = 'next', None
+        if cursor:
+            values, direction = self.decode_cursor(cursor)
+
+        reverse = direction == 'previous'
+        ordering = [
+            name if not reverse else (name[1:] if name.startswith('-') else f'-{name}')
+            for name in self.ordering
+        ]
+        rows = self.queryset.order_by(*ordering)
+        if values is not None:
+            rows = rows.filter(self._after(values, reverse=reverse))
+
+        rows = list(rows[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        if not rows:
+            return KeysetPage([])
+
+        more_after = has_more if not reverse else True
+        more_before = (values is not None) if not reverse else has_more
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if more_after else None,
+            previous_cursor=self.encode_cursor(rows[0], 'previous') if more_before else None,
+        )
@@ -0,0 +1,114 @@
+"""
+Reads and rebuilds of the ``DailySpend`` rollup.
+
+Period totals for statements, the dashboard, analytics and budgets come from
+the pre-aggregated ``(user, category, day)`` rows instead of scanning raw
+expenses: a month is at most ~31 rows per category however many expenses a
+user records.
+"""
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+from .models import DailySpend, Expense
+
+
+def spend_rows(user, start=None, end=None, category=None):
+    """Rollup rows for ``user`` between ``start`` and ``end`` (inclusive)."""
+    rows = DailySpend.objects.filter(user=user)
+    if start is not None:
+        rows = rows.filter(day__gte=start)
+    if end is not None:
+        rows = rows.filter(day__lte=end)
+    if category is not None:
+        rows = rows.filter(category=category)
+    return rows
+
+
+def period_total(user, start=None, end=None):
+    """Exact Decimal total spent in the period (0 when nothing was spent)."""
+    return spend_rows(user, start, end).aggregate(total=Sum('total'))['total'] or 0
+
+
+def category_totals(user, start=None, end=None, category=None):
+    """Per-category ``total``/``count`` for the period, largest total first."""
+    return list(
+        spend_rows(user, start, end, category)
+        .values('category_id', 'category__name', 'category__icon', 'category__color')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by('-total', 'category__name')
+    )
+
+
+def monthly_totals(user, months=6):
+    """``month``/``total``/``count`` for the user's latest ``months`` months, newest first."""
+    return list(
+        DailySpend.objects.filter(user=user)
+        .annotate(month=TruncMonth('day'))
+        .values('month')
+        .annotate(total=Sum('total'), count=Sum('count'))
+        .order_by('-month')[:months]
+    )
+
+
+def expense_aggregates(expenses=None):
+    """What the rollup should contain for ``expenses``, keyed by ``(user_id, category_id, day)``."""
+    if expenses is None:
+        expenses = Expense.objects.all()
+    rows = (
+        expenses.filter(is_deleted=False)
+        .values('user_id', 'category_id', 'date')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    return {
+        (row['user_id'], row['category_id'], row['date']): (row['total'], row['count'])
+        for row in rows.iterator(chunk_size=5000)
+    }
+
+
+def rebuild(user_ids=None, batch_size=1000):
+    """Recompute the rollup from expenses (all users, or only ``user_ids``); returns rows written."""
+    expenses = Expense.objects.all()
+    rollups = DailySpend.objects.all()
+    if user_ids:
+        expenses = expenses.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        expected = expense_aggregates(expenses)
+        rollups.delete()
+        DailySpend.objects.bulk_create(
+            [
+                DailySpend(user_id=user_id, category_id=category_id, day=day, total=total, count=count)
+                for (user_id, category_id, day), (total, count) in expected.items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(expected)
+
+
+def find_drift(user_ids=None):
+    """
+    Compare the rollup against the expenses table.
+
+    Returns ``(key, expected, actual)`` for every ``(user_id, category_id, day)``
+    whose ``(total, count)`` differs; a missing side is ``None``.
+    """
+    expenses = Expense.objects.all()
+    rollups = DailySpend.objects.all()
+    if user_ids:
+        expenses = expenses.filter(user_id__in=user_ids)
+        rollups = rollups.filter(user_id__in=user_ids)
+
+    expected = expense_aggregates(expenses)
+    actual = {
+        (row['user_id'], row['category_id'], row['day']): (row['total'], row['count'])
+        for row in rollups.values('user_id', 'category_id', 'day', 'total', 'count').iterator(chunk_size=5000)
+    }
+
+    drift = []
+    for key in expected.keys() | actual.keys():
+        if expected.get(key) != actual.get(key):
+            drift.append((key, expected.get(key), actual.get(key)))
+    return sorted(drift, key=lambda item: item[0])
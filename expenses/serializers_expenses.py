@@ -0,0 +1,142 @@
+"""
+DRF serializer and viewset for the cursor-paginated expense listing API.
+
+    GET /api/expenses/?page_size=100&fields=id,amount,date,category_name
+    GET /api/expenses/?cursor=<next cursor from the previous response>
+
+Pages are keyset-paginated on ``(-date, -created_at, -id)`` (backed by the
+``expenses_user_keyset_idx`` index), so every page costs the same however far
+back a client scrolls, and rows inserted meanwhile never shift later pages.
+Responses carry an ETag derived from the database (latest ``updated_at`` and
+row count of the user's expenses and their categories), so writes from any
+process, including the inbound WhatsApp worker, change it. A matching
+``If-None-Match`` is answered with 304 after that one aggregate query, without
+fetching a page.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from rest_framework import serializers, status, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Expense
+from .pagination import DEFAULT_ORDERING, InvalidCursor, KeysetPaginator
+
+
+class ExpenseSerializer(serializers.ModelSerializer):
+    """Expense with its category; ``fields`` limits the output to a subset."""
+    category_name = serializers.CharField(source='category.name', read_only=True)
+    category_icon = serializers.CharField(source='category.icon', read_only=True)
+
+    class Meta:
+        model = Expense
+        fields = [
+            'id', 'amount', 'category', 'category_name', 'category_icon',
+            'description', 'date', 'source', 'created_at', 'updated_at',
+        ]
+        read_only_fields = fields
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            unknown = set(fields) - set(self.fields)
+            if unknown:
+                raise ValidationError(
+                    {'fields': f"Unknown field(s): {', '.join(sorted(unknown))}. "
+                               f"Available: {', '.join(self.fields)}"}
+                )
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ExpenseKeysetPagination(BasePagination):
+    """Opaque-cursor pagination over ``(-date, -created_at, -id)``."""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 200
+    ordering = DEFAULT_ORDERING
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(queryset, self.get_page_size(request), ordering=self.ordering)
+        try:
+            self.page = paginator.page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise ValidationError({self.cursor_query_param: 'Invalid cursor.'})
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.previous_cursor),
+            'results': data,
+        })
+
+
+class ExpenseViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Read-only API over the authenticated user's expenses.
+
+    Endpoints:
+    - GET /api/expenses/ - Newest first, cursor paginated
+    - GET /api/expenses/<id>/ - One expense
+    Query parameters: ``cursor``, ``page_size`` (max 200), ``fields`` (comma separated).
+    """
+    serializer_class = ExpenseSerializer
+    pagination_class = ExpenseKeysetPagination
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return (
+            Expense.objects.filter(user=self.request.user, is_deleted=False)
+            .select_related('category')
+            .order_by(*ExpenseKeysetPagination.ordering)
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.request.query_params.get('fields')
+        if fields:
+            kwargs['fields'] = [name.strip() for name in fields.split(',') if name.strip()]
+        return super().get_serializer(*args, **kwargs)
+
+    def _etag(self):
+        # Soft deletes bump updated_at and hard deletes lower the count, so
+        # every write through the models changes this.
+        version = Expense.objects.filter(user=self.request.user).aggregate(
+            count=Count('id'),
+            last_change=Max('updated_at'),
+            last_category_change=Max('category__updated_at'),
+        )
+        validator = (
+            f"{self.request.user.pk}:{version['count']}:{version['last_change']}:"
+            f"{version['last_category_change']}:{self.request.get_full_path()}"
+        )
+        return f'"{hashlib.sha1(validator.encode()).hexdigest()}"'
+
+    def list(self, request, *args, **kwargs):
+        etag = self._etag()
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        response = super().list(request, *args, **kwargs)
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,45 @@
+import logging
+from functools import partial
+
+from django.db import transaction
+
+from .models import DailySpend, Expense
+from .signals import expenses_bulk_created
+
+
+logger = logging.getLogger(__name__)
+
+
+def bulk_record_expenses(user, items, source='whatsapp'):
+    """
+    Insert parsed expense ``items`` for ``user`` in one statement and one transaction.
+
+    Each item needs ``category``, ``amount``, ``description`` and ``date``. Either
+    every row is written or none is, together with the daily spend rollup.
+    ``expenses_bulk_created`` is sent once the transaction commits.
+    """
+    expenses = [
+        Expense(
+            user=user,
+            category=item['category'],
+            amount=item['amount'],
+            description=item['description'],
+            date=item['date'],
+            source=source,
+        )
+        for item in items
+    ]
+    if not expenses:
+        return []
+
+    with transaction.atomic():
+        Expense.objects.bulk_create(expenses)
+        DailySpend.objects.apply(
+            delta for expense in expenses for delta in Expense._rollup_deltas(None, expense._rollup_key())
+        )
+        transaction.on_commit(
+            partial(expenses_bulk_created.send_robust, sender=Expense, user_id=user.pk, expenses=expenses)
+        )
+
+    logger.info('Recorded %d expenses for user %s', len(expenses), user.pk)
+    return expenses
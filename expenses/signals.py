@@ -0,0 +1,6 @@
+from django.dispatch import Signal
+
+
+# Sent after a transaction that bulk-inserted expenses commits (bulk_create sends
+# no post_save). Arguments: ``user_id`` and ``expenses``, the new Expense objects.
+expenses_bulk_created = Signal()
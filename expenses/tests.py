@@ -1,3 +1,181 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from users.models import User
+
+from . import rollups
+from .models import Category, DailySpend, Expense
+from .services import bulk_record_expenses
+
+
+class DailySpendRollupTests(TestCase):
+    """Every expense write path must keep the daily spend rollup in step."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='rollup', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+        cls.travel = Category.objects.create(user=cls.user, name='Travel', icon='🚕')
+        cls.today = timezone.now().date()
+
+    def _expense(self, amount='100.50', category=None, date=None):
+        return Expense.objects.create(
+            user=self.user,
+            category=category or self.food,
+            amount=Decimal(amount),
+            description='lunch',
+            date=date or self.today,
+        )
+
+    def assertNoDrift(self):
+        self.assertEqual(rollups.find_drift(), [])
+
+    def test_create(self):
+        self._expense('100.50')
+        self._expense('20.25')
+        self.assertNoDrift()
+        row = DailySpend.objects.get(user=self.user, category=self.food, day=self.today)
+        self.assertEqual((row.total, row.count), (Decimal('120.75'), 2))
+
+    def test_edit_amount_category_and_date(self):
+        expense = self._expense()
+        expense.amount = Decimal('80')
+        expense.save()
+        self.assertNoDrift()
+
+        expense.category = self.travel
+        expense.date = self.today - timedelta(days=3)
+        expense.save()
+        self.assertNoDrift()
+        self.assertFalse(DailySpend.objects.filter(category=self.food).exists())
+
+    def test_soft_delete_and_restore(self):
+        kept = self._expense('10')
+        expense = self._expense('30')
+        expense.delete()
+        self.assertNoDrift()
+        row = DailySpend.objects.get(user=self.user, category=self.food, day=self.today)
+        self.assertEqual((row.total, row.count), (kept.amount, 1))
+
+        expense.is_deleted = False
+        expense.deleted_at = None
+        expense.save()
+        self.assertNoDrift()
+
+    def test_hard_delete(self):
+        expense = self._expense()
+        expense.hard_delete()
+        self.assertNoDrift()
+        self.assertFalse(DailySpend.objects.exists())
+
+        soft_deleted = self._expense()
+        soft_deleted.delete()
+        soft_deleted.hard_delete()
+        self.assertNoDrift()
+
+    def test_bulk_record(self):
+        self._expense('5')
+        bulk_record_expenses(
+            self.user,
+            [
+                {'category': self.food, 'amount': Decimal('120'), 'description': 'chai', 'date': self.today},
+                {'category': self.travel, 'amount': Decimal('60'), 'description': 'auto', 'date': self.today},
+                {'category': self.travel, 'amount': Decimal('40'), 'description': 'bus', 'date': self.today},
+            ],
+        )
+        self.assertNoDrift()
+        row = DailySpend.objects.get(user=self.user, category=self.travel, day=self.today)
+        self.assertEqual((row.total, row.count), (Decimal('100'), 2))
+
+    def test_rebuild_repairs_drift(self):
+        self._expense()
+        # Queryset updates bypass the rollup
+        Expense.objects.filter(user=self.user).update(amount=Decimal('1'))
+        self.assertNotEqual(rollups.find_drift(), [])
+
+        rollups.rebuild()
+        self.assertNoDrift()
+
+
+class ExpenseApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='api', password='secret')
+        cls.other = User.objects.create_user(username='api-other', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+        today = timezone.now().date()
+        cls.expenses = [
+            Expense.objects.create(
+                user=cls.user,
+                category=cls.food,
+                amount=Decimal(10 + n),
+                description=f'expense {n}',
+                date=today - timedelta(days=n // 2),
+            )
+            for n in range(7)
+        ]
+        cls.url = reverse('expenses-list')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _newest_first(self):
+        return [
+            expense.id
+            for expense in sorted(self.expenses, key=lambda e: (e.date, e.created_at, e.id), reverse=True)
+        ]
+
+    def test_cursor_round_trip(self):
+        seen, url, pages = [], f'{self.url}?page_size=3', []
+        while url:
+            data = self.client.get(url).json()
+            pages.append(data)
+            seen.extend(row['id'] for row in data['results'])
+            url = data['next']
+        self.assertEqual(seen, self._newest_first())
+        self.assertEqual([len(page['results']) for page in pages], [3, 3, 1])
+        self.assertIsNone(pages[0]['previous'])
+
+        back = self.client.get(pages[1]['previous']).json()
+        self.assertEqual(back['results'], pages[0]['results'])
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.client.get(f'{self.url}?cursor=not-a-cursor').status_code, 400)
+
+    def test_sparse_fields(self):
+        data = self.client.get(f'{self.url}?fields=id,amount').json()
+        self.assertEqual(set(data['results'][0]), {'id', 'amount'})
+
+        response = self.client.get(f'{self.url}?fields=id,secret')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json())
+
+    def test_page_size_is_capped(self):
+        Expense.objects.bulk_create(
+            [Expense(user=self.user, category=self.food, amount=Decimal('1'), description='bulk') for _ in range(205)]
+        )
+        data = self.client.get(f'{self.url}?page_size=1000').json()
+        self.assertEqual(len(data['results']), 200)
+        self.assertIsNotNone(data['next'])
+
+    def test_not_modified_until_data_changes(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+
+        revalidated = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+
+        # Written elsewhere (e.g. the inbound worker): no cache or signal reaches this process
+        Expense.objects.create(user=self.user, category=self.food, amount=Decimal('99'), description='from worker')
+        changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
 
-# Create your tests here.
+    def test_etag_is_per_user(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.other)
+        self.assertNotEqual(self.client.get(self.url)['ETag'], etag)
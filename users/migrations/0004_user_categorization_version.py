@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-18 07:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_user_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='categorization_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
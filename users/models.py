@@ -24,6 +24,10 @@ class User(AbstractUser):
     otp_created_at = models.DateTimeField(blank=True, null=True)
     currency = models.CharField(max_length=3, default='INR')
     currency_symbol = models.CharField(max_length=5, default='₹')
+    # Bumped after every write to the user's data; versions the dashboard snapshots
+    data_version = models.PositiveBigIntegerField(default=0, editable=False)
+    # Bumped on every category or keyword write; versions the categorization index
+    categorization_version = models.PositiveBigIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -107,6 +107,34 @@ def get_or_create_whatsapp_user(phone_number):
     return user, True
 
 
+def get_or_create_whatsapp_users(phone_numbers):
+    """
+    Resolve many WhatsApp senders at once.
+
+    Returns a dict of normalized number -> (user, was_created). Already mapped
+    senders are loaded with a single query; only unknown numbers fall back to
+    the per-number auto-create path.
+    """
+    normalized_numbers = {normalize_whatsapp_number(number) for number in phone_numbers}
+    normalized_numbers.discard('')
+    if not normalized_numbers:
+        return {}
+
+    resolved = {
+        mapping.whatsapp_number: (mapping.user, False)
+        for mapping in (
+            WhatsAppMapping.objects
+            .select_related('user')
+            .filter(whatsapp_number__in=normalized_numbers)
+        )
+    }
+
+    for number in sorted(normalized_numbers - resolved.keys()):
+        resolved[number] = get_or_create_whatsapp_user(number)
+
+    return resolved
+
+
 def generate_otp_for_user(user, purpose=OTPVerification.PURPOSE_LOGIN, validity_minutes=10):
     """Create a fresh OTP record and invalidate older pending OTPs for the same purpose."""
     otp = f'{random.randint(0, 999999):06d}'
@@ -1,3 +1,55 @@
 from django.contrib import admin
+from .models import (
+    ExpenseClassifier,
+    InboundMessage,
+    OutboundDeadLetter,
+    OutboundMessage,
+    PipelineCounter,
+    ProcessedMessage,
+)
 
-# Register your models here.
+
+@admin.register(InboundMessage)
+class InboundMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'attempts', 'created_at', 'processed_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('last_error',)
+    readonly_fields = ('created_at', 'updated_at', 'processed_at')
+
+
+@admin.register(ProcessedMessage)
+class ProcessedMessageAdmin(admin.ModelAdmin):
+    list_display = ('message_id', 'claimed_by', 'claimed_at', 'completed_at')
+    search_fields = ('message_id',)
+    readonly_fields = ('created_at',)
+
+
+@admin.register(OutboundMessage)
+class OutboundMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'to_number', 'kind', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'kind', 'created_at')
+    search_fields = ('to_number', 'provider_message_id', 'last_error')
+    readonly_fields = ('created_at', 'updated_at', 'sent_at')
+
+
+@admin.register(OutboundDeadLetter)
+class OutboundDeadLetterAdmin(admin.ModelAdmin):
+    list_display = ('id', 'to_number', 'kind', 'attempts', 'status_code', 'failed_at')
+    list_filter = ('kind', 'status_code', 'failed_at')
+    search_fields = ('to_number', 'last_error')
+    readonly_fields = ('queued_at', 'failed_at')
+
+
+@admin.register(ExpenseClassifier)
+class ExpenseClassifierAdmin(admin.ModelAdmin):
+    list_display = ('key', 'n_examples', 'temperature', 'trained_at', 'updated_at')
+    search_fields = ('key',)
+    exclude = ('counts',)
+    readonly_fields = ('labels', 'vocabulary', 'temperature', 'n_examples', 'trained_at', 'updated_at')
+
+
+@admin.register(PipelineCounter)
+class PipelineCounterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value', 'updated_at')
+    search_fields = ('name',)
+    readonly_fields = ('updated_at',)
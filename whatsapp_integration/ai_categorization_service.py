@@ -2,10 +2,11 @@ import json
 import logging
 import os
 
-import google.genai as genai
 from PIL import Image
 
-from .exceptions import AICategoriaztionException
+from . import gemini_cache
+from .exceptions import AICategoriaztionException, GeminiUnavailableException
+from .gemini_client import generate_content
 
 logger = logging.getLogger(__name__)
 
@@ -79,11 +80,6 @@ def _parse_json_payload(content):
 
 
 
-def _build_client(api_key):
-    """Create and return a Genai API client."""
-    return genai.Client(api_key=api_key)
-
-
 def _normalize_result(parsed):
     """Normalize and validate parsed AI response."""
     amount = parsed.get('amount')
@@ -113,40 +109,49 @@ def categorize_with_ai(text: str, category_names: list = None) -> dict:
         if category_names:
             categories_line = ', '.join([str(name).strip() for name in category_names if str(name).strip()])
 
-        client = _build_client(api_key)
-        response = client.models.generate_content(
-            model='gemini-2.5-flash-lite',
-            contents=[
-                {
-                    'role': 'user',
-                    'parts': [
-                        {
-                            'text': (
-                                'You extract structured expense data from receipts.\n'
-                                f'Available categories: {categories_line}\n'
-                                f'Receipt text: {text}\n'
-                                'Return ONLY valid JSON:\n'
-                                '{\n'
-                                '  "amount": <total amount as number>,\n'
-                                '  "category": "<best match from available categories>",\n'
-                                '  "description": "<merchant name or short description>"\n'
-                                '}'
-                            )
-                        }
-                    ]
-                }
-            ],
-            config={
-                'response_mime_type': 'application/json',
-                'temperature': 0,
-            },
+        def ask_gemini():
+            response = generate_content(
+                api_key,
+                model='gemini-2.5-flash-lite',
+                contents=[
+                    {
+                        'role': 'user',
+                        'parts': [
+                            {
+                                'text': (
+                                    'You extract structured expense data from receipts.\n'
+                                    f'Available categories: {categories_line}\n'
+                                    f'Receipt text: {text}\n'
+                                    'Return ONLY valid JSON:\n'
+                                    '{\n'
+                                    '  "amount": <total amount as number>,\n'
+                                    '  "category": "<best match from available categories>",\n'
+                                    '  "description": "<merchant name or short description>"\n'
+                                    '}'
+                                )
+                            }
+                        ]
+                    }
+                ],
+                config={
+                    'response_mime_type': 'application/json',
+                    'temperature': 0,
+                },
+            )
+
+            content = response.text if hasattr(response, 'text') else ''
+            parsed = _parse_json_payload(content)
+
+            return _normalize_result(parsed)
+
+        return gemini_cache.get_or_compute(
+            gemini_cache.make_key('categorize', text, category_names),
+            ask_gemini,
         )
 
-        content = response.text if hasattr(response, 'text') else ''
-        parsed = _parse_json_payload(content)
-
-        return _normalize_result(parsed)
-
+    except GeminiUnavailableException:
+        logger.info('Gemini circuit open, using keyword fallback')
+        return _keyword_fallback(text)
     except Exception as exc:
         err = str(exc)
         if '429' in err or 'RESOURCE_EXHAUSTED' in err:
@@ -166,7 +171,6 @@ def categorize_from_image_with_gemini(image_path: str) -> dict:
         raise AICategoriaztionException(f'Image file not found: {image_path}')
 
     try:
-        client = _build_client(api_key)
         image = Image.open(image_path)
         
         # Convert PIL image to bytes for the API
@@ -176,7 +180,8 @@ def categorize_from_image_with_gemini(image_path: str) -> dict:
         image_bytes.seek(0)
         image_data = image_bytes.read()
         
-        response = client.models.generate_content(
+        response = generate_content(
+            api_key,
             model='gemini-2.5-flash-lite',
             contents=[
                 {
@@ -212,6 +217,9 @@ def categorize_from_image_with_gemini(image_path: str) -> dict:
 
     except AICategoriaztionException:
         raise
+    except GeminiUnavailableException:
+        logger.info('Gemini circuit open, returning image fallback')
+        return {'amount': 0.0, 'category': 'Other', 'description': 'Image receipt'}
     except Exception as exc:
         err = str(exc)
         if '429' in err or 'RESOURCE_EXHAUSTED' in err:
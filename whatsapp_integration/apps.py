@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class WhatsappIntegrationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'whatsapp_integration'
+
+    def ready(self):
+        from . import signals  # noqa: F401
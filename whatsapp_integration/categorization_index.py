@@ -0,0 +1,153 @@
+"""
+Per-user in-memory categorization index.
+
+Holds a user's active categories and keywords keyed by lowercase text so that
+``ExpenseParser`` can resolve categories without a query per lookup. Indexes
+are cached per process and tagged with ``User.categorization_version``; any
+``Category`` or ``CategoryKeyword`` write bumps that column (see
+``signals.py``), in whichever process made the write, so the inbound worker
+rebuilds after an edit made in the web process. The version arrives with the
+user row the message path already loads, so a warm parse costs no queries.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+
+from expenses.models import Category, CategoryKeyword
+
+
+logger = logging.getLogger(__name__)
+
+
+FUEL_FALLBACK_NAMES = ('fuel', 'transport', 'travel')
+
+
+class CategorizationIndex:
+    """Lowercase lookup tables for one user's active categories and keywords."""
+
+    def __init__(self, categories, keywords, version=None):
+        self.version = version
+        self.categories = list(categories)
+
+        self.by_name = {}
+        for category in self.categories:
+            self.by_name.setdefault(category.name.strip().lower(), category)
+
+        self.by_keyword = {}
+        for keyword, category in keywords:
+            keyword = (keyword or '').strip().lower()
+            if keyword:
+                self.by_keyword.setdefault(keyword, category)
+
+        self.other = self.by_name.get('other')
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def find_category(self, name):
+        """Case-insensitive category name lookup."""
+        return self.by_name.get((name or '').strip().lower())
+
+    def find_keyword(self, word):
+        """Case-insensitive keyword lookup."""
+        return self.by_keyword.get((word or '').strip().lower())
+
+    def fuel_fallback(self):
+        """Best category for fuel spends when the user has no 'Fuel' category."""
+        for name in FUEL_FALLBACK_NAMES:
+            category = self.by_name.get(name)
+            if category:
+                return category
+        return None
+
+    @property
+    def category_names(self):
+        return [category.name for category in self.categories]
+
+    def category_list_display(self):
+        return ', '.join(f"{category.icon} {category.name}" for category in self.categories)
+
+    def derived(self, name, factory):
+        """Memoize a structure computed from this index (rebuilt with the index)."""
+        with self._derived_lock:
+            if name not in self._derived:
+                self._derived[name] = factory(self)
+            return self._derived[name]
+
+
+def invalidate_user_indexes(user_ids):
+    """Bump the users' index versions so every process rebuilds on next use."""
+    user_ids = {user_id for user_id in user_ids if user_id}
+    if not user_ids:
+        return
+    get_user_model().objects.filter(pk__in=user_ids).update(
+        categorization_version=F('categorization_version') + 1,
+    )
+    with _lock:
+        for user_id in user_ids:
+            _indexes.pop(user_id, None)
+
+
+def invalidate_user_index(user_id):
+    """Bump one user's index version (see ``invalidate_user_indexes``)."""
+    invalidate_user_indexes([user_id])
+
+
+def build_index(user, version=None):
+    """Load a user's active categories and keywords into a new index."""
+    categories = list(Category.objects.filter(user=user, is_active=True).order_by('name'))
+    categories_by_id = {category.id: category for category in categories}
+
+    keyword_rows = (
+        CategoryKeyword.objects
+        .filter(category__user=user, category__is_active=True)
+        .order_by('category__name', 'keyword')
+        .values_list('keyword', 'category_id')
+    )
+    keywords = [
+        (keyword, categories_by_id[category_id])
+        for keyword, category_id in keyword_rows
+        if category_id in categories_by_id
+    ]
+
+    return CategorizationIndex(categories, keywords, version=version)
+
+
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def get_categorization_index(user):
+    """Return the cached index for ``user``, rebuilding it if stale."""
+    version = user.categorization_version
+    max_age = getattr(settings, 'CATEGORIZATION_INDEX_MAX_AGE', 300)
+    max_users = getattr(settings, 'CATEGORIZATION_INDEX_MAX_USERS', 1000)
+
+    with _lock:
+        entry = _indexes.get(user.id)
+        if entry:
+            index, built_at = entry
+            if index.version == version and time.monotonic() - built_at < max_age:
+                _indexes.move_to_end(user.id)
+                return index
+
+    index = build_index(user, version=version)
+    logger.debug('Built categorization index for user %s (version %s)', user.id, version)
+
+    with _lock:
+        _indexes[user.id] = (index, time.monotonic())
+        _indexes.move_to_end(user.id)
+        while len(_indexes) > max_users:
+            _indexes.popitem(last=False)
+
+    return index
+
+
+def reset_indexes():
+    """Drop every cached index in this process."""
+    with _lock:
+        _indexes.clear()
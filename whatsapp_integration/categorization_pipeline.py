@@ -0,0 +1,140 @@
+"""
+Single categorization cascade for WhatsApp expense messages.
+
+``CategorizationPipeline.run(text)`` runs ``ExpenseParser`` (multi-expense,
+exact, keyword, fuzzy, global keyword, classifier, Gemini; Gemini natural
+language parsing for free-form messages) and then a local keyword fallback,
+under an explicit per-message budget:
+
+* ``max_llm_calls``: Gemini requests this message may make in total; a cache
+  hit costs nothing.
+* ``max_latency_ms``: no new Gemini request is started once the message has
+  been in the pipeline this long (a request already in flight is not cut off).
+
+The tier that produced the answer is recorded on the outcome and counted in
+``metrics`` as ``pipeline.tier.<name>``. In dry-run mode nothing is written
+(no learned keywords) and Gemini is never called; skipped calls are counted
+instead, so the cascade can be benchmarked locally.
+"""
+import logging
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import metrics
+from .ai_categorization_service import _keyword_fallback
+from .expense_handler import ExpenseParser
+
+
+logger = logging.getLogger(__name__)
+
+
+# Parser errors after which the local keyword fallback is still worth trying
+FALLBACK_ERRORS = ('category_not_found', 'categorization_failed', 'gemini_error', 'gemini_quota_exceeded')
+
+
+class CategorizationBudget:
+    """LLM call and latency allowance for one message."""
+
+    def __init__(self, max_llm_calls=None, max_latency_ms=None, dry_run=False):
+        if max_llm_calls is None:
+            max_llm_calls = getattr(settings, 'EXPENSE_PIPELINE_MAX_LLM_CALLS', 2)
+        if max_latency_ms is None:
+            max_latency_ms = getattr(settings, 'EXPENSE_PIPELINE_MAX_LATENCY_MS', 8000)
+
+        self.max_llm_calls = max_llm_calls
+        self.max_latency_ms = max_latency_ms
+        self.dry_run = dry_run
+        self.started = time.monotonic()
+        self.llm_calls = 0
+        self.skipped_llm_calls = 0
+
+    @property
+    def elapsed_ms(self):
+        return (time.monotonic() - self.started) * 1000
+
+    def charge_llm_call(self):
+        """Reserve one Gemini request; False means the caller must not make it."""
+        if self.dry_run or self.llm_calls >= self.max_llm_calls or self.elapsed_ms >= self.max_latency_ms:
+            self.skipped_llm_calls += 1
+            return False
+        self.llm_calls += 1
+        return True
+
+
+class PipelineOutcome:
+    """Parser result plus how it was reached."""
+
+    def __init__(self, result, tier, budget):
+        self.result = result
+        self.tier = tier
+        self.llm_calls = budget.llm_calls
+        self.skipped_llm_calls = budget.skipped_llm_calls
+        self.elapsed_ms = budget.elapsed_ms
+
+    @property
+    def ok(self):
+        return bool(self.result) and not (isinstance(self.result, dict) and 'error' in self.result)
+
+    def __repr__(self):
+        return (
+            f"PipelineOutcome(tier={self.tier!r}, llm_calls={self.llm_calls}, "
+            f"skipped_llm_calls={self.skipped_llm_calls}, elapsed_ms={self.elapsed_ms:.1f})"
+        )
+
+
+class CategorizationPipeline:
+    """Run every categorization tier for a message, in order, within one budget."""
+
+    def __init__(self, user, max_llm_calls=None, max_latency_ms=None, dry_run=False):
+        self.user = user
+        self.max_llm_calls = max_llm_calls
+        self.max_latency_ms = max_latency_ms
+        self.dry_run = dry_run
+        self.parser = ExpenseParser(user)
+
+    def run(self, text):
+        budget = CategorizationBudget(self.max_llm_calls, self.max_latency_ms, dry_run=self.dry_run)
+        self.parser.budget = budget
+
+        result = self.parser.parse(text)
+        tier = self.parser.last_tier
+
+        if isinstance(result, dict) and result.get('error') in FALLBACK_ERRORS:
+            fallback = self._keyword_fallback(text, allow_other=result['error'] == 'category_not_found')
+            if fallback:
+                result, tier = fallback, 'keyword_fallback'
+
+        outcome = PipelineOutcome(result, tier, budget)
+        metrics.incr(f'pipeline.tier.{tier or "none"}')
+        metrics.incr('pipeline.llm_calls', outcome.llm_calls)
+        if outcome.skipped_llm_calls:
+            metrics.incr('pipeline.skipped_llm_calls', outcome.skipped_llm_calls)
+        logger.info('Categorized message for user %s: %r', self.user.pk, outcome)
+        return outcome
+
+    def _keyword_fallback(self, text, allow_other=True):
+        """Last local tier: generic keyword buckets mapped onto the user's categories."""
+        guess = _keyword_fallback(text)
+        if guess['category'] == 'Other' and not allow_other:
+            # Keep the parser's "AI unavailable" reply rather than silently filing under Other
+            return None
+        category = self.parser.index.find_category(guess['category'])
+        if not category:
+            return None
+
+        try:
+            amount = Decimal(str(guess['amount']))
+        except (InvalidOperation, TypeError, ValueError):
+            return None
+        if amount <= 0:
+            return None
+
+        return {
+            'amount': amount,
+            'category': category,
+            'description': guess['description'][:120],
+            'date': timezone.now().date(),
+        }
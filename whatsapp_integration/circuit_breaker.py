@@ -0,0 +1,134 @@
+"""
+Circuit breaker for upstream quota exhaustion.
+
+Once Gemini answers 429/RESOURCE_EXHAUSTED, every further call in the same
+window is doomed. The breaker opens on a quota error and rejects calls
+without touching the network until the cooldown passes. The cooldown comes
+from the error itself when Gemini includes a retry delay; otherwise it
+doubles on each consecutive trip. After the cooldown one probe call is let
+through (half-open): success closes the breaker, another quota error opens
+it again.
+"""
+import logging
+import re
+import threading
+import time
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+_RETRY_DELAY_PATTERNS = (
+    re.compile(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", re.IGNORECASE),
+    re.compile(r'retry in (\d+(?:\.\d+)?)\s*s', re.IGNORECASE),
+    re.compile(r'retry[- ]after[\'"]?\s*[:=]?\s*[\'"]?(\d+(?:\.\d+)?)', re.IGNORECASE),
+)
+
+
+def is_quota_error(exc):
+    """True for rate-limit / quota errors (HTTP 429, RESOURCE_EXHAUSTED)."""
+    if getattr(exc, 'code', None) == 429 or getattr(exc, 'status_code', None) == 429:
+        return True
+    text = str(exc).lower()
+    return '429' in text or 'resource_exhausted' in text or 'quota' in text
+
+
+def parse_retry_delay(exc):
+    """Seconds the upstream asked us to wait, or None if the error does not say."""
+    text = str(exc)
+    for pattern in _RETRY_DELAY_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+class CircuitBreaker:
+    """Thread-safe closed / open / half-open breaker tripped by quota errors."""
+
+    def __init__(self, name, base_cooldown=30, max_cooldown=3600):
+        self.name = name
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self._state = STATE_CLOSED
+        self._open_until = 0.0
+        self._cooldown = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == STATE_OPEN and time.monotonic() >= self._open_until:
+            return STATE_HALF_OPEN
+        return self._state
+
+    def retry_after(self):
+        """Seconds until the next probe is allowed (0 when closed)."""
+        with self._lock:
+            return max(0.0, self._open_until - time.monotonic()) if self._state == STATE_OPEN else 0.0
+
+    def allow(self):
+        """Return True if a call may go out now; False means fall back locally."""
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._state = STATE_HALF_OPEN
+                self._probe_in_flight = True
+                return True
+
+        metrics.incr(f'{self.name}.breaker.rejected')
+        return False
+
+    def record_success(self):
+        with self._lock:
+            if self._state != STATE_CLOSED:
+                logger.info('%s circuit closed', self.name)
+            self._state = STATE_CLOSED
+            self._cooldown = 0.0
+            self._probe_in_flight = False
+
+    def record_failure(self, exc):
+        """Open the breaker on quota errors; other errors only end a probe."""
+        with self._lock:
+            self._probe_in_flight = False
+            if not is_quota_error(exc):
+                if self._state == STATE_HALF_OPEN:
+                    # Upstream answered with something other than a quota
+                    # error, so the quota window has passed.
+                    self._state = STATE_CLOSED
+                    self._cooldown = 0.0
+                return
+
+            cooldown = parse_retry_delay(exc)
+            if cooldown is None:
+                if 'perday' in str(exc).lower().replace('_', ''):
+                    cooldown = self.max_cooldown
+                else:
+                    cooldown = self._cooldown * 2 if self._cooldown else self.base_cooldown
+            cooldown = min(max(cooldown, 1.0), self.max_cooldown)
+
+            self._cooldown = cooldown
+            self._state = STATE_OPEN
+            self._open_until = time.monotonic() + cooldown
+
+        metrics.incr(f'{self.name}.breaker.opened')
+        logger.warning('%s circuit opened for %.0fs after quota error: %s', self.name, cooldown, exc)
+
+    def reset(self):
+        with self._lock:
+            self._state = STATE_CLOSED
+            self._open_until = 0.0
+            self._cooldown = 0.0
+            self._probe_in_flight = False
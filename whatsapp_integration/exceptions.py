@@ -10,5 +10,13 @@ class AICategoriaztionException(Exception):
     """Raised when AI categorization fails."""
 
 
+class GeminiUnavailableException(Exception):
+    """Raised instead of calling Gemini while the quota circuit breaker is open."""
+
+
+class LLMBudgetExceeded(GeminiUnavailableException):
+    """Raised instead of calling Gemini once a message has used up its LLM budget."""
+
+
 # Backwards-compatible alias with the correct spelling.
 AICategorizationException = AICategoriaztionException
\ No newline at end of file
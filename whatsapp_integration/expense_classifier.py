@@ -0,0 +1,526 @@
+"""
+Local naive Bayes tier trained on expense history.
+
+Every saved ``Expense`` is a labelled example (description tokens ->
+category). ``ExpenseParser`` asks this tier before Gemini:
+
+* a per-user multinomial naive Bayes model over the user's own descriptions,
+  labelled by category id, blended with
+* a global model over every user's descriptions, labelled by lowercase
+  category name, used as a prior; its weight shrinks as the user's own
+  history grows (``EXPENSE_CLASSIFIER_PRIOR_STRENGTH`` examples).
+
+Models are persisted compactly in ``ExpenseClassifier`` rows (vocabulary and
+labels as JSON, counts as a compressed NumPy archive), loaded lazily and kept
+in a per-process LRU. Neither training nor learning runs on the message path:
+a user without a model is queued for training and answered by the global prior
+meanwhile, and new expenses (see ``signals.py``) are buffered and folded into
+each user's model in one load/update/save per flush. Both happen in a
+background thread every ``EXPENSE_CLASSIFIER_LEARNING_FLUSH_INTERVAL``
+seconds. Edited and deleted expenses are not unlearned incrementally;
+``train_expense_classifiers`` (run nightly) retrains every model from current
+history and rebuilds the global prior.
+
+Confidence is calibrated with a softmax temperature fitted on leave-one-out
+predictions at training time. NumPy is optional: without it this tier is off.
+"""
+import io
+import logging
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from expenses.models import Expense
+
+from . import metrics
+from .models import ExpenseClassifier
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+
+logger = logging.getLogger(__name__)
+
+
+TOKEN_RE = re.compile(r'[a-z][a-z0-9&]+')
+
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'at', 'by', 'for', 'from', 'in', 'of', 'on', 'or', 'the', 'to', 'with',
+    'ka', 'ki', 'ke', 'aaj', 'kal', 'paid', 'spent', 'rs', 'inr',
+})
+
+
+def tokenize(text):
+    return [token for token in TOKEN_RE.findall(str(text or '').lower()) if token not in STOPWORDS]
+
+
+def available():
+    return np is not None and getattr(settings, 'EXPENSE_CLASSIFIER_ENABLED', True)
+
+
+def _log_softmax(scores):
+    shifted = scores - scores.max(axis=-1, keepdims=True)
+    return shifted - np.log(np.exp(shifted).sum(axis=-1, keepdims=True))
+
+
+class NaiveBayesModel:
+    """Multinomial naive Bayes over token counts with Laplace smoothing."""
+
+    def __init__(self, labels, vocabulary, counts, class_counts, temperature=1.0, alpha=1.0):
+        self.labels = list(labels)
+        self.vocabulary = list(vocabulary)
+        self.label_index = {label: i for i, label in enumerate(self.labels)}
+        self.columns = {token: i for i, token in enumerate(self.vocabulary)}
+        self.counts = np.asarray(counts, dtype=np.float32).reshape(len(self.labels), len(self.vocabulary))
+        self.class_counts = np.asarray(class_counts, dtype=np.float32).reshape(len(self.labels))
+        self.temperature = temperature
+        self.alpha = alpha
+        self._refresh()
+
+    @property
+    def n_examples(self):
+        return int(self.class_counts.sum())
+
+    def _refresh(self):
+        vocabulary_size = max(len(self.vocabulary), 1)
+        token_totals = self.counts.sum(axis=1, keepdims=True)
+        self.log_theta = np.log((self.counts + self.alpha) / (token_totals + self.alpha * vocabulary_size))
+        self.log_prior = np.log((self.class_counts + 1) / (self.class_counts.sum() + len(self.labels)))
+
+    @classmethod
+    def from_examples(cls, examples, max_vocabulary=None):
+        """Fit from ``(tokens, label)`` pairs."""
+        examples = [(tokens, label) for tokens, label in examples if tokens]
+
+        document_frequency = Counter()
+        for tokens, _ in examples:
+            document_frequency.update(set(tokens))
+        vocabulary = [token for token, _ in document_frequency.most_common(max_vocabulary)]
+        columns = {token: i for i, token in enumerate(vocabulary)}
+        labels = sorted({label for _, label in examples}, key=str)
+        label_index = {label: i for i, label in enumerate(labels)}
+
+        rows, cols = [], []
+        example_labels = []
+        for tokens, label in examples:
+            row = label_index[label]
+            example_labels.append(row)
+            for token in tokens:
+                col = columns.get(token)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+
+        counts = np.zeros((len(labels), len(vocabulary)), dtype=np.float32)
+        np.add.at(counts, (np.asarray(rows, dtype=np.intp), np.asarray(cols, dtype=np.intp)), 1)
+        class_counts = np.bincount(np.asarray(example_labels, dtype=np.intp), minlength=len(labels))
+        return cls(labels, vocabulary, counts, class_counts)
+
+    def predict_proba(self, tokens):
+        """Calibrated class probabilities, or None when no token is known."""
+        cols = [self.columns[token] for token in tokens if token in self.columns]
+        if not cols or not self.labels:
+            return None
+        scores = self.log_prior + self.log_theta[:, cols].sum(axis=1)
+        return np.exp(_log_softmax(scores / self.temperature))
+
+    def partial_fit(self, tokens, label):
+        """Add one example in place."""
+        self.partial_fit_many([(tokens, label)])
+
+    def partial_fit_many(self, examples):
+        """Add ``(tokens, label)`` examples in place, refreshing the parameters once."""
+        examples = [(tokens, label) for tokens, label in examples if tokens]
+        if not examples:
+            return
+
+        new_tokens = [
+            token
+            for token in dict.fromkeys(token for tokens, _ in examples for token in tokens)
+            if token not in self.columns
+        ]
+        if new_tokens:
+            for token in new_tokens:
+                self.columns[token] = len(self.vocabulary)
+                self.vocabulary.append(token)
+            self.counts = np.pad(self.counts, ((0, 0), (0, len(new_tokens))))
+
+        new_labels = [label for label in dict.fromkeys(label for _, label in examples) if label not in self.label_index]
+        if new_labels:
+            for label in new_labels:
+                self.label_index[label] = len(self.labels)
+                self.labels.append(label)
+            self.counts = np.pad(self.counts, ((0, len(new_labels)), (0, 0)))
+            self.class_counts = np.append(self.class_counts, np.zeros(len(new_labels), dtype=np.float32))
+
+        for tokens, label in examples:
+            row = self.label_index[label]
+            np.add.at(self.counts[row], [self.columns[token] for token in tokens], 1)
+            self.class_counts[row] += 1
+        self._refresh()
+
+    def fit_temperature(self, examples, max_examples=2000):
+        """
+        Choose the softmax temperature minimising leave-one-out log loss.
+
+        Each example is scored against the counts with itself removed, so the
+        fitted confidence reflects messages the model has not seen.
+        """
+        examples = [(tokens, label) for tokens, label in examples if tokens and label in self.label_index][-max_examples:]
+        if len(examples) < 10 or len(self.labels) < 2:
+            return self.temperature
+
+        vocabulary_size = max(len(self.vocabulary), 1)
+        token_totals = self.counts.sum(axis=1)
+        total_examples = self.class_counts.sum()
+
+        scores = []
+        targets = []
+        for tokens, label in examples:
+            token_counts = Counter(token for token in tokens if token in self.columns)
+            if not token_counts:
+                continue
+            y = self.label_index[label]
+            cols = np.fromiter((self.columns[token] for token in token_counts), dtype=np.intp)
+            weights = np.fromiter(token_counts.values(), dtype=np.float32)
+            length = weights.sum()
+
+            counts = self.counts[:, cols].copy()
+            counts[y] -= weights
+            totals = token_totals.copy()
+            totals[y] -= length
+            class_counts = self.class_counts.copy()
+            class_counts[y] -= 1
+
+            log_theta = np.log((counts + self.alpha) / (totals[:, None] + self.alpha * vocabulary_size))
+            log_prior = np.log((class_counts + 1) / (total_examples - 1 + len(self.labels)))
+            scores.append(log_prior + log_theta @ weights)
+            targets.append(y)
+
+        if len(targets) < 10:
+            return self.temperature
+
+        scores = np.vstack(scores)
+        targets = np.asarray(targets, dtype=np.intp)
+        best_temperature, best_loss = self.temperature, None
+        # Naive Bayes is overconfident already, so only ever soften (T >= 1).
+        for temperature in np.geomspace(1, 25, 40):
+            log_probs = _log_softmax(scores / temperature)
+            loss = -log_probs[np.arange(len(targets)), targets].mean()
+            if best_loss is None or loss < best_loss:
+                best_temperature, best_loss = float(temperature), loss
+
+        self.temperature = best_temperature
+        return best_temperature
+
+    def dumps(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, counts=self.counts, class_counts=self.class_counts)
+        return buffer.getvalue()
+
+    @classmethod
+    def from_record(cls, record):
+        with np.load(io.BytesIO(bytes(record.counts))) as arrays:
+            return cls(
+                record.labels,
+                record.vocabulary,
+                arrays['counts'],
+                arrays['class_counts'],
+                temperature=record.temperature,
+            )
+
+
+def save_model(key, model, user_id=None, trained=False):
+    defaults = {
+        'user_id': user_id,
+        'labels': model.labels,
+        'vocabulary': model.vocabulary,
+        'counts': model.dumps(),
+        'temperature': model.temperature,
+        'n_examples': model.n_examples,
+    }
+    if trained:
+        defaults['trained_at'] = timezone.now()
+    ExpenseClassifier.objects.update_or_create(key=key, defaults=defaults)
+
+
+def _user_examples(user_id):
+    limit = getattr(settings, 'EXPENSE_CLASSIFIER_MAX_EXAMPLES', 5000)
+    rows = (
+        Expense.objects
+        .filter(user_id=user_id, is_deleted=False, category__is_active=True)
+        .exclude(description='')
+        .order_by('-id')
+        .values_list('description', 'category_id')[:limit]
+    )
+    return [(tokenize(description), category_id) for description, category_id in reversed(rows)]
+
+
+def train_user_model(user_id, persist=True):
+    """Fit a user's model from their expense history; None when they have none."""
+    examples = _user_examples(user_id)
+    model = NaiveBayesModel.from_examples(examples)
+    if not model.n_examples:
+        return None
+
+    global_model = get_global_model()
+    if global_model is not None:
+        model.temperature = global_model.temperature
+    model.fit_temperature(examples)
+
+    if persist:
+        save_model(ExpenseClassifier.key_for_user(user_id), model, user_id=user_id, trained=True)
+    _put(ExpenseClassifier.key_for_user(user_id), model)
+    return model
+
+
+def train_global_model(max_examples=None, max_vocabulary=None):
+    """Fit the cross-user prior on recent descriptions from every user."""
+    if max_examples is None:
+        max_examples = getattr(settings, 'EXPENSE_CLASSIFIER_GLOBAL_MAX_EXAMPLES', 200000)
+    if max_vocabulary is None:
+        max_vocabulary = getattr(settings, 'EXPENSE_CLASSIFIER_GLOBAL_VOCABULARY', 20000)
+
+    rows = (
+        Expense.objects
+        .filter(is_deleted=False)
+        .exclude(description='')
+        .order_by('-id')
+        .values_list('description', 'category__name')[:max_examples]
+    )
+    examples = [(tokenize(description), name.strip().lower()) for description, name in rows.iterator(chunk_size=2000)]
+    examples.reverse()
+
+    model = NaiveBayesModel.from_examples(examples, max_vocabulary=max_vocabulary)
+    if not model.n_examples:
+        return None
+    model.fit_temperature(examples)
+    save_model(ExpenseClassifier.GLOBAL_KEY, model, trained=True)
+    _put(ExpenseClassifier.GLOBAL_KEY, model)
+    return model
+
+
+_models = OrderedDict()
+_lock = threading.Lock()
+_MISSING = object()
+
+
+def _get(key):
+    max_age = getattr(settings, 'EXPENSE_CLASSIFIER_MAX_AGE', 600)
+    with _lock:
+        entry = _models.get(key)
+        if entry is None:
+            return _MISSING
+        model, loaded_at = entry
+        if time.monotonic() - loaded_at >= max_age:
+            del _models[key]
+            return _MISSING
+        _models.move_to_end(key)
+        return model
+
+
+def _put(key, model):
+    max_users = getattr(settings, 'EXPENSE_CLASSIFIER_MAX_USERS', 1000)
+    with _lock:
+        _models[key] = (model, time.monotonic())
+        _models.move_to_end(key)
+        while len(_models) > max_users:
+            _models.popitem(last=False)
+
+
+def _load(key):
+    record = ExpenseClassifier.objects.filter(key=key).first()
+    return NaiveBayesModel.from_record(record) if record else None
+
+
+def reset_models():
+    """Drop every cached model so the next lookup reloads from the database."""
+    with _lock:
+        _models.clear()
+
+
+def get_global_model():
+    model = _get(ExpenseClassifier.GLOBAL_KEY)
+    if model is _MISSING:
+        model = _load(ExpenseClassifier.GLOBAL_KEY)
+        _put(ExpenseClassifier.GLOBAL_KEY, model)
+    return model
+
+
+def get_user_model(user_id, persist=True):
+    """
+    Load a user's model; None when they have none yet.
+
+    A user without a persisted model is queued for background training (unless
+    ``persist`` is off), so the first message never pays for it.
+    """
+    key = ExpenseClassifier.key_for_user(user_id)
+    model = _get(key)
+    if model is _MISSING:
+        model = _load(key)
+        if model is None and persist:
+            learning_buffer.schedule_training(user_id)
+        _put(key, model)
+    return model
+
+
+def classify(user, index, text, persist=True):
+    """
+    Return ``(category, confidence)`` for ``text`` among the user's active
+    categories, or None when neither model knows any of its tokens.
+    """
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+
+    user_model = get_user_model(user.id, persist=persist)
+    global_model = get_global_model()
+    user_probs = user_model.predict_proba(tokens) if user_model is not None else None
+    global_probs = global_model.predict_proba(tokens) if global_model is not None else None
+    if user_probs is None and global_probs is None:
+        return None
+
+    if global_probs is None:
+        user_weight = 1.0
+    elif user_probs is None:
+        user_weight = 0.0
+    else:
+        strength = getattr(settings, 'EXPENSE_CLASSIFIER_PRIOR_STRENGTH', 20)
+        user_weight = user_model.n_examples / (user_model.n_examples + strength)
+
+    # Not renormalised over the user's categories: mass the models put on
+    # categories this user lacks lowers confidence instead of inflating it.
+    best, best_probability = None, 0.0
+    for category in index.categories:
+        probability = 0.0
+        if user_probs is not None:
+            row = user_model.label_index.get(category.id)
+            if row is not None:
+                probability += user_weight * float(user_probs[row])
+        if global_probs is not None:
+            row = global_model.label_index.get(category.name.strip().lower())
+            if row is not None:
+                probability += (1 - user_weight) * float(global_probs[row])
+        if probability > best_probability:
+            best, best_probability = category, probability
+
+    if best is None:
+        return None
+    return best, best_probability
+
+
+def apply_examples(user_id, examples):
+    """Fold ``(category_id, tokens)`` examples into the user's persisted model in one save."""
+    key = ExpenseClassifier.key_for_user(user_id)
+    with transaction.atomic():
+        record = ExpenseClassifier.objects.select_for_update().filter(key=key).first()
+        if record is None:
+            # Trained from full history (including these expenses) on first use.
+            return 0
+        model = NaiveBayesModel.from_record(record)
+        model.partial_fit_many([(tokens, category_id) for category_id, tokens in examples])
+        save_model(key, model, user_id=user_id)
+    _put(key, model)
+    metrics.incr('classifier.incremental_updates', len(examples))
+    return len(examples)
+
+
+class ClassifierLearningBuffer:
+    """Collect new examples and untrained users, and apply them in the background."""
+
+    def __init__(self, flush_interval=5.0):
+        self.flush_interval = flush_interval
+        self._examples = defaultdict(list)
+        self._untrained = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, user_id, examples):
+        with self._lock:
+            self._examples[user_id].extend(examples)
+            self._ensure_thread()
+
+    def schedule_training(self, user_id):
+        with self._lock:
+            self._untrained.add(user_id)
+            self._ensure_thread()
+
+    def flush(self):
+        """Train queued users and apply buffered examples; returns the users updated."""
+        with self._lock:
+            examples, self._examples = self._examples, defaultdict(list)
+            untrained, self._untrained = self._untrained, set()
+
+        updated = 0
+        for user_id in untrained:
+            # Training reads the full history, buffered examples included.
+            examples.pop(user_id, None)
+            try:
+                if ExpenseClassifier.objects.filter(key=ExpenseClassifier.key_for_user(user_id)).exists():
+                    # Trained meanwhile by another process: reload it on next use.
+                    with _lock:
+                        _models.pop(ExpenseClassifier.key_for_user(user_id), None)
+                elif train_user_model(user_id) is not None:
+                    metrics.incr('classifier.background_trainings')
+                updated += 1
+            except Exception:
+                logger.exception('Expense classifier training failed for user %s', user_id)
+
+        for user_id, user_examples in examples.items():
+            try:
+                if apply_examples(user_id, user_examples):
+                    updated += 1
+            except Exception:
+                logger.exception('Expense classifier update failed for user %s', user_id)
+        return updated
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='classifier-learning', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+learning_buffer = ClassifierLearningBuffer(
+    flush_interval=getattr(settings, 'EXPENSE_CLASSIFIER_LEARNING_FLUSH_INTERVAL', 5.0),
+)
+
+
+def learn_expense(user_id, category_id, description):
+    """Fold one new expense into the user's persisted model."""
+    learn_expenses(user_id, [(category_id, description)])
+
+
+def learn_expenses(user_id, examples):
+    """
+    Fold new ``(category_id, description)`` expenses into the user's model.
+
+    Buffered and applied in the background when
+    ``EXPENSE_CLASSIFIER_LEARNING_DEFERRED`` is on (the default).
+    """
+    if not available():
+        return
+    examples = [(category_id, tokenize(description)) for category_id, description in examples]
+    examples = [(category_id, tokens) for category_id, tokens in examples if tokens]
+    if not examples:
+        return
+
+    if getattr(settings, 'EXPENSE_CLASSIFIER_LEARNING_DEFERRED', True):
+        learning_buffer.add(user_id, examples)
+    else:
+        apply_examples(user_id, examples)
@@ -5,13 +5,32 @@ from decimal import Decimal
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.utils import timezone
-from expenses.models import Category, CategoryKeyword, Expense
+from expenses import rollups
+from expenses.models import Category
 from users.models import OTPVerification
 from users.services import generate_otp_for_user
 
+from .categorization_index import get_categorization_index
+from . import expense_classifier, gemini_cache, keyword_learning, metrics
+from .fuzzy_matcher import FuzzyIndex
+from .gemini_batcher import get_batcher
+from .exceptions import GeminiUnavailableException, LLMBudgetExceeded
+from .gemini_client import ensure_available, generate_content
+from .global_keywords import get_table as get_global_keyword_table
+from .keyword_matcher import KeywordAutomaton
+
 logger = logging.getLogger(__name__)
 
 
+# Built-in vocabulary known for every user, on top of their learned keywords
+BUILTIN_KEYWORDS = {
+    'Food': ['food', 'burger', 'pizza', 'chicken', 'zomato', 'swiggy'],
+    'Fuel': ['petrol', 'fuel', 'diesel'],
+    'Travel': ['uber', 'auto', 'taxi', 'bus', 'train'],
+    'Shopping': ['amazon', 'flipkart', 'shopping', 'clothes'],
+}
+
+
 def parse_receipt_image(image_path: str, user):
     from .receipt_processor import parse_receipt_image as _parse_receipt_image
 
@@ -26,19 +45,32 @@ def process_receipt_image(image_path: str, user):
 
 class ExpenseParser:
     """
-    Parse natural language expense messages from WhatsApp using a 3-tier
+    Parse natural language expense messages from WhatsApp using a tiered
     cascading category resolution system:
     
     Tier 1: Exact Match - Direct category name match (case-insensitive)
     Tier 2: Keyword Map - Match against category keywords database
+    Fuzzy:  Local typo-tolerant match against category names and keywords
+    Global: Keyword -> category table aggregated across all users
+    Classifier: Local naive Bayes over the user's expense history
     Tier 3: Gemini Fallback - Use Gemini 2.5 Flash-Lite to categorize,
                               then auto-save the keyword
     """
     
-    def __init__(self, user):
+    def __init__(self, user, budget=None):
         self.user = user
         self.currency_symbol = user.currency_symbol
         self.gemini_key = settings.GEMINI_API_KEY if hasattr(settings, 'GEMINI_API_KEY') else None
+        self.budget = budget
+        self.last_tier = None
+        self._index = None
+
+    @property
+    def index(self):
+        """Cached per-user category/keyword index (no queries once warm)."""
+        if self._index is None:
+            self._index = get_categorization_index(self.user)
+        return self._index
     
     def parse(self, message):
         """
@@ -52,34 +84,20 @@ class ExpenseParser:
         Or error dict with keys: error, message
         """
         message = message.strip()
+        self.last_tier = None
 
         multi_results = self._preprocess_multi_expense(message)
         if multi_results:
             normalized_results = []
             for item in multi_results:
                 category_name = item.get('category_name', '')
-                category = Category.objects.filter(
-                    user=self.user,
-                    name__iexact=category_name,
-                    is_active=True
-                ).first()
+                category = self.index.find_category(category_name)
 
                 if not category and category_name.lower() == 'fuel':
-                    for fallback_name in ('Fuel', 'Transport', 'Travel'):
-                        category = Category.objects.filter(
-                            user=self.user,
-                            name__iexact=fallback_name,
-                            is_active=True
-                        ).first()
-                        if category:
-                            break
+                    category = self.index.fuel_fallback()
 
                 if not category:
-                    category = Category.objects.filter(
-                        user=self.user,
-                        name__iexact='Other',
-                        is_active=True
-                    ).first()
+                    category = self.index.other
 
                 if not category:
                     continue
@@ -94,6 +112,7 @@ class ExpenseParser:
                 )
 
             if normalized_results:
+                self.last_tier = 'multi_expense'
                 return normalized_results
         
         # Pattern: number followed by category name
@@ -111,6 +130,7 @@ class ExpenseParser:
         category = self._tier1_exact_match(category_word)
         if category:
             logger.info(f"[Tier 1] Exact Match hit for '{category_word}' -> {category.name}")
+            self.last_tier = 'exact'
             return {
                 'amount': amount,
                 'category': category,
@@ -122,6 +142,40 @@ class ExpenseParser:
         category = self._tier2_keyword_match(category_word)
         if category:
             logger.info(f"[Tier 2] Keyword Match hit for '{category_word}' -> {category.name}")
+            self.last_tier = 'keyword'
+            return {
+                'amount': amount,
+                'category': category,
+                'description': description.strip(),
+                'date': timezone.now().date()
+            }
+        
+        # ===== FUZZY MATCH (local, before any network call) =====
+        category = self._fuzzy_match(category_word)
+        if category:
+            self.last_tier = 'fuzzy'
+            return {
+                'amount': amount,
+                'category': category,
+                'description': description.strip(),
+                'date': timezone.now().date()
+            }
+
+        # ===== GLOBAL KEYWORDS (learned across all users) =====
+        category = self._global_keyword_match(category_word, description)
+        if category:
+            self.last_tier = 'global_keyword'
+            return {
+                'amount': amount,
+                'category': category,
+                'description': description.strip(),
+                'date': timezone.now().date()
+            }
+
+        # ===== LOCAL CLASSIFIER (expense history, before any network call) =====
+        category = self._classifier_match(f"{category_word} {description}")
+        if category:
+            self.last_tier = 'classifier'
             return {
                 'amount': amount,
                 'category': category,
@@ -131,9 +185,11 @@ class ExpenseParser:
         
         # ===== TIER 3: GEMINI FALLBACK =====
         if self.gemini_key:
+            metrics.incr('parser.tier3.calls')
             result = self._tier3_gemini_fallback(amount_str, category_word, description)
             if result.get('category'):
                 logger.info(f"[Tier 3] Gemini hit for '{category_word}' -> {result['category'].name}")
+                self.last_tier = 'gemini'
                 return result
             elif result.get('error'):
                 # Gemini failed, return error
@@ -153,26 +209,20 @@ class ExpenseParser:
             'ka', 'ke', 'ki', 'for', 'and', 'with', 'on', 'at', 'to', 'a', 'an', 'the',
             'of', 'in', 'my', 'is', 'was', 'am', 'are',
         }
-        keywords = {
-            'Food': ['food', 'burger', 'pizza', 'chicken', 'zomato', 'swiggy'],
-            'Fuel': ['petrol', 'fuel', 'diesel'],
-            'Travel': ['uber', 'auto', 'taxi', 'bus', 'train'],
-            'Shopping': ['amazon', 'flipkart', 'shopping', 'clothes'],
-        }
 
-        keyword_to_category = {}
-        for category_name, category_keywords in keywords.items():
-            for keyword in category_keywords:
-                keyword_to_category[keyword] = category_name
+        def build_automaton(index):
+            keyword_to_category = {}
+            for category_name, category_keywords in BUILTIN_KEYWORDS.items():
+                for keyword in category_keywords:
+                    keyword_to_category[keyword] = category_name
+
+            for kw, category in index.by_keyword.items():
+                if len(kw) >= 3 and kw not in filler_words:
+                    keyword_to_category[kw] = category.name
+            return KeywordAutomaton(keyword_to_category)
 
-        learned_keyword_mappings = CategoryKeyword.objects.select_related('category').filter(
-            category__user=self.user,
-            category__is_active=True,
-        )
-        for mapping in learned_keyword_mappings:
-            kw = (mapping.keyword or '').strip().lower()
-            if kw and len(kw) >= 3 and kw not in filler_words:
-                keyword_to_category[kw] = mapping.category.name
+        # Compiled once per index version and shared across messages.
+        automaton = self.index.derived('multi_expense_automaton', build_automaton)
 
         normalized_message = message.lower()
         punctuation_map = str.maketrans({
@@ -188,12 +238,7 @@ class ExpenseParser:
         })
         normalized_message = normalized_message.translate(punctuation_map)
 
-        tokens = [
-            token.strip()
-            for token in normalized_message.split()
-            if token.strip() and token.strip() not in filler_words
-        ]
-
+        tokens = normalized_message.split()
         if not tokens:
             return None
 
@@ -203,19 +248,29 @@ class ExpenseParser:
             numeric = token.replace('.', '', 1)
             return numeric.isdigit()
 
-        important_tokens = [
-            token for token in tokens
-            if is_number_token(token) or token in keyword_to_category
-        ]
+        # Walk the message once, keeping numbers and keyword matches in order.
+        # Each important item is (amount_token, None) or (None, (keyword, category_name)).
+        matches_by_start = {start: (end, value) for start, end, value in automaton.find_longest(tokens)}
+        important_items = []
+        position = 0
+        while position < len(tokens):
+            if position in matches_by_start:
+                end, category_name = matches_by_start[position]
+                important_items.append((None, (' '.join(tokens[position:end]), category_name)))
+                position = end
+                continue
+            if is_number_token(tokens[position]):
+                important_items.append((tokens[position], None))
+            position += 1
 
-        if not important_tokens:
+        if not important_items:
             return None
 
         results = []
         i = 0
-        while i < len(important_tokens):
-            token = important_tokens[i]
-            if not is_number_token(token):
+        while i < len(important_items):
+            token, _ = important_items[i]
+            if token is None:
                 i += 1
                 continue
 
@@ -232,13 +287,12 @@ class ExpenseParser:
             category_name = None
             description = None
             j = i + 1
-            while j < len(important_tokens):
-                candidate = important_tokens[j]
-                if candidate in keyword_to_category:
-                    category_name = keyword_to_category[candidate]
-                    description = candidate
+            while j < len(important_items):
+                candidate_number, candidate_match = important_items[j]
+                if candidate_match:
+                    description, category_name = candidate_match
                     break
-                if is_number_token(candidate):
+                if candidate_number is not None:
                     break
                 j += 1
 
@@ -256,38 +310,12 @@ class ExpenseParser:
 
         return results or None
 
-    def _extract_learning_keywords(self, message: str, description: str):
-        filler_words = {
-            'ka', 'ke', 'ki', 'for', 'and', 'with', 'on', 'at', 'to', 'a', 'an', 'the',
-            'of', 'in', 'my', 'is', 'was', 'am', 'are', 'other', 'unable', 'parse',
-        }
-        text = f"{message or ''} {description or ''}".lower()
-        raw_tokens = re.findall(r'[a-zA-Z]+', text)
-
-        keywords = set()
-        for token in raw_tokens:
-            token = token.strip().lower()
-            if len(token) < 3:
-                continue
-            if token in filler_words:
-                continue
-            if token.isdigit():
-                continue
-            keywords.add(token)
-
-        return keywords
-
     def _learn_from_ai_result(self, message: str, description: str, category):
-        if not category:
+        if not category or (self.budget and self.budget.dry_run):
             return
 
         try:
-            for keyword in self._extract_learning_keywords(message, description):
-                CategoryKeyword.objects.get_or_create(
-                    category=category,
-                    keyword=keyword,
-                    defaults={'added_by': 'system'},
-                )
+            keyword_learning.learn_keywords(self.user.pk, category, message, description, index=self.index)
         except Exception as e:
             logger.warning('Keyword learning failed: %s', e)
 
@@ -320,6 +348,45 @@ class ExpenseParser:
         except (json.JSONDecodeError, TypeError, ValueError):
             return None
 
+    def _charge_llm_call(self):
+        """Count one Gemini request against the per-message budget, if any."""
+        if self.budget is not None and not self.budget.charge_llm_call():
+            raise LLMBudgetExceeded('Per-message LLM budget exhausted')
+
+    def _generate_json(self, prompts, temperature, label):
+        """
+        Try each prompt in turn until Gemini returns parseable JSON.
+
+        Returns the parsed dict, None when every response was unparseable, or
+        re-raises the last API error when no attempt reached the model.
+        """
+        api_error = None
+        for attempt, prompt_text in enumerate(prompts, start=1):
+            try:
+                self._charge_llm_call()
+                response = generate_content(
+                    self.gemini_key,
+                    model='gemini-2.5-flash-lite',
+                    contents=prompt_text,
+                    config={'temperature': temperature},
+                )
+            except (GeminiUnavailableException, ImportError):
+                # Quota circuit open or google-genai missing: retrying can't help
+                raise
+            except Exception as e:
+                api_error = e
+                logger.warning('%s Gemini API error (attempt %d): %s', label, attempt, e)
+                continue
+
+            parsed = self._safe_json_parse((response.text or '').strip())
+            if parsed is not None:
+                return parsed
+            logger.warning('%s Gemini JSON parse failed (attempt %d)', label, attempt)
+
+        if api_error:
+            raise api_error
+        return None
+
     def _parse_natural_language(self, message: str):
         if not self.gemini_key:
             return {
@@ -327,15 +394,6 @@ class ExpenseParser:
                 'message': 'Could not parse expense message. Please use format: 120 petrol'
             }
 
-        try:
-            from google import genai
-        except ImportError:
-            logger.warning('google-genai not installed, skipping natural language parsing')
-            return {
-                'error': 'parse_failed',
-                'message': 'Could not parse expense message. Please use format: 120 petrol'
-            }
-
         prompt = f"""Extract expense details from this message:
 
 \"{message}\"
@@ -382,122 +440,137 @@ Rules:
   }
 """
 
-        prompts = [prompt, retry_prompt]
-
-        for attempt, prompt_text in enumerate(prompts, start=1):
-            try:
-                client = genai.Client(api_key=self.gemini_key)
-                response = client.models.generate_content(
-                    model='gemini-2.5-flash-lite',
-                    contents=prompt_text,
-                    config={'temperature': 0.2},
-                )
-            except Exception as e:
-                logger.warning('Natural language Gemini API error (attempt %d): %s', attempt, e)
-                if attempt < len(prompts):
-                    continue
-                return {
-                    'error': 'parse_failed',
-                    'message': 'Could not parse expense message. Please use format: 120 petrol'
-                }
-
-            response_text = (response.text or '').strip()
-            parsed = self._safe_json_parse(response_text)
-            if parsed is None:
-                logger.warning('Natural language Gemini JSON parse failed (attempt %d)', attempt)
-                if attempt < len(prompts):
-                    continue
-                return {
-                    'error': 'parse_failed',
-                    'message': 'Could not parse expense message. Please use format: 120 petrol'
-                }
-
-            amount = parsed.get('amount', 0)
-            description = str(parsed.get('description', '')).strip() or message[:120]
-            category_name = str(parsed.get('category', 'Other')).strip() or 'Other'
-
-            try:
-                amount = Decimal(str(amount))
-            except (ValueError, TypeError):
-                amount = Decimal('0')
+        try:
+            parsed = gemini_cache.get_or_compute(
+                gemini_cache.make_key('natural_language', message),
+                lambda: self._generate_json([prompt, retry_prompt], temperature=0.2, label='Natural language'),
+            )
+        except GeminiUnavailableException:
+            parsed = None
+        except Exception as e:
+            logger.warning('Natural language Gemini API error: %s', e)
+            parsed = None
 
-            if amount <= 0:
-                return {
-                    'error': 'parse_failed',
-                    'message': 'Could not parse expense message. Please use format: 120 petrol'
-                }
+        if parsed is None:
+            return {
+                'error': 'parse_failed',
+                'message': 'Could not parse expense message. Please use format: 120 petrol'
+            }
 
-            category = Category.objects.filter(
-                user=self.user,
-                name__iexact=category_name,
-                is_active=True,
-            ).first()
+        amount = parsed.get('amount', 0)
+        description = str(parsed.get('description', '')).strip() or message[:120]
+        category_name = str(parsed.get('category', 'Other')).strip() or 'Other'
 
-            if not category:
-                category = Category.objects.filter(
-                    user=self.user,
-                    name__iexact='Other',
-                    is_active=True,
-                ).first()
+        try:
+            amount = Decimal(str(amount))
+        except (ValueError, TypeError):
+            amount = Decimal('0')
 
-            if not category:
-                return {
-                    'error': 'category_not_found',
-                    'message': f"Category not found. Available categories: {self._get_category_list()}"
-                }
+        if amount <= 0:
+            return {
+                'error': 'parse_failed',
+                'message': 'Could not parse expense message. Please use format: 120 petrol'
+            }
 
-            self._learn_from_ai_result(message, description, category)
+        category = self.index.find_category(category_name) or self.index.other
 
+        if not category:
             return {
-                'amount': amount,
-                'category': category,
-                'description': description,
-                'date': timezone.now().date(),
+                'error': 'category_not_found',
+                'message': f"Category not found. Available categories: {self._get_category_list()}"
             }
 
+        self._learn_from_ai_result(message, description, category)
+        self.last_tier = 'natural_language'
+
         return {
-            'error': 'parse_failed',
-            'message': 'Could not parse expense message. Please use format: 120 petrol'
+            'amount': amount,
+            'category': category,
+            'description': description,
+            'date': timezone.now().date(),
         }
     
     def _tier1_exact_match(self, category_word):
         """Tier 1: Check if the word exactly matches any category name (case-insensitive)"""
-        return Category.objects.filter(
-            user=self.user,
-            name__iexact=category_word,
-            is_active=True
-        ).first()
+        return self.index.find_category(category_word)
     
     def _tier2_keyword_match(self, category_word):
         """Tier 2: Check if the word exists in the keyword map for this user's categories"""
-        keyword_entry = CategoryKeyword.objects.select_related('category').filter(
-            category__user=self.user,
-            category__is_active=True,
-            keyword__iexact=category_word
-        ).first()
-        
-        if keyword_entry:
-            return keyword_entry.category
-        
-        return None
+        return self.index.find_keyword(category_word)
+
+    def _fuzzy_match(self, category_word):
+        """Resolve near-miss spellings locally using the user's names, keywords and built-in vocabulary"""
+        def build_fuzzy_index(index):
+            terms = {}
+            for category_name, category_keywords in BUILTIN_KEYWORDS.items():
+                category = index.find_category(category_name)
+                if not category and category_name == 'Fuel':
+                    category = index.fuel_fallback()
+                if category:
+                    terms.update(dict.fromkeys(category_keywords, category))
+            # The user's own keywords and category names take precedence
+            terms.update(index.by_keyword)
+            terms.update(index.by_name)
+            return FuzzyIndex(terms)
+
+        fuzzy_index = self.index.derived('fuzzy_index', build_fuzzy_index)
+        threshold = getattr(settings, 'EXPENSE_FUZZY_MATCH_THRESHOLD', 0.75)
+
+        metrics.incr('parser.fuzzy.lookups')
+        match = fuzzy_index.lookup(category_word, threshold=threshold)
+        if not match:
+            metrics.incr('parser.fuzzy.misses')
+            return None
+
+        category, term, score = match
+        metrics.incr('parser.fuzzy.hits')
+        logger.info(f"[Fuzzy] Match hit for '{category_word}' ~ '{term}' ({score:.2f}) -> {category.name}")
+        return category
     
+    def _global_keyword_match(self, category_word, description):
+        """Map the word (or a merchant in the description) through the global keyword table"""
+        table = get_global_keyword_table()
+        category_name = table.lookup(category_word) or table.lookup_text(f"{category_word} {description}")
+        category = self.index.find_category(category_name) if category_name else None
+        if not category:
+            metrics.incr('parser.global_keyword.misses')
+            return None
+
+        metrics.incr('parser.global_keyword.hits')
+        logger.info(f"[Global] Keyword hit for '{category_word}' -> {category.name}")
+        return category
+
+    def _classifier_match(self, text):
+        """Naive Bayes over the user's own expense history, with a global prior"""
+        if not expense_classifier.available():
+            return None
+
+        metrics.incr('parser.classifier.lookups')
+        persist = not (self.budget and self.budget.dry_run)
+        try:
+            match = expense_classifier.classify(self.user, self.index, text, persist=persist)
+        except Exception as e:
+            logger.warning('Expense classifier failed: %s', e)
+            match = None
+
+        threshold = getattr(settings, 'EXPENSE_CLASSIFIER_MIN_CONFIDENCE', 0.85)
+        if not match or match[1] < threshold:
+            metrics.incr('parser.classifier.misses')
+            return None
+
+        category, confidence = match
+        metrics.incr('parser.classifier.hits')
+        logger.info(f"[Classifier] Hit for '{text.strip()}' -> {category.name} ({confidence:.2f})")
+        return category
+
     def _tier3_gemini_fallback(self, amount_str, category_word, description):
         """
         Tier 3: Use Gemini 2.5 Flash-Lite to categorize the expense.
         On success, AUTO-SAVE the keyword to prevent future Gemini calls.
         """
-        try:
-            from google import genai
-        except ImportError:
-            logger.warning("google-genai not installed, skipping Gemini fallback")
-            return self._get_fallback_error()
-        
         try:
             # Get user's active categories for context
-            user_categories = list(
-                Category.objects.filter(user=self.user, is_active=True)
-                .values_list('name', flat=True)
-            )
+            user_categories = self.index.category_names
             
             if not user_categories:
                 logger.warning(f"User {self.user.username} has no active categories")
@@ -549,65 +622,30 @@ Rules:
   }
 """
 
-            prompts = [prompt, retry_prompt]
-            
-            # Call Gemini 2.5 Flash-Lite (fastest model)
-            client = genai.Client(api_key=self.gemini_key)
-            parsed = None
-            api_error = None
-            for attempt, prompt_text in enumerate(prompts, start=1):
-                try:
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash-lite",
-                        contents=prompt_text,
-                        config={"temperature": 0.3}
-                    )
-                except Exception as e:
-                    api_error = e
-                    logger.warning('Tier 3 Gemini API error (attempt %d): %s', attempt, e)
-                    if attempt < len(prompts):
-                        continue
-                    break
-
-                parsed = self._safe_json_parse((response.text or '').strip())
-                if parsed is None:
-                    logger.warning('Tier 3 Gemini JSON parse failed (attempt %d)', attempt)
-                    if attempt < len(prompts):
-                        continue
-                    break
-
-                api_error = None
-                break
-
+            def ask_gemini():
+                if getattr(settings, 'GEMINI_BATCH_ENABLED', True):
+                    # Don't wait out the batch window just to be rejected
+                    ensure_available()
+                    self._charge_llm_call()
+                    # Coalesced with concurrent misses from other users into one call
+                    return get_batcher(self.gemini_key).categorize(full_text, user_categories)
+
+                parsed = self._generate_json([prompt, retry_prompt], temperature=0.3, label='Tier 3')
+                # Validate response structure (invalid responses are not cached)
+                if parsed is not None and not all(k in parsed for k in ['amount', 'category', 'description']):
+                    logger.warning(f"Invalid Gemini response structure: {parsed}")
+                    return None
+                return parsed
+
+            # Keyed without the amount: the same phrase resolves to the same
+            # category whatever was spent, and the amount is already parsed.
+            cache_key = gemini_cache.make_key('tier3', f"{category_word} {description}", user_categories)
+            parsed = gemini_cache.get_or_compute(cache_key, ask_gemini)
             if parsed is None:
-                if api_error:
-                    error_str = str(api_error).lower()
-                    if '429' in str(api_error) or 'resource_exhausted' in error_str or 'quota' in error_str:
-                        logger.warning(f"Gemini quota exhausted: {api_error}")
-                        return {
-                            'error': 'gemini_quota_exceeded',
-                            'message': f"AI is temporarily unavailable. Please try later or use one of these categories: {self._get_category_list()}"
-                        }
-
-                    logger.error(f"Gemini API error: {api_error}", exc_info=True)
-                    return {
-                        'error': 'gemini_error',
-                        'message': f"Unable to categorize. Available categories: {self._get_category_list()}"
-                    }
-
-                return self._get_fallback_error()
-            
-            # Validate response structure
-            if not all(k in parsed for k in ['amount', 'category', 'description']):
-                logger.warning(f"Invalid Gemini response structure: {parsed}")
                 return self._get_fallback_error()
             
             # Find the category in user's categories
-            category = Category.objects.filter(
-                user=self.user,
-                name__iexact=parsed['category'],
-                is_active=True
-            ).first()
+            category = self.index.find_category(str(parsed['category']))
             
             if not category:
                 # Category not found in user's list, return error
@@ -624,12 +662,22 @@ Rules:
             logger.info(f"[AutoSave] Learned keywords for category '{category.name}'")
 
             return {
-                'amount': Decimal(str(parsed['amount'])),
+                'amount': Decimal(str(amount_str)),
                 'category': category,
                 'description': parsed_description,
                 'date': timezone.now().date()
             }
         
+        except LLMBudgetExceeded:
+            return self._get_fallback_error()
+
+        except GeminiUnavailableException:
+            # Quota circuit is open: answer instantly instead of calling Gemini
+            return {
+                'error': 'gemini_quota_exceeded',
+                'message': f"AI is temporarily unavailable. Please try later or use one of these categories: {self._get_category_list()}"
+            }
+
         except Exception as e:
             # Handle API errors (429, RESOURCE_EXHAUSTED, etc.)
             error_str = str(e).lower()
@@ -656,8 +704,7 @@ Rules:
     
     def _get_category_list(self):
         """Get formatted list of available categories"""
-        categories = Category.objects.filter(user=self.user, is_active=True)
-        return ', '.join([f"{cat.icon} {cat.name}" for cat in categories])
+        return self.index.category_list_display()
 
 
 
@@ -671,41 +718,25 @@ class StatementGenerator:
     def generate_today(self):
         """Generate today's expense statement"""
         today = timezone.now().date()
-        expenses = Expense.objects.filter(
-            user=self.user,
-            date=today,
-            is_deleted=False
-        ).select_related('category')
-        
-        return self._format_expenses(expenses, f"📊 Today's Expenses ({today.strftime('%d %b %Y')})")
+        totals = self._category_totals(today, today)
+
+        return self._format_expenses(totals, f"📊 Today's Expenses ({today.strftime('%d %b %Y')})")
     
     def generate_week(self):
         """Generate this week's expense statement"""
         today = timezone.now().date()
         week_start = today - timedelta(days=today.weekday())
-        
-        expenses = Expense.objects.filter(
-            user=self.user,
-            date__gte=week_start,
-            date__lte=today,
-            is_deleted=False
-        ).select_related('category')
-        
-        return self._format_expenses(expenses, f"📊 This Week's Expenses ({week_start.strftime('%d %b')} - {today.strftime('%d %b')})")
+        totals = self._category_totals(week_start, today)
+
+        return self._format_expenses(totals, f"📊 This Week's Expenses ({week_start.strftime('%d %b')} - {today.strftime('%d %b')})")
     
     def generate_month(self):
         """Generate this month's expense statement"""
         today = timezone.now().date()
         month_start = today.replace(day=1)
-        
-        expenses = Expense.objects.filter(
-            user=self.user,
-            date__gte=month_start,
-            date__lte=today,
-            is_deleted=False
-        ).select_related('category')
-        
-        return self._format_expenses(expenses, f"📊 This Month's Expenses ({month_start.strftime('%B %Y')})")
+        totals = self._category_totals(month_start, today)
+
+        return self._format_expenses(totals, f"📊 This Month's Expenses ({month_start.strftime('%B %Y')})")
     
     def generate_category(self, category_name):
         """Generate expenses for a specific category"""
@@ -721,72 +752,46 @@ class StatementGenerator:
         # Get last 30 days for this category
         today = timezone.now().date()
         start_date = today - timedelta(days=30)
-        
-        expenses = Expense.objects.filter(
-            user=self.user,
-            category=category,
-            date__gte=start_date,
-            is_deleted=False
-        ).select_related('category')
-        
-        return self._format_expenses(expenses, f"📊 {category.icon} {category.name} - Last 30 Days")
+        totals = self._category_totals(start_date, category=category)
+
+        return self._format_expenses(totals, f"📊 {category.icon} {category.name} - Last 30 Days")
     
     def generate_summary(self):
         """Generate overall expense summary"""
         today = timezone.now().date()
         month_start = today.replace(day=1)
-        
-        # Monthly expenses by category
-        expenses = Expense.objects.filter(
-            user=self.user,
-            date__gte=month_start,
-            is_deleted=False
-        ).select_related('category')
-        
-        # Group by category
-        from django.db.models import Sum
-        category_totals = expenses.values('category__name', 'category__icon').annotate(
-            total=Sum('amount')
-        ).order_by('-total')
+        category_totals = self._category_totals(month_start)
         
         if not category_totals:
             return f"📊 Monthly Summary ({month_start.strftime('%B %Y')})\n\nNo expenses recorded yet."
         
         message = f"📊 Monthly Summary ({month_start.strftime('%B %Y')})\n\n"
         
-        total = 0
+        total = Decimal('0')
         for item in category_totals:
-            amount = float(item['total'])
-            total += amount
-            message += f"{item['category__icon']} {item['category__name']}: {self.currency_symbol}{amount:.2f}\n"
+            total += item['total']
+            message += f"{item['category__icon']} {item['category__name']}: {self.currency_symbol}{item['total']:.2f}\n"
         
         message += f"\n{'='*25}\n"
         message += f"💰 Total: {self.currency_symbol}{total:.2f}"
         
         return message
 
-    def _format_expenses(self, expenses, title):
-        """Format expenses into a readable message"""
-        if not expenses:
-            return f"{title}\n\nNo expenses recorded."
-
-        # Group by category
-        category_totals = {}
-        for expense in expenses:
-            cat_name = expense.category.name
-            cat_icon = expense.category.icon
-            key = f"{cat_icon} {cat_name}"
+    def _category_totals(self, start, end=None, category=None):
+        """Per-category totals (largest first) from the daily spend rollup, as exact Decimals"""
+        return rollups.category_totals(self.user, start, end, category=category)
 
-            if key not in category_totals:
-                category_totals[key] = 0
-            category_totals[key] += float(expense.amount)
+    def _format_expenses(self, category_totals, title):
+        """Format per-category totals into a readable message"""
+        if not category_totals:
+            return f"{title}\n\nNo expenses recorded."
 
         message = f"{title}\n\n"
 
-        total = 0
-        for cat, amount in sorted(category_totals.items(), key=lambda x: x[1], reverse=True):
-            message += f"{cat}: {self.currency_symbol}{amount:.2f}\n"
-            total += amount
+        total = Decimal('0')
+        for item in category_totals:
+            message += f"{item['category__icon']} {item['category__name']}: {self.currency_symbol}{item['total']:.2f}\n"
+            total += item['total']
 
         message += f"\n{'='*25}\n"
         message += f"💰 Total: {self.currency_symbol}{total:.2f}"
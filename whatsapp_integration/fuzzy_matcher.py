@@ -0,0 +1,98 @@
+"""
+Local fuzzy matching for misspelled category words ("petorl", "grocries").
+
+A character trigram index narrows the vocabulary to a handful of candidates,
+which are then scored with optimal-string-alignment (Damerau-Levenshtein)
+distance. Lookups take microseconds and never touch the network.
+"""
+from collections import Counter
+
+
+def _grams(word, n=3):
+    padded = f'^{word}$'
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def edit_distance(a, b, max_distance=None):
+    """Optimal string alignment distance; returns max_distance + 1 once exceeded."""
+    if a == b:
+        return 0
+    if max_distance is not None and abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                previous_previous is not None
+                and i > 1 and j > 1
+                and a[i - 1] == b[j - 2]
+                and a[i - 2] == b[j - 1]
+            ):
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if max_distance is not None and min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyIndex:
+    """Trigram-filtered edit-distance lookup over a vocabulary of terms."""
+
+    def __init__(self, terms, min_length=4, max_candidates=25):
+        self.min_length = min_length
+        self.max_candidates = max_candidates
+        self._terms = []
+        self._values = []
+        self._postings = {}
+
+        for term, value in terms.items():
+            term = (term or '').strip().lower()
+            if len(term) < min_length:
+                continue
+            term_id = len(self._terms)
+            self._terms.append(term)
+            self._values.append(value)
+            for gram in _grams(term):
+                self._postings.setdefault(gram, []).append(term_id)
+
+    def __len__(self):
+        return len(self._terms)
+
+    def lookup(self, word, threshold=0.75):
+        """
+        Return (value, term, score) for the closest term scoring at least
+        ``threshold`` (1.0 = identical), or None.
+        """
+        word = (word or '').strip().lower()
+        if len(word) < self.min_length or not self._terms:
+            return None
+
+        shared = Counter()
+        for gram in _grams(word):
+            for term_id in self._postings.get(gram, ()):
+                shared[term_id] += 1
+        if not shared:
+            return None
+
+        best = None
+        for term_id, _ in shared.most_common(self.max_candidates):
+            term = self._terms[term_id]
+            longest = max(len(word), len(term))
+            max_distance = int(longest * (1 - threshold))
+            distance = edit_distance(word, term, max_distance=max_distance)
+            if distance > max_distance:
+                continue
+            score = 1 - distance / longest
+            if best is None or score > best[2]:
+                best = (self._values[term_id], term, score)
+
+        if best and best[2] >= threshold:
+            return best
+        return None
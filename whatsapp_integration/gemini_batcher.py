@@ -0,0 +1,208 @@
+"""
+Micro-batching for tier 3 Gemini categorization.
+
+Under bursty traffic many worker threads miss the local tiers at the same
+moment and would each make their own ``generate_content`` call. A
+``MicroBatcher`` collects those misses for a few milliseconds, sends them as
+one structured multi-item prompt (every item carries its own category list)
+and fans the per-item results back out to the waiting callers.
+
+The first caller to arrive while nothing is pending becomes the leader: it
+waits for the batch window (or until the batch is full), runs the model for
+everyone and resolves each caller's future. A helper thread is only started
+when a burst overflows ``max_batch``.
+
+``model_fn`` receives a list of ``{'id', 'text', 'categories'}`` dicts and
+returns ``{id: result}``; pass a fake in tests to run without the network.
+"""
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+
+from . import metrics
+from .gemini_client import generate_content
+
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_PROMPT = """You are an expense categorization assistant. Categorize every expense below.
+
+Each item has an id, the expense text and the categories allowed for that item.
+
+Items:
+{items}
+
+Return only a valid JSON array (no markdown, no code blocks) with one object per item:
+[
+    {{"id": <item id>, "amount": <number>, "category": "<exact category from that item's list>", "description": "<short description>"}}
+]
+
+If an item cannot be categorized, use "Other" as its category and "Unable to categorize" as its description."""
+
+
+class MicroBatcher:
+    """Coalesce concurrent categorization requests into one model call."""
+
+    def __init__(self, model_fn, window_ms=20, max_batch=20):
+        self.model_fn = model_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending = []
+        self._leader_active = False
+        self._next_id = 0
+        self._cond = threading.Condition()
+
+    def categorize(self, text, categories, timeout=None):
+        """Block until the batch containing this item has been answered."""
+        return self.submit(text, categories).result(timeout=timeout)
+
+    def submit(self, text, categories):
+        future = Future()
+        with self._cond:
+            self._next_id += 1
+            self._pending.append(({'id': self._next_id, 'text': text, 'categories': list(categories)}, future))
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+            if self._leader_active:
+                return future
+            self._leader_active = True
+
+        self._lead()
+        return future
+
+    def _lead(self):
+        deadline = time.monotonic() + self.window
+        with self._cond:
+            while len(self._pending) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = self._pending[:self.max_batch]
+            self._pending = self._pending[self.max_batch:]
+            # Overflow from a full batch gets its own leader so it is not
+            # stuck behind this batch's model call.
+            self._leader_active = bool(self._pending)
+            overflow = self._leader_active
+
+        if overflow:
+            threading.Thread(target=self._lead, name='gemini-batch', daemon=True).start()
+        self._run(batch)
+
+    def _run(self, batch):
+        metrics.incr('gemini.batch.requests')
+        metrics.incr('gemini.batch.items', len(batch))
+        try:
+            results = self.model_fn([item for item, _ in batch]) or {}
+        except Exception as e:
+            logger.warning('Gemini batch of %d item(s) failed: %s', len(batch), e)
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for item, future in batch:
+            future.set_result(results.get(item['id']))
+
+
+def _parse_batch_response(text):
+    """
+    Entries of a batch reply as a list.
+
+    The model is asked for an array, but a one-item batch often comes back as
+    a bare object (or an object wrapping the array); both are accepted.
+    """
+    payload = (text or '').strip()
+    if payload.startswith('```'):
+        payload = payload.strip('`')
+        if payload.lower().startswith('json'):
+            payload = payload[4:].strip()
+
+    try:
+        parsed = json.loads(payload)
+    except (json.JSONDecodeError, TypeError, ValueError):
+        parsed = None
+        for opening, closing in (('[', ']'), ('{', '}')):
+            start, end = payload.find(opening), payload.rfind(closing)
+            if start == -1 or end == -1:
+                continue
+            try:
+                parsed = json.loads(payload[start:end + 1])
+                break
+            except (json.JSONDecodeError, TypeError, ValueError):
+                continue
+
+    if isinstance(parsed, dict):
+        wrapped = [value for value in parsed.values() if isinstance(value, list)]
+        if 'category' not in parsed and len(wrapped) == 1:
+            return wrapped[0]
+        return [parsed]
+    return parsed if isinstance(parsed, list) else []
+
+
+class GeminiBatchModel:
+    """``model_fn`` that sends one multi-item prompt to Gemini."""
+
+    def __init__(self, api_key, model='gemini-2.5-flash-lite', temperature=0.3):
+        self.api_key = api_key
+        self.model = model
+        self.temperature = temperature
+
+    def __call__(self, items):
+        lines = [
+            json.dumps({'id': item['id'], 'text': item['text'], 'categories': item['categories']}, ensure_ascii=False)
+            for item in items
+        ]
+        response = generate_content(
+            self.api_key,
+            model=self.model,
+            contents=BATCH_PROMPT.format(items='\n'.join(lines)),
+            config={'temperature': self.temperature, 'response_mime_type': 'application/json'},
+        )
+
+        results = {}
+        for entry in _parse_batch_response(response.text):
+            if not isinstance(entry, dict):
+                continue
+            if 'id' not in entry:
+                if len(items) != 1:
+                    continue
+                # A single answer without an id can only belong to the single item
+                entry = {**entry, 'id': items[0]['id']}
+            if not all(k in entry for k in ['amount', 'category', 'description']):
+                continue
+            try:
+                item_id = int(entry['id'])
+            except (TypeError, ValueError):
+                continue
+            results[item_id] = {
+                'amount': entry['amount'],
+                'category': entry['category'],
+                'description': entry['description'],
+            }
+        return results
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(api_key):
+    """Return the process-wide batcher for ``api_key``, creating it on first use."""
+    batcher = _batchers.get(api_key)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(api_key)
+            if batcher is None:
+                batcher = MicroBatcher(
+                    GeminiBatchModel(api_key),
+                    window_ms=getattr(settings, 'GEMINI_BATCH_WINDOW_MS', 20),
+                    max_batch=getattr(settings, 'GEMINI_BATCH_MAX_ITEMS', 20),
+                )
+                _batchers[api_key] = batcher
+    return batcher
@@ -0,0 +1,205 @@
+"""
+Cross-user cache for Gemini categorization results.
+
+Thousands of users send the same phrases ("150 chai", "zomato 320"), so the
+parsed JSON returned by Gemini is cached under the normalized message text
+plus a hash of the category set that was sent in the prompt. Lookups go
+through two levels:
+
+* an in-process LRU with per-entry expiry (no network round trip), and
+* the shared ``gemini`` Django cache (see ``CACHES`` in settings), which is
+  TTL- and size-bounded by its backend and shared by every worker.
+
+Only successful results are cached; API errors and unparseable responses are
+retried on the next message. Concurrent misses for the same key inside one
+process wait for the first caller and share its answer (even an uncached
+None) instead of calling Gemini again.
+"""
+import copy
+import hashlib
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import InvalidCacheBackendError, caches
+
+from . import metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 60 * 60
+
+_NON_WORD_RE = re.compile(r'[^\w\s.]+')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def _ttl_seconds():
+    return getattr(settings, 'GEMINI_CACHE_TTL', DEFAULT_TTL_SECONDS)
+
+
+def normalize_text(text):
+    """Lowercase, drop punctuation and collapse whitespace."""
+    text = _NON_WORD_RE.sub(' ', str(text or '').lower())
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+def category_set_hash(category_names):
+    """Order-independent hash of a user's category names ('' when not sent)."""
+    if not category_names:
+        return ''
+    names = sorted({str(name).strip().lower() for name in category_names if str(name).strip()})
+    return hashlib.sha1('\n'.join(names).encode('utf-8')).hexdigest()[:16]
+
+
+def make_key(namespace, text, category_names=None):
+    """Cache key for one prompt; hashed so it is safe for any cache backend."""
+    raw = f"{normalize_text(text)}|{category_set_hash(category_names)}"
+    return f"gemini:{namespace}:{hashlib.sha1(raw.encode('utf-8')).hexdigest()}"
+
+
+class LocalResultCache:
+    """Thread-safe LRU of cached results with per-entry expiry (returns copies)."""
+
+    def __init__(self, max_size=5000, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return copy.deepcopy(value)
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = LocalResultCache(
+    max_size=getattr(settings, 'GEMINI_CACHE_LRU_SIZE', 5000),
+    ttl_seconds=_ttl_seconds(),
+)
+
+class _Flight:
+    """One in-progress computation of a key and the callers waiting on it."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.callers = 0
+        self.finished = False
+        self.value = None
+
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def _shared_cache():
+    try:
+        return caches['gemini']
+    except InvalidCacheBackendError:
+        return caches['default']
+
+
+def lookup(key):
+    """Return the cached result for ``key`` or None."""
+    value = _local.get(key)
+    if value is not None:
+        metrics.incr('gemini.cache.local_hits')
+        return value
+
+    try:
+        value = _shared_cache().get(key)
+    except Exception as e:
+        logger.warning('Gemini shared cache read failed: %s', e)
+        value = None
+
+    if value is None:
+        metrics.incr('gemini.cache.misses')
+        return None
+
+    metrics.incr('gemini.cache.shared_hits')
+    _local.set(key, value)
+    return value
+
+
+def store(key, value):
+    """Store a successful result in both levels."""
+    if value is None:
+        return
+    _local.set(key, value)
+    try:
+        _shared_cache().set(key, value, _ttl_seconds())
+    except Exception as e:
+        logger.warning('Gemini shared cache write failed: %s', e)
+
+
+def get_or_compute(key, compute):
+    """
+    Return the cached result for ``key``, calling ``compute()`` on a miss.
+
+    ``compute`` returns the parsed result or None (not cached); exceptions
+    propagate to the caller. Only one thread per process computes a given key
+    at a time, and callers that waited on it get its result.
+    """
+    if not getattr(settings, 'GEMINI_CACHE_ENABLED', True):
+        return compute()
+
+    value = lookup(key)
+    if value is not None:
+        return value
+
+    with _inflight_lock:
+        flight = _inflight.get(key)
+        if flight is None:
+            flight = _inflight[key] = _Flight()
+        flight.callers += 1
+
+    try:
+        with flight.lock:
+            if flight.finished:
+                # Computed while we waited; share it even when it was None.
+                metrics.incr('gemini.cache.coalesced')
+                return copy.deepcopy(flight.value)
+
+            value = _local.get(key)
+            if value is not None:
+                metrics.incr('gemini.cache.local_hits')
+                return value
+
+            # If compute() raises, the next waiter tries again.
+            value = compute()
+            store(key, value)
+            flight.value, flight.finished = value, True
+            return value
+    finally:
+        # The entry lives until its last caller leaves, so a late arrival
+        # joins this flight instead of starting a second computation.
+        with _inflight_lock:
+            flight.callers -= 1
+            if not flight.callers:
+                del _inflight[key]
+
+
+def clear_local():
+    _local.clear()
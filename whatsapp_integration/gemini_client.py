@@ -0,0 +1,107 @@
+"""
+Process-wide registry of Gemini API clients.
+
+``genai.Client`` sets up auth and its own HTTP connection pool, so building
+one per call throws both away after every message. Callers use
+``get_client(api_key)`` instead, which creates one client per key on first
+use and hands the same instance to every later caller and thread.
+
+Model calls go through ``generate_content()``, which consults the shared
+quota circuit breaker first and raises ``GeminiUnavailableException`` while
+it is open, so callers fall back to local tiers without a network call.
+"""
+import logging
+import threading
+
+from django.conf import settings
+
+from . import metrics
+from .circuit_breaker import STATE_OPEN, CircuitBreaker
+from .exceptions import GeminiUnavailableException
+
+
+logger = logging.getLogger(__name__)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+gemini_breaker = CircuitBreaker(
+    'gemini',
+    base_cooldown=getattr(settings, 'GEMINI_BREAKER_BASE_COOLDOWN', 30),
+    max_cooldown=getattr(settings, 'GEMINI_BREAKER_MAX_COOLDOWN', 3600),
+)
+
+
+def build_client(api_key):
+    """Create a new Gemini client; raises ImportError when google-genai is missing."""
+    try:
+        from google import genai
+    except ImportError:
+        logger.warning('google-genai not installed, Gemini calls are unavailable')
+        raise
+
+    return genai.Client(api_key=api_key)
+
+
+def get_client(api_key):
+    """Return the shared client for ``api_key``, creating it on first use."""
+    client = _clients.get(api_key)
+    if client is not None:
+        metrics.incr('gemini.client.reused')
+        return client
+
+    with _clients_lock:
+        client = _clients.get(api_key)
+        if client is None:
+            client = build_client(api_key)
+            _clients[api_key] = client
+            metrics.incr('gemini.client.created')
+            logger.info('Created shared Gemini client')
+        else:
+            metrics.incr('gemini.client.reused')
+    return client
+
+
+def reset_clients():
+    """Close and drop every shared client, e.g. after the API key rotates."""
+    with _clients_lock:
+        for client in _clients.values():
+            close = getattr(client, 'close', None)
+            if callable(close):
+                try:
+                    close()
+                except Exception as e:
+                    logger.warning('Failed closing Gemini client: %s', e)
+        _clients.clear()
+
+
+def ensure_available():
+    """Raise ``GeminiUnavailableException`` while the breaker is open (does not use up the probe)."""
+    if gemini_breaker.state == STATE_OPEN:
+        metrics.incr('gemini.breaker.rejected')
+        raise GeminiUnavailableException(
+            f'Gemini quota circuit open; retry in {gemini_breaker.retry_after():.0f}s'
+        )
+
+
+def generate_content(api_key, **kwargs):
+    """
+    ``client.models.generate_content`` guarded by the quota circuit breaker.
+
+    Raises ``GeminiUnavailableException`` without calling Gemini while the
+    breaker is open; any other exception comes from the API call itself.
+    """
+    if not gemini_breaker.allow():
+        raise GeminiUnavailableException(
+            f'Gemini quota circuit open; retry in {gemini_breaker.retry_after():.0f}s'
+        )
+
+    try:
+        response = get_client(api_key).models.generate_content(**kwargs)
+    except Exception as exc:
+        gemini_breaker.record_failure(exc)
+        raise
+
+    gemini_breaker.record_success()
+    return response
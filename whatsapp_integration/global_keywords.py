@@ -0,0 +1,95 @@
+"""
+In-memory form of the global keyword -> category table.
+
+``GlobalKeywordCategory`` is rebuilt nightly by ``build_global_keywords``
+from every user's learned keywords. Each process loads it once into a dict
+plus a word-level automaton (for multi-word merchants such as "burger king")
+and reloads it after ``GLOBAL_KEYWORD_MAX_AGE`` seconds. Lookups return the
+canonical category *name*; callers map it onto the user's own categories.
+"""
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+
+from expenses.models import GlobalKeywordCategory
+
+from .keyword_matcher import KeywordAutomaton
+
+
+logger = logging.getLogger(__name__)
+
+
+TOKEN_RE = re.compile(r'[a-z0-9&]+')
+
+
+class GlobalKeywordTable:
+    """Keyword -> canonical category name, with category names interned."""
+
+    def __init__(self, rows):
+        names = {}
+        self.by_keyword = {}
+        for keyword, category_name in rows:
+            self.by_keyword[keyword] = names.setdefault(category_name, category_name)
+        self._automaton = None
+        self._automaton_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.by_keyword)
+
+    def lookup(self, word):
+        return self.by_keyword.get(' '.join((word or '').lower().split()))
+
+    def lookup_text(self, text):
+        """Category name of the first (longest) known keyword in ``text``."""
+        if not self.by_keyword:
+            return None
+        tokens = TOKEN_RE.findall((text or '').lower())
+        if not tokens:
+            return None
+
+        if self._automaton is None:
+            with self._automaton_lock:
+                if self._automaton is None:
+                    self._automaton = KeywordAutomaton(self.by_keyword)
+        matches = self._automaton.find_longest(tokens)
+        return matches[0][2] if matches else None
+
+
+_table = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def load_table():
+    rows = GlobalKeywordCategory.objects.values_list('keyword', 'category_name')
+    return GlobalKeywordTable(rows.iterator(chunk_size=5000))
+
+
+def get_table():
+    """Return the process-wide table, reloading it when older than the max age."""
+    global _table, _loaded_at
+
+    max_age = getattr(settings, 'GLOBAL_KEYWORD_MAX_AGE', 3600)
+    if _table is not None and time.monotonic() - _loaded_at < max_age:
+        return _table
+
+    with _lock:
+        if _table is None or time.monotonic() - _loaded_at >= max_age:
+            try:
+                _table = load_table()
+                logger.info('Loaded %d global keywords', len(_table))
+            except Exception as e:
+                logger.warning('Failed loading global keywords: %s', e)
+                _table = _table or GlobalKeywordTable([])
+            _loaded_at = time.monotonic()
+    return _table
+
+
+def reset_table():
+    global _table
+
+    with _lock:
+        _table = None
@@ -0,0 +1,81 @@
+"""
+Process-wide pooled HTTP session for Graph API calls.
+
+Every ``WhatsAppService`` instance shares one keep-alive ``requests.Session``
+so outbound calls reuse TCP/TLS connections instead of handshaking per call.
+"""
+import logging
+import threading
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_GRAPH_API_URL = 'https://graph.facebook.com/v22.0'
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_graph_api_url():
+    return getattr(settings, 'WHATSAPP_GRAPH_API_URL', DEFAULT_GRAPH_API_URL).rstrip('/')
+
+
+def get_timeout(read_timeout=None):
+    """Return a (connect, read) timeout tuple for Graph API requests."""
+    connect_timeout = getattr(settings, 'WHATSAPP_HTTP_CONNECT_TIMEOUT', 3.05)
+    if read_timeout is None:
+        read_timeout = getattr(settings, 'WHATSAPP_HTTP_TIMEOUT', 10)
+    return (connect_timeout, read_timeout)
+
+
+def build_session():
+    """Create a keep-alive session with a tuned connection pool and retry policy."""
+    pool_size = getattr(settings, 'WHATSAPP_HTTP_POOL_SIZE', 20)
+    retries = Retry(
+        total=getattr(settings, 'WHATSAPP_HTTP_RETRIES', 3),
+        # Sending a message twice is worse than failing once, so POSTs are only
+        # retried when the connection was never established.
+        read=0,
+        backoff_factor=0.3,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset({'GET'}),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_size,
+        pool_maxsize=pool_size,
+        max_retries=retries,
+    )
+
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_session():
+    """Return the shared session, creating it on first use."""
+    global _session
+
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = build_session()
+                logger.info('Created pooled Graph API session')
+    return _session
+
+
+def reset_session():
+    """Close and drop the shared session, e.g. after settings change in tests."""
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
@@ -0,0 +1,106 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import InboundMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_RETENTION_SECONDS = 24 * 60 * 60
+
+
+def _max_attempts():
+    return getattr(settings, 'WHATSAPP_INBOUND_MAX_ATTEMPTS', 3)
+
+
+def enqueue_payload(payload):
+    """Persist a raw webhook payload so the HTTP response can return immediately."""
+    return InboundMessage.objects.create(payload=payload)
+
+
+def claim_batch(limit=20, visibility_timeout=None):
+    """
+    Claim up to ``limit`` pending deliveries for this worker.
+
+    Rows stuck in ``processing`` longer than ``visibility_timeout`` seconds
+    (a crashed worker) are reclaimed as well.
+    """
+    if visibility_timeout is None:
+        visibility_timeout = getattr(settings, 'WHATSAPP_INBOUND_VISIBILITY_TIMEOUT', 300)
+    stale_before = timezone.now() - timedelta(seconds=visibility_timeout)
+
+    with transaction.atomic():
+        ids = list(
+            InboundMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=InboundMessage.STATUS_PENDING)
+                | Q(status=InboundMessage.STATUS_PROCESSING, updated_at__lt=stale_before)
+            )
+            .order_by('id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+
+        InboundMessage.objects.filter(id__in=ids).update(
+            status=InboundMessage.STATUS_PROCESSING,
+            attempts=F('attempts') + 1,
+            updated_at=timezone.now(),
+        )
+
+    return ids
+
+
+def process_inbound_message(inbound_id):
+    """Run the webhook pipeline for one queued delivery and record the outcome."""
+    from .views import process_webhook_payload
+
+    close_old_connections()
+    try:
+        inbound = InboundMessage.objects.filter(id=inbound_id).first()
+        if not inbound:
+            return False
+
+        try:
+            process_webhook_payload(inbound.payload, claimed_by=f'inbound:{inbound_id}')
+        except Exception as exc:
+            logger.exception('Failed processing inbound message %s', inbound_id)
+            status = InboundMessage.STATUS_PENDING
+            if inbound.attempts >= _max_attempts():
+                status = InboundMessage.STATUS_FAILED
+            InboundMessage.objects.filter(id=inbound_id).update(
+                status=status,
+                last_error=str(exc)[:2000],
+                updated_at=timezone.now(),
+            )
+            return False
+
+        InboundMessage.objects.filter(id=inbound_id).update(
+            status=InboundMessage.STATUS_DONE,
+            last_error='',
+            processed_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        return True
+    finally:
+        close_old_connections()
+
+
+def purge_done(retention_seconds=None):
+    """Delete deliveries processed longer ago than the retention and return how many were removed."""
+    if retention_seconds is None:
+        retention_seconds = getattr(settings, 'WHATSAPP_INBOUND_RETENTION', DEFAULT_RETENTION_SECONDS)
+    cutoff = timezone.now() - timedelta(seconds=retention_seconds)
+    deleted, _ = InboundMessage.objects.filter(
+        status=InboundMessage.STATUS_DONE,
+        updated_at__lt=cutoff,
+    ).delete()
+    logger.info('Purged %d processed inbound message(s) older than %s', deleted, cutoff)
+    return deleted
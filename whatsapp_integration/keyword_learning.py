@@ -0,0 +1,158 @@
+"""
+Set-based keyword learning.
+
+When Gemini (or a receipt) categorizes a message, the useful words in it are
+saved as ``CategoryKeyword`` rows so the keyword tier answers next time.
+Tokens are filtered first (stopwords, very short or long words, words the
+user's index already knows, a per-message cap) so the table only grows with
+genuinely new vocabulary, and the survivors are written with a single
+``bulk_create(ignore_conflicts=True)``.
+
+With ``EXPENSE_KEYWORD_LEARNING_DEFERRED`` on, keywords are buffered instead
+and a background thread flushes every pending keyword, across all users, in
+one insert per ``EXPENSE_KEYWORD_LEARNING_FLUSH_INTERVAL`` seconds.
+
+``bulk_create`` sends no ``post_save`` signals, so the affected users'
+categorization indexes are invalidated explicitly after each insert.
+"""
+import atexit
+import logging
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from expenses.models import CategoryKeyword
+
+from . import metrics
+from .categorization_index import invalidate_user_indexes
+
+
+logger = logging.getLogger(__name__)
+
+
+TOKEN_RE = re.compile(r'[a-z]+')
+
+STOPWORDS = frozenset({
+    'ka', 'ke', 'ki', 'ko', 'se', 'aur', 'liye', 'wala', 'wali',
+    'for', 'and', 'with', 'on', 'at', 'to', 'a', 'an', 'the', 'of', 'in', 'from', 'by',
+    'my', 'me', 'is', 'was', 'am', 'are', 'be', 'it', 'this', 'that', 'some', 'got', 'paid',
+    'spent', 'bought', 'today', 'yesterday', 'rs', 'inr', 'rupees', 'amount', 'expense',
+    'other', 'misc', 'unable', 'parse', 'unknown',
+})
+
+MIN_KEYWORD_LENGTH = 3
+MAX_KEYWORD_LENGTH = 30
+
+
+def extract_keywords(message, description, index=None, limit=None):
+    """
+    Candidate keywords from a categorized message, in order of appearance.
+
+    Drops stopwords, too short/long tokens and anything ``index`` already maps
+    (as a keyword or a category name), and keeps at most ``limit`` tokens.
+    """
+    if limit is None:
+        limit = getattr(settings, 'EXPENSE_KEYWORD_LEARNING_MAX_PER_MESSAGE', 5)
+
+    text = f"{message or ''} {description or ''}".lower()
+    keywords = []
+    for token in TOKEN_RE.findall(text):
+        if not MIN_KEYWORD_LENGTH <= len(token) <= MAX_KEYWORD_LENGTH:
+            continue
+        if token in STOPWORDS or token in keywords:
+            continue
+        if index is not None and (index.find_keyword(token) or index.find_category(token)):
+            continue
+        keywords.append(token)
+        if len(keywords) >= limit:
+            break
+    return keywords
+
+
+def insert_keywords(entries):
+    """
+    Insert ``(user_id, category_id, keyword)`` entries in one statement.
+
+    Existing ``(category, keyword)`` pairs are skipped by the database. Returns
+    the number of entries submitted.
+    """
+    entries = set(entries)
+    if not entries:
+        return 0
+
+    CategoryKeyword.objects.bulk_create(
+        [
+            CategoryKeyword(category_id=category_id, keyword=keyword, added_by='system')
+            for _, category_id, keyword in entries
+        ],
+        ignore_conflicts=True,
+    )
+    invalidate_user_indexes({user_id for user_id, _, _ in entries})
+
+    metrics.incr('keywords.learned', len(entries))
+    return len(entries)
+
+
+class KeywordLearningBuffer:
+    """Collect learned keywords and insert them in one batch periodically."""
+
+    def __init__(self, flush_interval=5.0):
+        self.flush_interval = flush_interval
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def add(self, user_id, category_id, keywords):
+        with self._lock:
+            self._pending.update((user_id, category_id, keyword) for keyword in keywords)
+            self._ensure_thread()
+
+    def flush(self):
+        """Insert every buffered keyword now and return how many were submitted."""
+        with self._lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return 0
+
+        try:
+            return insert_keywords(pending)
+        except Exception:
+            logger.exception('Failed flushing %d learned keyword(s)', len(pending))
+            return 0
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='keyword-learning', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+keyword_buffer = KeywordLearningBuffer(
+    flush_interval=getattr(settings, 'EXPENSE_KEYWORD_LEARNING_FLUSH_INTERVAL', 5.0),
+)
+
+# Don't drop buffered keywords when a worker shuts down.
+atexit.register(keyword_buffer.flush)
+
+
+def learn_keywords(user_id, category, message, description, index=None):
+    """Save the new keywords in a categorized message, now or via the buffer."""
+    keywords = extract_keywords(message, description, index=index)
+    if not keywords:
+        return 0
+
+    if getattr(settings, 'EXPENSE_KEYWORD_LEARNING_DEFERRED', False):
+        keyword_buffer.add(user_id, category.pk, keywords)
+        return len(keywords)
+    return insert_keywords((user_id, category.pk, keyword) for keyword in keywords)
@@ -0,0 +1,81 @@
+"""
+Aho-Corasick matching over word tokens.
+
+The automaton is built once per keyword set and scans a tokenized message in a
+single pass, matching single- and multi-word keywords ("petrol", "gas bill")
+on whole-word boundaries in time linear in the message length plus matches.
+"""
+from collections import deque
+
+
+class KeywordAutomaton:
+    """Word-level Aho-Corasick automaton mapping keyword phrases to values."""
+
+    def __init__(self, phrases):
+        self._goto = [{}]
+        self._fail = [0]
+        # Each state's outputs as (phrase length in tokens, value), including
+        # the outputs inherited through its failure link.
+        self._outputs = [()]
+
+        for phrase, value in phrases.items():
+            tokens = tuple((phrase or '').lower().split())
+            if tokens:
+                self._add(tokens, value)
+
+        self._build_failure_links()
+
+    def __len__(self):
+        return len(self._goto) - 1
+
+    def _add(self, tokens, value):
+        state = 0
+        for token in tokens:
+            next_state = self._goto[state].get(token)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(())
+                self._goto[state][token] = next_state
+            state = next_state
+
+        # Keep the first value registered for a phrase.
+        if not any(length == len(tokens) for length, _ in self._outputs[state]):
+            self._outputs[state] = self._outputs[state] + ((len(tokens), value),)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for token, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fallback = self._fail[state]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(token, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def iter_matches(self, tokens):
+        """Yield (start, end, value) for every keyword occurrence in ``tokens``."""
+        state = 0
+        for position, token in enumerate(tokens):
+            while state and token not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(token, 0)
+            for length, value in self._outputs[state]:
+                yield position - length + 1, position + 1, value
+
+    def find_longest(self, tokens):
+        """Return non-overlapping matches, preferring the leftmost then longest."""
+        matches = sorted(self.iter_matches(tokens), key=lambda match: (match[0], match[0] - match[1]))
+
+        selected = []
+        covered_until = 0
+        for start, end, value in matches:
+            if start >= covered_until:
+                selected.append((start, end, value))
+                covered_until = end
+        return selected
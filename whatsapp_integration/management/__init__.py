@@ -0,0 +1 @@
+# This file is required for Python to treat the directory as a package
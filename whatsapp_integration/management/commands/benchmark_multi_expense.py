@@ -0,0 +1,113 @@
+"""
+Management command to benchmark multi-expense parsing on long messages.
+
+Runs entirely in memory (no database access) against a synthetic keyword set
+that mixes single- and multi-word keywords.
+
+Usage:
+    python manage.py benchmark_multi_expense
+    python manage.py benchmark_multi_expense --keywords 5000 --items 10 50 200
+"""
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from expenses.models import Category
+from users.models import User
+from whatsapp_integration.categorization_index import CategorizationIndex
+from whatsapp_integration.expense_handler import ExpenseParser
+
+
+CATEGORY_NAMES = ['Food', 'Travel', 'Shopping', 'Bills', 'Entertainment', 'Health', 'Groceries', 'Education']
+
+SEED_KEYWORDS = [
+    'petrol', 'lunch', 'dinner', 'auto', 'uber', 'zomato', 'swiggy', 'chai',
+    'gas bill', 'amazon prime', 'electricity bill', 'movie ticket', 'metro card',
+]
+
+FILLER = ['ka', 'for', 'and', 'with', 'at', 'the', 'aaj', 'kal', 'paid', 'spent']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark multi-expense keyword matching throughput for long messages'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keywords',
+            type=int,
+            default=2000,
+            help='Number of synthetic learned keywords',
+        )
+        parser.add_argument(
+            '--items',
+            type=int,
+            nargs='+',
+            default=[5, 20, 100, 500],
+            help='Expense items per message (one run per value)',
+        )
+        parser.add_argument(
+            '--messages',
+            type=int,
+            default=200,
+            help='Messages parsed per run',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+
+        categories = [Category(id=idx, name=name, icon='💰') for idx, name in enumerate(CATEGORY_NAMES, start=1)]
+        vocabulary = list(SEED_KEYWORDS)
+        while len(vocabulary) < options['keywords']:
+            word = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(4, 9)))
+            if rng.random() < 0.2:
+                word = f"{word} {rng.choice(['bill', 'fee', 'ride', 'order'])}"
+            vocabulary.append(word)
+
+        index = CategorizationIndex(
+            categories,
+            [(keyword, rng.choice(categories)) for keyword in vocabulary],
+        )
+
+        parser = ExpenseParser(User(username='benchmark'))
+        parser._index = index
+
+        started = time.perf_counter()
+        parser._preprocess_multi_expense('1 warmup')
+        self.stdout.write(
+            f"🔧 Compiled automaton for {len(vocabulary)} keywords in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+        for items in options['items']:
+            messages = [self._build_message(rng, vocabulary, items) for _ in range(options['messages'])]
+
+            matched = 0
+            started = time.perf_counter()
+            for message in messages:
+                matched += len(parser._preprocess_multi_expense(message) or [])
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                f"• {items:>4} items/message: "
+                f"{len(messages) / elapsed:>10,.0f} msg/s  "
+                f"{matched / elapsed:>12,.0f} items/s  "
+                f"({elapsed / len(messages) * 1000:.3f} ms/msg, {matched / len(messages):.1f} matched/msg)"
+            )
+
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark complete.'))
+
+    def _build_message(self, rng, vocabulary, items):
+        parts = []
+        for _ in range(items):
+            parts.append(str(rng.randint(10, 5000)))
+            if rng.random() < 0.3:
+                parts.append(rng.choice(FILLER))
+            parts.append(rng.choice(vocabulary))
+            parts.append(rng.choice([',', '&', 'and', '']))
+        return ' '.join(part for part in parts if part)
@@ -0,0 +1,352 @@
+"""
+Management command to benchmark the message categorization pipeline end to end.
+
+Builds a synthetic database (users, categories, learned keywords, expense
+history for the classifier, global keywords) inside a transaction that is
+rolled back at the end, then runs a corpus of realistic messages (plain,
+Hinglish, multi-expense, typos, natural language, unseen merchants) through
+``CategorizationPipeline``. Gemini is replaced by a deterministic stub and the
+Django caches by private in-memory ones, so nothing leaves the process.
+
+Reports messages/sec, p50/p95 latency, queries per message and the tier hit
+distribution, and exits with an error when the average number of queries per
+message exceeds ``--max-queries`` (use it as a regression gate in CI).
+
+Usage:
+    python manage.py benchmark_parser
+    python manage.py benchmark_parser --users 500 --messages 20000 --max-queries 1.5
+    python manage.py benchmark_parser --gemini-latency-ms 300
+"""
+import json
+import logging
+import random
+import re
+import statistics
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from expenses.models import Category, CategoryKeyword, Expense, GlobalKeywordCategory
+from users.models import User
+from whatsapp_integration import categorization_index, expense_classifier, gemini_cache, gemini_client, global_keywords
+from whatsapp_integration.categorization_pipeline import CategorizationPipeline
+
+
+CATEGORY_NAMES = ['Food', 'Travel', 'Shopping', 'Bills', 'Entertainment', 'Health', 'Groceries', 'Education', 'Other']
+
+# Realistic vocabulary per category; also what the Gemini stub "knows".
+VOCABULARY = {
+    'Food': ['lunch', 'dinner', 'breakfast', 'chai', 'coffee', 'pizza', 'biryani', 'samosa', 'zomato', 'swiggy',
+             'dominos', 'burger', 'thali', 'momos', 'dosa', 'canteen', 'khana', 'nashta', 'mithai'],
+    'Travel': ['petrol', 'diesel', 'uber', 'ola', 'auto', 'metro', 'bus', 'train', 'irctc', 'cab', 'rickshaw',
+               'parking', 'toll', 'rapido', 'flight', 'fastag'],
+    'Shopping': ['amazon', 'flipkart', 'myntra', 'shoes', 'shirt', 'jeans', 'kurta', 'watch', 'bag', 'ajio',
+                 'meesho', 'nykaa'],
+    'Bills': ['electricity', 'recharge', 'wifi', 'broadband', 'rent', 'gas', 'water', 'dth', 'postpaid',
+              'maintenance', 'insurance'],
+    'Entertainment': ['movie', 'netflix', 'hotstar', 'spotify', 'pvr', 'concert', 'bowling', 'gaming', 'inox',
+                      'primevideo'],
+    'Health': ['medicine', 'doctor', 'pharmacy', 'gym', 'chemist', 'clinic', 'dentist', 'apollo', 'tablets',
+               'checkup'],
+    'Groceries': ['vegetables', 'sabzi', 'milk', 'doodh', 'atta', 'rice', 'dal', 'bigbasket', 'blinkit', 'zepto',
+                  'kirana', 'fruits', 'eggs', 'bread'],
+    'Education': ['books', 'tuition', 'course', 'udemy', 'fees', 'stationery', 'coaching', 'notebook', 'exam'],
+}
+
+FILLER = ['ka', 'ke', 'ki', 'for', 'and', 'with', 'at', 'aaj', 'kal', 'wala', 'liya', 'diya']
+
+NATURAL_TEMPLATES = [
+    'spent {amount} on {word} today',
+    'paid {amount} for {word}',
+    'aaj {word} pe {amount} kharch kiye',
+    'kal {amount} ka {word} liya',
+    '{word} cost me {amount} rupees',
+    'gave {amount} to the {word} guy',
+]
+
+WORD_RE = re.compile(r'[a-z]+')
+EXPENSE_TEXT_RE = re.compile(r'Expense text: "([^"]*)"')
+MESSAGE_RE = re.compile(r'message:\s*"([^"]*)"')
+AMOUNT_RE = re.compile(r'\d+(?:\.\d+)?')
+
+
+class StubGeminiClient:
+    """Deterministic stand-in for ``genai.Client`` answering the parser's prompts."""
+
+    def __init__(self, latency_ms=0):
+        self.latency = latency_ms / 1000.0
+        self.calls = 0
+        self.models = self
+        self.category_by_word = {word: name for name, words in VOCABULARY.items() for word in words}
+
+    def generate_content(self, model=None, contents='', config=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        if 'Items:' in contents:
+            items = [json.loads(line) for line in contents.split('Items:\n', 1)[1].split('\n\n', 1)[0].splitlines()]
+            payload = [dict(self._answer(item['text']), id=item['id']) for item in items]
+        else:
+            match = EXPENSE_TEXT_RE.search(contents) or MESSAGE_RE.search(contents)
+            payload = self._answer(match.group(1) if match else '')
+        return SimpleNamespace(text=json.dumps(payload))
+
+    def _answer(self, text):
+        lowered = text.lower()
+        amount = AMOUNT_RE.search(lowered)
+        words = WORD_RE.findall(lowered)
+        category = next((self.category_by_word[word] for word in words if word in self.category_by_word), 'Other')
+        description = next((word for word in words if word in self.category_by_word), ' '.join(words[:2]))
+        return {
+            'amount': float(amount.group(0)) if amount else 0,
+            'category': category,
+            'description': description or 'Unable to categorize',
+        }
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark categorization throughput, latency and query count on a synthetic database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Synthetic users')
+        parser.add_argument('--keywords', type=int, default=40, help='Learned keywords per user')
+        parser.add_argument('--history', type=int, default=30, help='Past expenses per user (classifier data)')
+        parser.add_argument('--messages', type=int, default=5000, help='Messages in the corpus')
+        parser.add_argument(
+            '--max-queries',
+            type=float,
+            default=1.5,
+            help='Fail when the average number of queries per message exceeds this',
+        )
+        parser.add_argument(
+            '--gemini-latency-ms',
+            type=float,
+            default=0,
+            help='Simulated latency of each stubbed Gemini call',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        stub = StubGeminiClient(latency_ms=options['gemini_latency_ms'])
+        isolated = override_settings(
+            GEMINI_API_KEY='benchmark',
+            # One message at a time here, so a batch window would only add latency.
+            GEMINI_BATCH_ENABLED=False,
+            EXPENSE_KEYWORD_LEARNING_DEFERRED=False,
+            EXPENSE_CLASSIFIER_LEARNING_DEFERRED=False,
+            # Keep synthetic traffic out of the shared pipeline counters.
+            PIPELINE_METRICS_FLUSH_INTERVAL=0,
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+                'gemini': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-gemini'},
+            },
+        )
+
+        self._reset_process_caches()
+        previous_disable = logging.root.manager.disable
+        logging.disable(logging.INFO)
+        try:
+            with isolated, mock.patch.object(gemini_client, 'build_client', return_value=stub):
+                with transaction.atomic():
+                    report = self._run(rng, stub, options)
+                    raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            logging.disable(previous_disable)
+            self._reset_process_caches()
+
+        self._print_report(report)
+
+        if report['queries_per_message'] > options['max_queries']:
+            raise CommandError(
+                f"Query budget exceeded: {report['queries_per_message']:.2f} queries/message "
+                f"> {options['max_queries']:.2f}"
+            )
+        self.stdout.write(self.style.SUCCESS('✅ Benchmark complete, within query budget.'))
+
+    def _reset_process_caches(self):
+        categorization_index.reset_indexes()
+        expense_classifier.reset_models()
+        global_keywords.reset_table()
+        gemini_cache.clear_local()
+        gemini_client.reset_clients()
+        gemini_client.gemini_breaker.reset()
+
+    def _run(self, rng, stub, options):
+        started = time.perf_counter()
+        users, user_keywords = self._build_database(rng, options)
+        self.stdout.write(
+            f"🔧 Synthetic database: {len(users)} users, {options['keywords']} keywords and "
+            f"{options['history']} expenses each ({time.perf_counter() - started:.1f}s)"
+        )
+
+        corpus = [self._build_message(rng, users, user_keywords) for _ in range(options['messages'])]
+
+        query_count = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal query_count
+            query_count += 1
+            return execute(sql, params, many, context)
+
+        latencies = []
+        queries = []
+        tiers = Counter()
+        tier_queries = defaultdict(int)
+
+        with connection.execute_wrapper(count_queries):
+            started = time.perf_counter()
+            for user, text, _ in corpus:
+                before = query_count
+                message_started = time.perf_counter()
+                outcome = CategorizationPipeline(user).run(text)
+                latencies.append((time.perf_counter() - message_started) * 1000)
+                queries.append(query_count - before)
+                tier = outcome.tier or 'none'
+                tiers[tier] += 1
+                tier_queries[tier] += query_count - before
+            elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        kinds = Counter(kind for _, _, kind in corpus)
+        return {
+            'messages': len(corpus),
+            'kinds': kinds,
+            'elapsed': elapsed,
+            'p50': statistics.median(latencies),
+            'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            'queries_per_message': sum(queries) / len(queries),
+            'max_queries': max(queries),
+            'tiers': tiers,
+            'tier_queries': tier_queries,
+            'gemini_calls': stub.calls,
+        }
+
+    def _build_database(self, rng, options):
+        all_words = [(name, word) for name, words in VOCABULARY.items() for word in words]
+        today = timezone.now().date()
+
+        users = User.objects.bulk_create(
+            [User(username=f"benchmark-{n}-{rng.getrandbits(32):08x}") for n in range(options['users'])]
+        )
+
+        categories = Category.objects.bulk_create(
+            [Category(user=user, name=name, icon='💰') for user in users for name in CATEGORY_NAMES]
+        )
+        by_user = defaultdict(dict)
+        for category in categories:
+            by_user[category.user_id][category.name] = category
+
+        keyword_rows = []
+        expense_rows = []
+        user_keywords = {}
+        for user in users:
+            learned = rng.sample(all_words, min(options['keywords'], len(all_words)))
+            user_keywords[user.pk] = [word for _, word in learned]
+            keyword_rows.extend(
+                CategoryKeyword(category=by_user[user.pk][name], keyword=word, added_by='user')
+                for name, word in learned
+            )
+            for _ in range(options['history']):
+                name, word = rng.choice(all_words)
+                expense_rows.append(
+                    Expense(
+                        user=user,
+                        category=by_user[user.pk][name],
+                        amount=rng.randint(10, 2000),
+                        description=f"{word} {rng.choice(FILLER)}",
+                        date=today - timedelta(days=rng.randint(0, 90)),
+                        source='whatsapp',
+                    )
+                )
+
+        CategoryKeyword.objects.bulk_create(keyword_rows, batch_size=2000)
+        Expense.objects.bulk_create(expense_rows, batch_size=2000)
+        GlobalKeywordCategory.objects.all().delete()
+        GlobalKeywordCategory.objects.bulk_create(
+            [
+                GlobalKeywordCategory(keyword=word, category_name=name, users=len(users), share=1.0)
+                for name, word in all_words[::2]
+            ]
+        )
+        expense_classifier.train_global_model()
+        # Per-user models are trained in the background in production; a
+        # background thread can't see this uncommitted data, so train up front.
+        for user in users:
+            expense_classifier.train_user_model(user.pk)
+        return users, user_keywords
+
+    def _build_message(self, rng, users, user_keywords):
+        user = rng.choice(users)
+        amount = rng.choice([rng.randint(10, 500), rng.randint(500, 5000)])
+        category_word = rng.choice([name for name in CATEGORY_NAMES if name != 'Other'])
+        word = rng.choice(VOCABULARY[category_word])
+        kind = rng.choices(
+            ['category', 'keyword', 'hinglish', 'multi', 'typo', 'natural', 'unseen'],
+            weights=[15, 30, 15, 10, 10, 10, 10],
+        )[0]
+
+        if kind == 'category':
+            text = f"{amount} {category_word.lower()} {rng.choice(['', word])}"
+        elif kind == 'keyword':
+            text = f"{amount} {rng.choice(user_keywords[user.pk])}"
+        elif kind == 'hinglish':
+            text = f"{amount} {word} {rng.choice(FILLER)} {rng.choice(['', 'aaj', 'kal', 'ghar'])}"
+        elif kind == 'multi':
+            parts = []
+            for _ in range(rng.randint(2, 5)):
+                parts.append(f"{rng.randint(10, 900)} {rng.choice(user_keywords[user.pk])}")
+            text = rng.choice([' ', ', ', ' and ']).join(parts)
+        elif kind == 'typo':
+            typo = self._typo(rng, category_word.lower() if rng.random() < 0.5 else word)
+            text = f"{amount} {typo}"
+        elif kind == 'natural':
+            text = rng.choice(NATURAL_TEMPLATES).format(amount=amount, word=word)
+        else:
+            merchant = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(5, 9)))
+            text = f"{amount} {merchant} {rng.choice(['', word, 'store', 'order'])}"
+        return user, ' '.join(text.split()), kind
+
+    def _typo(self, rng, word):
+        if len(word) < 4:
+            return word + word[-1]
+        position = rng.randrange(1, len(word) - 1)
+        edit = rng.choice(['drop', 'swap', 'double'])
+        if edit == 'drop':
+            return word[:position] + word[position + 1:]
+        if edit == 'swap':
+            return word[:position] + word[position + 1] + word[position] + word[position + 2:]
+        return word[:position] + word[position] + word[position:]
+
+    def _print_report(self, report):
+        messages = report['messages']
+        self.stdout.write(
+            "📝 Corpus: " + ', '.join(f"{kind} {count}" for kind, count in sorted(report['kinds'].items()))
+        )
+        self.stdout.write(
+            f"⚡ {messages / report['elapsed']:,.0f} msg/s over {messages} messages  "
+            f"p50 {report['p50']:.2f} ms  p95 {report['p95']:.2f} ms"
+        )
+        self.stdout.write(
+            f"🗄️ {report['queries_per_message']:.2f} queries/message (max {report['max_queries']}), "
+            f"{report['gemini_calls']} stubbed Gemini call(s)"
+        )
+        for tier, count in report['tiers'].most_common():
+            self.stdout.write(
+                f"• {tier:<18} {count:>6}  {count / messages:>6.1%}  "
+                f"{report['tier_queries'][tier] / count:.2f} queries/msg"
+            )
@@ -0,0 +1,75 @@
+"""
+Management command to send queued outbound WhatsApp messages.
+
+Usage:
+    python manage.py dispatch_outbound_messages
+    python manage.py dispatch_outbound_messages --workers 8 --batch-size 100
+    python manage.py dispatch_outbound_messages --once
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from whatsapp_integration.outbound_dispatcher import claim_due, deliver_safely
+from whatsapp_integration.whatsapp_service import WhatsAppService
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbound WhatsApp messages with rate limiting and retries'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of concurrent sender threads',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Messages claimed per poll',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=0.5,
+            help='Seconds to wait between polls when nothing is due',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once no messages are due instead of polling forever',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        service = WhatsAppService()
+
+        self.stdout.write(f"📤 Dispatching outbound messages with {workers} worker(s)...")
+
+        sent = 0
+        not_sent = 0
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='outbound') as executor:
+            try:
+                while True:
+                    batch = claim_due(limit=options['batch_size'])
+                    if not batch:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    for ok in executor.map(lambda outbound: deliver_safely(outbound, service=service), batch):
+                        if ok:
+                            sent += 1
+                        else:
+                            not_sent += 1
+            except KeyboardInterrupt:
+                self.stdout.write(self.style.WARNING('Interrupted, finishing in-flight messages...'))
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Done! Sent {sent} message(s), {not_sent} deferred or dead-lettered.")
+        )
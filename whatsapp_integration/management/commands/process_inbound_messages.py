@@ -0,0 +1,118 @@
+"""
+Management command to drain the inbound WhatsApp webhook queue.
+
+Usage:
+    python manage.py process_inbound_messages
+    python manage.py process_inbound_messages --workers 8 --pool process
+    python manage.py process_inbound_messages --once
+"""
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def _init_process_worker():
+    """Configure Django inside a freshly spawned worker process."""
+    import django
+
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = 'Process queued WhatsApp webhook deliveries with a thread or process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'WHATSAPP_INBOUND_WORKERS', 4),
+            help='Number of concurrent workers',
+        )
+        parser.add_argument(
+            '--pool',
+            choices=['thread', 'process'],
+            default=getattr(settings, 'WHATSAPP_INBOUND_POOL', 'thread'),
+            help='Worker pool type',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds to wait between polls when the queue is empty',
+        )
+        parser.add_argument(
+            '--visibility-timeout',
+            type=int,
+            default=getattr(settings, 'WHATSAPP_INBOUND_VISIBILITY_TIMEOUT', 300),
+            help='Seconds before a message stuck in processing is reclaimed',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once the queue is drained instead of polling forever',
+        )
+
+    def handle(self, *args, **options):
+        from whatsapp_integration import expense_classifier, metrics
+        from whatsapp_integration.inbound_queue import claim_batch, process_inbound_message
+
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        visibility_timeout = options['visibility_timeout']
+
+        if options['pool'] == 'process':
+            # Never share the parent's database sockets with child processes.
+            connections.close_all()
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_process_worker,
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='inbound')
+
+        self.stdout.write(f"📥 Processing inbound messages with {workers} {options['pool']} worker(s)...")
+
+        processed = 0
+        failed = 0
+        in_flight = set()
+
+        try:
+            while True:
+                capacity = workers * 2 - len(in_flight)
+                if capacity > 0:
+                    for inbound_id in claim_batch(limit=capacity, visibility_timeout=visibility_timeout):
+                        in_flight.add(executor.submit(process_inbound_message, inbound_id))
+
+                if not in_flight:
+                    if options['once']:
+                        break
+                    time.sleep(poll_interval)
+                    continue
+
+                done, in_flight = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        ok = future.result()
+                    except Exception as exc:
+                        ok = False
+                        self.stderr.write(f"Worker error: {exc}")
+                    if ok:
+                        processed += 1
+                    else:
+                        failed += 1
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted, waiting for in-flight messages...'))
+        finally:
+            executor.shutdown(wait=True)
+            # Publish the last pipeline counters and classifier updates before exiting.
+            metrics.flush()
+            expense_classifier.learning_buffer.flush()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ Done! Processed {processed} message(s), {failed} failed.")
+        )
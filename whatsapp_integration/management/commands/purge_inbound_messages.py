@@ -0,0 +1,29 @@
+"""
+Management command to purge processed deliveries from the inbound webhook queue.
+
+Usage:
+    python manage.py purge_inbound_messages
+    python manage.py purge_inbound_messages --retention-hours 6
+"""
+from django.core.management.base import BaseCommand
+
+from whatsapp_integration.inbound_queue import purge_done
+
+
+class Command(BaseCommand):
+    help = 'Delete processed inbound WhatsApp deliveries older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-hours',
+            type=int,
+            help='Override WHATSAPP_INBOUND_RETENTION (in hours)',
+        )
+
+    def handle(self, *args, **options):
+        retention_hours = options.get('retention_hours')
+        retention_seconds = retention_hours * 3600 if retention_hours is not None else None
+
+        deleted = purge_done(retention_seconds=retention_seconds)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Purged {deleted} processed inbound message(s)."))
@@ -0,0 +1,29 @@
+"""
+Management command to purge sent messages from the outbound WhatsApp queue.
+
+Usage:
+    python manage.py purge_outbound_messages
+    python manage.py purge_outbound_messages --retention-hours 48
+"""
+from django.core.management.base import BaseCommand
+
+from whatsapp_integration.outbound_dispatcher import purge_sent
+
+
+class Command(BaseCommand):
+    help = 'Delete sent outbound WhatsApp messages older than the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-hours',
+            type=int,
+            help='Override WHATSAPP_OUTBOUND_RETENTION (in hours)',
+        )
+
+    def handle(self, *args, **options):
+        retention_hours = options.get('retention_hours')
+        retention_seconds = retention_hours * 3600 if retention_hours is not None else None
+
+        deleted = purge_sent(retention_seconds=retention_seconds)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Purged {deleted} sent outbound message(s)."))
@@ -0,0 +1,29 @@
+"""
+Management command to purge expired entries from the processed-message ledger.
+
+Usage:
+    python manage.py purge_processed_messages
+    python manage.py purge_processed_messages --ttl-hours 48
+"""
+from django.core.management.base import BaseCommand
+
+from whatsapp_integration.message_ledger import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Delete processed WhatsApp message ids older than the ledger TTL'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ttl-hours',
+            type=int,
+            help='Override WHATSAPP_MESSAGE_LEDGER_TTL (in hours)',
+        )
+
+    def handle(self, *args, **options):
+        ttl_hours = options.get('ttl_hours')
+        ttl_seconds = ttl_hours * 3600 if ttl_hours is not None else None
+
+        deleted = purge_expired(ttl_seconds=ttl_seconds)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Purged {deleted} processed message id(s)."))
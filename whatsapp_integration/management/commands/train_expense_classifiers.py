@@ -0,0 +1,74 @@
+"""
+Management command to (re)train the local expense classifiers.
+
+Rebuilds the global prior from every user's expense descriptions and then
+each user's own model. Per-user models also train lazily on first use and
+update incrementally, so schedule this nightly to refresh the global prior
+and recalibrate confidence.
+
+Usage:
+    python manage.py train_expense_classifiers
+    python manage.py train_expense_classifiers --user 42
+    python manage.py train_expense_classifiers --global-only
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from expenses.models import Expense
+from whatsapp_integration import expense_classifier
+
+
+class Command(BaseCommand):
+    help = 'Train the global and per-user naive Bayes expense classifiers'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            action='append',
+            dest='users',
+            help='Only retrain this user id (repeatable); skips the global prior',
+        )
+        parser.add_argument(
+            '--global-only',
+            action='store_true',
+            help='Only retrain the global prior',
+        )
+
+    def handle(self, *args, **options):
+        if not expense_classifier.available():
+            raise CommandError('numpy is not installed or EXPENSE_CLASSIFIER_ENABLED is off')
+
+        if not options['users']:
+            started = time.perf_counter()
+            model = expense_classifier.train_global_model()
+            if model is None:
+                self.stdout.write(self.style.WARNING('No labelled expenses yet; global prior not trained.'))
+            else:
+                self.stdout.write(
+                    f"🌍 Global prior: {model.n_examples} examples, {len(model.labels)} categories, "
+                    f"{len(model.vocabulary)} tokens, temperature {model.temperature:.2f} "
+                    f"({time.perf_counter() - started:.1f}s)"
+                )
+
+        if options['global_only']:
+            self.stdout.write(self.style.SUCCESS('✅ Done!'))
+            return
+
+        user_ids = options['users'] or (
+            Expense.objects
+            .filter(is_deleted=False)
+            .exclude(description='')
+            .values_list('user_id', flat=True)
+            .distinct()
+            .order_by('user_id')
+        )
+
+        trained = 0
+        for user_id in user_ids:
+            model = expense_classifier.train_user_model(user_id)
+            if model is not None:
+                trained += 1
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Done! Trained {trained} user model(s)."))
@@ -0,0 +1,119 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ProcessedMessage
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+def _ttl_seconds():
+    return getattr(settings, 'WHATSAPP_MESSAGE_LEDGER_TTL', DEFAULT_TTL_SECONDS)
+
+
+class RecentMessageCache:
+    """Thread-safe LRU of recently seen message ids with per-entry expiry."""
+
+    def __init__(self, max_size=10000, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, message_id):
+        with self._lock:
+            expires_at = self._entries.get(message_id)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[message_id]
+                return False
+            self._entries.move_to_end(message_id)
+            return True
+
+    def add(self, message_id):
+        with self._lock:
+            self._entries[message_id] = time.monotonic() + self.ttl_seconds
+            self._entries.move_to_end(message_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_recent_messages = RecentMessageCache(
+    max_size=getattr(settings, 'WHATSAPP_MESSAGE_LEDGER_LRU_SIZE', 10000),
+    ttl_seconds=_ttl_seconds(),
+)
+
+
+def _lease_seconds():
+    return getattr(settings, 'WHATSAPP_INBOUND_VISIBILITY_TIMEOUT', 300)
+
+
+def claim_message(message_id, claimed_by=''):
+    """
+    Claim ``message_id`` for processing.
+
+    Returns True when the caller should process the message and False when it
+    was already handled or another worker is handling it right now. The claim
+    is only an in-flight marker: call ``complete_message`` once processing
+    returns. An unfinished claim can be taken over by the same ``claimed_by``
+    (the inbound queue re-running a delivery whose worker died) or by anyone
+    once it is older than the inbound visibility timeout, so a crash mid-batch
+    never turns the messages it had not finished into "duplicates".
+    """
+    if not message_id:
+        return True
+
+    if message_id in _recent_messages:
+        return False
+
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            ProcessedMessage.objects.create(message_id=message_id, claimed_by=claimed_by, claimed_at=now)
+        return True
+    except IntegrityError:
+        pass
+
+    takeover = Q(claimed_at__lt=now - timedelta(seconds=_lease_seconds()))
+    if claimed_by:
+        takeover |= Q(claimed_by=claimed_by)
+    taken = (
+        ProcessedMessage.objects
+        .filter(takeover, message_id=message_id, completed_at__isnull=True)
+        .update(claimed_by=claimed_by, claimed_at=now)
+    )
+    return bool(taken)
+
+
+def complete_message(message_id):
+    """Record a claimed message as handled, so later deliveries of it are dropped."""
+    if not message_id:
+        return
+
+    ProcessedMessage.objects.filter(message_id=message_id).update(completed_at=timezone.now())
+    _recent_messages.add(message_id)
+
+
+def purge_expired(ttl_seconds=None):
+    """Delete ledger rows older than the TTL and return how many were removed."""
+    ttl_seconds = _ttl_seconds() if ttl_seconds is None else ttl_seconds
+    cutoff = timezone.now() - timedelta(seconds=ttl_seconds)
+    deleted, _ = ProcessedMessage.objects.filter(created_at__lt=cutoff).delete()
+    logger.info('Purged %d processed message id(s) older than %s', deleted, cutoff)
+    return deleted
@@ -0,0 +1,104 @@
+"""
+Counters for the message pipeline.
+
+``incr`` is a cheap in-memory increment. Parsing happens in the inbound worker
+while ``whatsapp/metrics/`` is served by the web process, so each process also
+flushes its new increments to the shared ``PipelineCounter`` table every
+``PIPELINE_METRICS_FLUSH_INTERVAL`` seconds from a background thread; the
+worker commands also flush on shutdown. ``snapshot()`` reports those shared totals plus this process's
+unflushed increments; ``get()`` stays a per-process count.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections
+
+
+logger = logging.getLogger(__name__)
+
+
+_counters = Counter()
+_pending = Counter()
+_lock = threading.Lock()
+_flush_thread = None
+
+
+def _flush_interval():
+    """Seconds between flushes to the shared table; 0 keeps counters in-process only."""
+    return getattr(settings, 'PIPELINE_METRICS_FLUSH_INTERVAL', 10)
+
+
+def incr(name, amount=1):
+    with _lock:
+        _counters[name] += amount
+        if _flush_interval() > 0:
+            _pending[name] += amount
+            _ensure_flush_thread()
+
+
+def get(name):
+    with _lock:
+        return _counters[name]
+
+
+def flush():
+    """Add this process's unflushed increments to the shared counters."""
+    from .models import PipelineCounter
+
+    with _lock:
+        pending = +_pending
+        _pending.clear()
+    if not pending:
+        return 0
+
+    try:
+        PipelineCounter.objects.add(pending)
+    except Exception:
+        logger.exception('Failed flushing %d pipeline counter(s)', len(pending))
+        with _lock:
+            _pending.update(pending)
+        return 0
+    return len(pending)
+
+
+def _ensure_flush_thread():
+    global _flush_thread
+
+    if _flush_thread is None or not _flush_thread.is_alive():
+        _flush_thread = threading.Thread(target=_run_flusher, name='pipeline-metrics', daemon=True)
+        _flush_thread.start()
+
+
+def _run_flusher():
+    while True:
+        time.sleep(_flush_interval() or 10)
+        close_old_connections()
+        try:
+            flush()
+        finally:
+            close_old_connections()
+
+
+def snapshot(prefix=''):
+    """Counters summed across every process (this process alone if the table can't be read)."""
+    from .models import PipelineCounter
+
+    with _lock:
+        totals = Counter(_pending) if _flush_interval() > 0 else Counter(_counters)
+    if _flush_interval() > 0:
+        try:
+            totals.update(dict(PipelineCounter.objects.values_list('name', 'value')))
+        except Exception:
+            logger.exception('Failed reading shared pipeline counters')
+            with _lock:
+                totals = Counter(_counters)
+    return {name: value for name, value in sorted(totals.items()) if name.startswith(prefix)}
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _pending.clear()
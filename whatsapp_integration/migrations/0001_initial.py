@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboundMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Inbound Message',
+                'verbose_name_plural': 'Inbound Messages',
+                'db_table': 'whatsapp_inbound_messages',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='whatsapp_in_status_14e286_idx'), models.Index(fields=['status', 'updated_at'], name='whatsapp_in_status_46ee10_idx')],
+            },
+        ),
+    ]
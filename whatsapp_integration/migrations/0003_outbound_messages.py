@@ -0,0 +1,60 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_integration', '0002_processed_message'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundDeadLetter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number_id', models.CharField(max_length=32)),
+                ('to_number', models.CharField(max_length=20)),
+                ('kind', models.CharField(choices=[('text', 'Text'), ('template', 'Template')], max_length=10)),
+                ('payload', models.JSONField(default=dict)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('status_code', models.PositiveIntegerField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('queued_at', models.DateTimeField()),
+                ('failed_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Outbound Dead Letter',
+                'verbose_name_plural': 'Outbound Dead Letters',
+                'db_table': 'whatsapp_outbound_dead_letters',
+                'ordering': ['-failed_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='OutboundMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number_id', models.CharField(max_length=32)),
+                ('to_number', models.CharField(max_length=20)),
+                ('kind', models.CharField(choices=[('text', 'Text'), ('template', 'Template')], default='text', max_length=10)),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sending', 'Sending'), ('sent', 'Sent')], default='pending', max_length=10)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('provider_message_id', models.CharField(blank=True, default='', max_length=128)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Outbound Message',
+                'verbose_name_plural': 'Outbound Messages',
+                'db_table': 'whatsapp_outbound_messages',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='whatsapp_ou_status_a99b15_idx'), models.Index(fields=['status', 'updated_at'], name='whatsapp_ou_status_e5c082_idx')],
+            },
+        ),
+    ]
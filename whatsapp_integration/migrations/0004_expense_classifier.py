@@ -0,0 +1,36 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_integration', '0003_outbound_messages'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseClassifier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=32, unique=True)),
+                ('labels', models.JSONField(default=list)),
+                ('vocabulary', models.JSONField(default=list)),
+                ('counts', models.BinaryField()),
+                ('temperature', models.FloatField(default=1.0)),
+                ('n_examples', models.PositiveIntegerField(default=0)),
+                ('trained_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='expense_classifier', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Expense Classifier',
+                'verbose_name_plural': 'Expense Classifiers',
+                'db_table': 'whatsapp_expense_classifiers',
+            },
+        ),
+    ]
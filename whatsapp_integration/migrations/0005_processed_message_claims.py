@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:51
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F
+
+
+def complete_existing_ids(apps, schema_editor):
+    """Ids recorded before claims existed were all fully handled."""
+    ProcessedMessage = apps.get_model('whatsapp_integration', 'ProcessedMessage')
+    ProcessedMessage.objects.update(claimed_at=F('created_at'), completed_at=F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_integration', '0004_expense_classifier'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processedmessage',
+            name='claimed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='processedmessage',
+            name='claimed_by',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='processedmessage',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(complete_existing_ids, migrations.RunPython.noop),
+    ]
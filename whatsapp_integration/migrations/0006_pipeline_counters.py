@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('whatsapp_integration', '0005_processed_message_claims'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PipelineCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Pipeline Counter',
+                'verbose_name_plural': 'Pipeline Counters',
+                'db_table': 'whatsapp_pipeline_counters',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -1,3 +1,196 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils import timezone
 
-# Create your models here.
+
+class InboundMessage(models.Model):
+    """Raw webhook delivery queued for background processing."""
+    STATUS_PENDING = 'pending'
+    STATUS_PROCESSING = 'processing'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_PROCESSING, 'Processing'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'whatsapp_inbound_messages'
+        verbose_name = 'Inbound Message'
+        verbose_name_plural = 'Inbound Messages'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Inbound #{self.id} ({self.status})"
+
+
+class ProcessedMessage(models.Model):
+    """
+    Ledger of WhatsApp message ids.
+
+    A row without ``completed_at`` is an in-flight claim held by ``claimed_by``;
+    it only becomes a permanent "already handled" marker once processing returns.
+    """
+    message_id = models.CharField(max_length=128, unique=True)
+    claimed_by = models.CharField(max_length=64, blank=True, default='')
+    claimed_at = models.DateTimeField(default=timezone.now)
+    completed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = 'whatsapp_processed_messages'
+        verbose_name = 'Processed Message'
+        verbose_name_plural = 'Processed Messages'
+
+    def __str__(self):
+        return self.message_id
+
+
+class OutboundMessage(models.Model):
+    """Outgoing Graph API message waiting for the rate-limited dispatcher."""
+    KIND_TEXT = 'text'
+    KIND_TEMPLATE = 'template'
+    KIND_CHOICES = [
+        (KIND_TEXT, 'Text'),
+        (KIND_TEMPLATE, 'Template'),
+    ]
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT, 'Sent'),
+    ]
+
+    phone_number_id = models.CharField(max_length=32)
+    to_number = models.CharField(max_length=20)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=KIND_TEXT)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    provider_message_id = models.CharField(max_length=128, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'whatsapp_outbound_messages'
+        verbose_name = 'Outbound Message'
+        verbose_name_plural = 'Outbound Messages'
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"Outbound #{self.id} to {self.to_number} ({self.status})"
+
+
+class OutboundDeadLetter(models.Model):
+    """Outgoing message that exhausted its retries or was rejected by Meta."""
+    phone_number_id = models.CharField(max_length=32)
+    to_number = models.CharField(max_length=20)
+    kind = models.CharField(max_length=10, choices=OutboundMessage.KIND_CHOICES)
+    payload = models.JSONField(default=dict)
+    attempts = models.PositiveIntegerField(default=0)
+    status_code = models.PositiveIntegerField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+    queued_at = models.DateTimeField()
+    failed_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'whatsapp_outbound_dead_letters'
+        verbose_name = 'Outbound Dead Letter'
+        verbose_name_plural = 'Outbound Dead Letters'
+        ordering = ['-failed_at']
+
+    def __str__(self):
+        return f"Dead letter #{self.id} to {self.to_number}"
+
+
+class ExpenseClassifier(models.Model):
+    """Persisted naive Bayes token counts for one user, or the global prior."""
+    GLOBAL_KEY = 'global'
+
+    key = models.CharField(max_length=32, unique=True)
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='expense_classifier',
+        blank=True,
+        null=True,
+    )
+    labels = models.JSONField(default=list)
+    vocabulary = models.JSONField(default=list)
+    counts = models.BinaryField()
+    temperature = models.FloatField(default=1.0)
+    n_examples = models.PositiveIntegerField(default=0)
+    trained_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'whatsapp_expense_classifiers'
+        verbose_name = 'Expense Classifier'
+        verbose_name_plural = 'Expense Classifiers'
+
+    def __str__(self):
+        return f"Classifier {self.key} ({self.n_examples} examples)"
+
+    @staticmethod
+    def key_for_user(user_id):
+        return f'user:{user_id}'
+
+
+class PipelineCounterManager(models.Manager):
+    def add(self, deltas):
+        """Add ``{name: amount}`` to the shared counters."""
+        for name, amount in deltas.items():
+            if not amount:
+                continue
+            rows = self.filter(name=name)
+            if rows.update(value=F('value') + amount, updated_at=timezone.now()):
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(name=name, value=amount)
+            except IntegrityError:
+                # Created concurrently by another process since the update above
+                rows.update(value=F('value') + amount, updated_at=timezone.now())
+
+
+class PipelineCounter(models.Model):
+    """Pipeline counter summed across every web and worker process (see ``metrics``)."""
+    name = models.CharField(max_length=100, unique=True)
+    value = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PipelineCounterManager()
+
+    class Meta:
+        db_table = 'whatsapp_pipeline_counters'
+        verbose_name = 'Pipeline Counter'
+        verbose_name_plural = 'Pipeline Counters'
+        ordering = ['name']
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -0,0 +1,294 @@
+"""
+Rate-limited outbound message dispatch.
+
+Replies, OTPs and reminders are written to ``whatsapp_outbound_messages`` and
+sent by ``python manage.py dispatch_outbound_messages``. The dispatcher keeps a
+token bucket per phone number id, retries 429/5xx responses with exponential
+backoff and full jitter, and moves messages that cannot be delivered to
+``whatsapp_outbound_dead_letters``.
+"""
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import OutboundDeadLetter, OutboundMessage
+from .whatsapp_service import WhatsAppService
+
+
+logger = logging.getLogger(__name__)
+
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _queue_enabled():
+    return getattr(settings, 'WHATSAPP_OUTBOUND_QUEUE_ENABLED', True)
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(self, rate, capacity):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available; return the seconds to wait otherwise."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        """Block until a token is available."""
+        while True:
+            wait_seconds = self.try_acquire()
+            if not wait_seconds:
+                return
+            time.sleep(wait_seconds)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(phone_number_id):
+    """Return the token bucket that throttles sends for one business phone number."""
+    with _buckets_lock:
+        bucket = _buckets.get(phone_number_id)
+        if bucket is None:
+            bucket = TokenBucket(
+                rate=getattr(settings, 'WHATSAPP_OUTBOUND_RATE_PER_SECOND', 20),
+                capacity=getattr(settings, 'WHATSAPP_OUTBOUND_BURST', 40),
+            )
+            _buckets[phone_number_id] = bucket
+        return bucket
+
+
+def compute_backoff(attempt):
+    """Exponential backoff with full jitter, in seconds."""
+    base = getattr(settings, 'WHATSAPP_OUTBOUND_BACKOFF_BASE', 2)
+    cap = getattr(settings, 'WHATSAPP_OUTBOUND_BACKOFF_CAP', 300)
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+DEFAULT_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+
+def _enqueue(kind, payload, service, **fields):
+    return OutboundMessage.objects.create(
+        phone_number_id=service.phone_number_id or '',
+        to_number=payload['to'],
+        kind=kind,
+        payload=payload,
+        **fields,
+    )
+
+
+def queue_text_message(to_number, message):
+    """
+    Queue a text message for delivery.
+
+    Returns the queued ``OutboundMessage`` (or the direct send result when the
+    queue is disabled), and None when the number is invalid.
+    """
+    service = WhatsAppService()
+    if not _queue_enabled():
+        return service.send_message(to_number, message)
+
+    payload = service.build_text_payload(to_number, message)
+    if not payload:
+        logger.error('Invalid phone number provided')
+        return None
+    return _enqueue(OutboundMessage.KIND_TEXT, payload, service)
+
+
+def queue_template_message(to_number, template_name, language_code='en', parameters=None):
+    """Queue a template message for delivery; see ``queue_text_message``."""
+    service = WhatsAppService()
+    if not _queue_enabled():
+        return service.send_template_message(to_number, template_name, language_code, parameters)
+
+    payload = service.build_template_payload(to_number, template_name, language_code, parameters)
+    if not payload:
+        logger.error('Invalid phone number provided')
+        return None
+    return _enqueue(OutboundMessage.KIND_TEMPLATE, payload, service)
+
+
+def send_text_message_now(to_number, message, service=None):
+    """
+    Send a text message right away through the dispatcher's send path.
+
+    For messages the user is waiting on (login OTPs): the message is recorded
+    and delivered in the calling thread, and True is returned only once Meta
+    accepted it. A retryable failure leaves it queued for the dispatcher.
+    """
+    service = service or WhatsAppService()
+    if not _queue_enabled():
+        return bool(service.send_message(to_number, message))
+
+    payload = service.build_text_payload(to_number, message)
+    if not payload:
+        logger.error('Invalid phone number provided')
+        return False
+
+    outbound = _enqueue(
+        OutboundMessage.KIND_TEXT, payload, service,
+        status=OutboundMessage.STATUS_SENDING,
+        attempts=1,
+    )
+    try:
+        return deliver(outbound, service=service)
+    except Exception as exc:
+        logger.exception('Unexpected error sending outbound message %s', outbound.id)
+        _schedule_retry(outbound, exc)
+        return False
+
+
+def claim_due(limit=50, visibility_timeout=120):
+    """Claim pending messages whose next attempt is due."""
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=visibility_timeout)
+
+    with transaction.atomic():
+        ids = list(
+            OutboundMessage.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(status=OutboundMessage.STATUS_PENDING, next_attempt_at__lte=now)
+                | Q(status=OutboundMessage.STATUS_SENDING, updated_at__lt=stale_before)
+            )
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+
+        OutboundMessage.objects.filter(id__in=ids).update(
+            status=OutboundMessage.STATUS_SENDING,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+
+    return list(OutboundMessage.objects.filter(id__in=ids).order_by('id'))
+
+
+def _dead_letter(outbound, error, status_code=None):
+    with transaction.atomic():
+        OutboundDeadLetter.objects.create(
+            phone_number_id=outbound.phone_number_id,
+            to_number=outbound.to_number,
+            kind=outbound.kind,
+            payload=outbound.payload,
+            attempts=outbound.attempts,
+            status_code=status_code,
+            last_error=str(error)[:2000],
+            queued_at=outbound.created_at,
+        )
+        outbound.delete()
+    logger.error('Dead-lettered outbound message to %s: %s', outbound.to_number, error)
+
+
+def _schedule_retry(outbound, error, retry_after=None):
+    max_attempts = getattr(settings, 'WHATSAPP_OUTBOUND_MAX_ATTEMPTS', 5)
+    if outbound.attempts >= max_attempts:
+        _dead_letter(outbound, error)
+        return
+
+    delay = compute_backoff(outbound.attempts)
+    if retry_after:
+        delay = max(delay, retry_after)
+
+    OutboundMessage.objects.filter(id=outbound.id).update(
+        status=OutboundMessage.STATUS_PENDING,
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+        last_error=str(error)[:2000],
+        updated_at=timezone.now(),
+    )
+    logger.warning('Retrying outbound message %s in %.1fs: %s', outbound.id, delay, error)
+
+
+def _parse_retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def deliver(outbound, service=None):
+    """Send one claimed message, honouring the per-number rate limit."""
+    service = service or WhatsAppService()
+    get_bucket(outbound.phone_number_id).acquire()
+
+    try:
+        response = service.post_message(outbound.payload)
+    except requests.exceptions.RequestException as exc:
+        _schedule_retry(outbound, exc)
+        return False
+
+    if response.status_code == 200:
+        message_id = ''
+        try:
+            message_id = response.json().get('messages', [{}])[0].get('id', '')
+        except ValueError:
+            pass
+        OutboundMessage.objects.filter(id=outbound.id).update(
+            status=OutboundMessage.STATUS_SENT,
+            provider_message_id=message_id,
+            last_error='',
+            sent_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+        return True
+
+    error = f'{response.status_code}: {response.text[:500]}'
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        _schedule_retry(outbound, error, retry_after=_parse_retry_after(response))
+    else:
+        _dead_letter(outbound, error, status_code=response.status_code)
+    return False
+
+
+def deliver_safely(outbound, service=None):
+    """Thread-pool entry point that manages its own database connection."""
+    close_old_connections()
+    try:
+        return deliver(outbound, service=service)
+    except Exception as exc:
+        logger.exception('Unexpected error delivering outbound message %s', outbound.id)
+        _schedule_retry(outbound, exc)
+        return False
+    finally:
+        close_old_connections()
+
+
+def purge_sent(retention_seconds=None):
+    """Delete messages sent longer ago than the retention and return how many were removed."""
+    if retention_seconds is None:
+        retention_seconds = getattr(settings, 'WHATSAPP_OUTBOUND_RETENTION', DEFAULT_RETENTION_SECONDS)
+    cutoff = timezone.now() - timedelta(seconds=retention_seconds)
+    deleted, _ = OutboundMessage.objects.filter(
+        status=OutboundMessage.STATUS_SENT,
+        sent_at__lt=cutoff,
+    ).delete()
+    logger.info('Purged %d sent outbound message(s) older than %s', deleted, cutoff)
+    return deleted
@@ -0,0 +1,86 @@
+"""
+Deferred, coalesced read receipts.
+
+Marking the newest message in a conversation as read implicitly marks every
+earlier one, so receipts are buffered per sender and a background thread sends
+only the latest message id for each conversation.
+"""
+import atexit
+import itertools
+import logging
+import threading
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReadReceiptCoalescer:
+    """Buffer read receipts and flush the newest one per conversation periodically."""
+
+    def __init__(self, send_fn=None, flush_interval=0.5):
+        self._send_fn = send_fn
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def _send(self, message_id):
+        if self._send_fn is None:
+            from .whatsapp_service import WhatsAppService
+
+            self._send_fn = WhatsAppService().mark_message_read
+        return self._send_fn(message_id)
+
+    def mark_read(self, conversation, message_id, timestamp=None):
+        """Queue a read receipt, keeping only the newest message per conversation."""
+        if not message_id:
+            return
+
+        try:
+            timestamp = int(timestamp or 0)
+        except (TypeError, ValueError):
+            timestamp = 0
+
+        key = (timestamp, next(self._sequence))
+        with self._lock:
+            current = self._pending.get(conversation)
+            if current is None or key > current[0]:
+                self._pending[conversation] = (key, message_id)
+            self._ensure_thread()
+
+    def flush(self):
+        """Send every buffered receipt now and return how many were sent."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        sent = 0
+        for conversation, (_, message_id) in pending.items():
+            try:
+                self._send(message_id)
+                sent += 1
+            except Exception:
+                logger.exception('Failed sending read receipt for %s', conversation)
+        return sent
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='read-receipts', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+read_receipts = ReadReceiptCoalescer(
+    flush_interval=getattr(settings, 'WHATSAPP_READ_RECEIPT_FLUSH_INTERVAL', 0.5),
+)
+
+# Don't drop buffered receipts when a worker shuts down.
+atexit.register(read_receipts.flush)
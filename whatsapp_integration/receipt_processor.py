@@ -4,12 +4,15 @@ import logging
 import mimetypes
 import os
 
-import google.genai as genai
 from django.core.cache import cache
 from django.conf import settings
 
 from expenses.models import Category, Expense
 
+from .exceptions import GeminiUnavailableException
+from .gemini_client import generate_content
+from .global_keywords import get_table as get_global_keyword_table
+
 logger = logging.getLogger(__name__)
 
 
@@ -139,10 +142,10 @@ def _get_cache_key(image_data: bytes):
 
 
 def _get_existing_or_other_category(user, category_name):
-    normalized_name = _normalize_category_name(category_name)
-    category = Category.objects.filter(user=user, name__iexact=normalized_name, is_active=True).first()
-    if category:
-        return category
+    for name in dict.fromkeys([(category_name or '').strip(), _normalize_category_name(category_name)]):
+        category = Category.objects.filter(user=user, name__iexact=name, is_active=True).first() if name else None
+        if category:
+            return category
 
     other_category = Category.objects.filter(user=user, name__iexact='Other', is_active=True).first()
     if other_category:
@@ -231,12 +234,12 @@ Rules:
 * If unsure, return fallback JSON
 """
 
-    client = genai.Client(api_key=api_key)
     prompts = [primary_prompt, retry_prompt]
 
     for attempt, prompt in enumerate(prompts, start=1):
         try:
-            response = client.models.generate_content(
+            response = generate_content(
+                api_key,
                 model='gemini-2.5-flash-lite',
                 contents=[
                     {
@@ -283,6 +286,13 @@ Rules:
                 return dict(FALLBACK_EXPENSE)
 
             parsed['category'] = _normalize_category_name(parsed.get('category'))
+            if parsed['category'] == 'Other':
+                # What other users filed this merchant under, instead of a retry prompt
+                known_category = get_global_keyword_table().lookup_text(
+                    f"{parsed.get('merchant', '')} {parsed.get('description', '')}"
+                )
+                if known_category:
+                    parsed['category'] = known_category
             parsed['confidence'] = _calculate_confidence(parsed)
 
             if parsed['confidence'] < 0.5:
@@ -300,6 +310,9 @@ Rules:
             )
             return parsed
 
+        except GeminiUnavailableException as exc:
+            logger.warning('Gemini receipt parse skipped for %s: %s', image_path, exc)
+            return dict(FALLBACK_EXPENSE)
         except Exception as exc:
             err = str(exc).lower()
             if '429' in err or 'quota' in err or 'resource_exhausted' in err:
@@ -0,0 +1,51 @@
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from expenses.models import Category, CategoryKeyword, Expense
+from expenses.signals import expenses_bulk_created
+
+from . import expense_classifier
+from .categorization_index import invalidate_user_index
+
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_index_on_category_change(sender, instance, **kwargs):
+    invalidate_user_index(instance.user_id)
+
+
+@receiver(post_save, sender=CategoryKeyword)
+@receiver(post_delete, sender=CategoryKeyword)
+def invalidate_index_on_keyword_change(sender, instance, **kwargs):
+    try:
+        user_id = instance.category.user_id
+    except Category.DoesNotExist:
+        return
+    invalidate_user_index(user_id)
+
+
+def _learn_expenses(user_id, examples):
+    try:
+        expense_classifier.learn_expenses(user_id, examples)
+    except Exception as e:
+        logger.warning('Expense classifier update failed for user %s: %s', user_id, e)
+
+
+@receiver(post_save, sender=Expense)
+def learn_from_new_expense(sender, instance, created, **kwargs):
+    if not created or instance.is_deleted or not instance.description:
+        return
+    transaction.on_commit(partial(_learn_expenses, instance.user_id, [(instance.category_id, instance.description)]))
+
+
+@receiver(expenses_bulk_created)
+def learn_from_bulk_expenses(sender, user_id, expenses, **kwargs):
+    # Sent after commit already; all of the message's expenses go in as one update.
+    _learn_expenses(user_id, [(expense.category_id, expense.description) for expense in expenses if expense.description])
@@ -1,3 +1,903 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import requests
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from expenses import rollups
+from expenses.models import Category, CategoryKeyword, DailySpend, Expense
+from users.models import User, WhatsAppMapping
+
+from . import (
+    categorization_index,
+    circuit_breaker,
+    expense_classifier,
+    gemini_batcher,
+    gemini_cache,
+    gemini_client,
+    global_keywords,
+    http_session,
+    inbound_queue,
+    message_ledger,
+    metrics,
+    outbound_dispatcher,
+    views,
+)
+from .categorization_pipeline import CategorizationPipeline
+from .expense_handler import ExpenseParser
+from .inbound_queue import purge_done
+from .keyword_matcher import KeywordAutomaton
+from .management.commands.benchmark_parser import StubGeminiClient
+from .models import ExpenseClassifier, InboundMessage, OutboundMessage, PipelineCounter, ProcessedMessage
+from .read_receipts import ReadReceiptCoalescer
+from .views import process_user_message
+from .whatsapp_service import WhatsAppService
+
+
+def _delivery(value):
+    return {'object': 'whatsapp_business_account', 'entry': [{'id': '1', 'changes': [{'value': value}]}]}
+
+
+@override_settings(WHATSAPP_INBOUND_QUEUE_ENABLED=True)
+class InboundQueueTests(TestCase):
+    def _post(self, payload):
+        return self.client.post(reverse('whatsapp_integration:webhook'), json.dumps(payload), content_type='application/json')
+
+    def test_status_callbacks_are_not_queued(self):
+        response = self._post(_delivery({'statuses': [{'id': 'wamid.1', 'status': 'delivered'}]}))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(InboundMessage.objects.exists())
+
+    def test_messages_are_queued(self):
+        self._post(_delivery({'messages': [{'id': 'wamid.2', 'from': '911234567890', 'type': 'text', 'text': {'body': '250 food'}}]}))
+        self.assertEqual(InboundMessage.objects.filter(status=InboundMessage.STATUS_PENDING).count(), 1)
+
+    def test_purge_only_removes_old_done_deliveries(self):
+        old = timezone.now() - timedelta(days=2)
+        done = InboundMessage.objects.create(status=InboundMessage.STATUS_DONE)
+        failed = InboundMessage.objects.create(status=InboundMessage.STATUS_FAILED)
+        recent = InboundMessage.objects.create(status=InboundMessage.STATUS_DONE)
+        InboundMessage.objects.filter(id__in=[done.id, failed.id]).update(updated_at=old)
+
+        self.assertEqual(purge_done(retention_seconds=24 * 60 * 60), 1)
+        self.assertEqual(
+            set(InboundMessage.objects.values_list('id', flat=True)),
+            {failed.id, recent.id},
+        )
+
+
+@override_settings(
+    WHATSAPP_INBOUND_QUEUE_ENABLED=True,
+    WHATSAPP_OUTBOUND_QUEUE_ENABLED=True,
+    WHATSAPP_INBOUND_MAX_ATTEMPTS=2,
+)
+class InboundRetryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='retry', password='secret', whatsapp_number='911234567890')
+        WhatsAppMapping.objects.create(user=cls.user, whatsapp_number='911234567890', is_verified=True)
+        cls.food = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+
+    def setUp(self):
+        message_ledger._recent_messages.clear()
+        categorization_index.reset_indexes()
+        self.addCleanup(categorization_index.reset_indexes)
+        for target, name in ((inbound_queue, 'close_old_connections'), (views.read_receipts, 'mark_read')):
+            patcher = mock.patch.object(target, name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.inbound = inbound_queue.enqueue_payload(
+            _delivery({'messages': [{'id': 'wamid.r', 'from': '911234567890', 'type': 'text', 'text': {'body': '250 food'}}]})
+        )
+
+    def _attempt(self, failures):
+        calls = []
+
+        def flaky(user, text):
+            calls.append(text)
+            if len(calls) <= failures:
+                raise OperationalError('database is locked')
+            return process_user_message(user, text)
+
+        self.assertEqual(inbound_queue.claim_batch(), [self.inbound.id])
+        with mock.patch.object(views, 'process_user_message', side_effect=flaky):
+            return inbound_queue.process_inbound_message(self.inbound.id)
+
+    def _replies(self):
+        return [message.payload['text']['body'] for message in OutboundMessage.objects.order_by('id')]
+
+    def test_database_error_is_retried_instead_of_answered(self):
+        self.assertFalse(self._attempt(failures=1))
+        self.inbound.refresh_from_db()
+        self.assertEqual(self.inbound.status, InboundMessage.STATUS_PENDING)
+        self.assertIn('database is locked', self.inbound.last_error)
+        self.assertEqual(self._replies(), [])
+
+        self.assertTrue(self._attempt(failures=0))
+        self.inbound.refresh_from_db()
+        self.assertEqual((self.inbound.status, self.inbound.attempts), (InboundMessage.STATUS_DONE, 2))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(len(self._replies()), 1)
+        self.assertTrue(self._replies()[0].startswith('✅ Recorded'))
+
+    def test_delivery_fails_after_max_attempts(self):
+        for _ in range(2):
+            self.assertFalse(self._attempt(failures=1))
+        self.inbound.refresh_from_db()
+        self.assertEqual(self.inbound.status, InboundMessage.STATUS_FAILED)
+        self.assertFalse(Expense.objects.exists())
+
+
+class MessageLedgerTests(TestCase):
+    def setUp(self):
+        message_ledger._recent_messages.clear()
+
+    def test_completed_message_is_a_duplicate(self):
+        self.assertTrue(message_ledger.claim_message('wamid.a', claimed_by='inbound:1'))
+        message_ledger.complete_message('wamid.a')
+        message_ledger._recent_messages.clear()
+
+        self.assertFalse(message_ledger.claim_message('wamid.a', claimed_by='inbound:1'))
+        self.assertFalse(message_ledger.claim_message('wamid.a', claimed_by='inbound:2'))
+
+    def test_retry_of_same_delivery_takes_over_unfinished_claim(self):
+        # A worker claimed the message and died before processing returned.
+        self.assertTrue(message_ledger.claim_message('wamid.b', claimed_by='inbound:1'))
+        self.assertTrue(message_ledger.claim_message('wamid.b', claimed_by='inbound:1'))
+
+    @override_settings(WHATSAPP_INBOUND_VISIBILITY_TIMEOUT=300)
+    def test_other_delivery_waits_for_lease_to_expire(self):
+        self.assertTrue(message_ledger.claim_message('wamid.c', claimed_by='inbound:1'))
+        self.assertFalse(message_ledger.claim_message('wamid.c', claimed_by='inbound:2'))
+
+        ProcessedMessage.objects.filter(message_id='wamid.c').update(
+            claimed_at=timezone.now() - timedelta(seconds=301),
+        )
+        self.assertTrue(message_ledger.claim_message('wamid.c', claimed_by='inbound:2'))
+
+
+class _GraphStandIn(BaseHTTPRequestHandler):
+    """Local HTTP/1.1 stand-in for the Graph API; replies from ``server.script``."""
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        payload = json.loads(self.rfile.read(length)) if length else None
+        self.server.requests.append((self.command, self.client_address[1]))
+        self.server.payloads.append(payload)
+        status, delay = self.server.script.pop(0) if self.server.script else (200, 0)
+        if delay:
+            time.sleep(delay)
+        body = b'{"messages": [{"id": "wamid.test"}]}'
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client already gave up (read timeout tests).
+            pass
+
+    do_GET = do_POST = _reply
+
+    def log_message(self, *args):
+        pass
+
+
+class GraphStandInMixin:
+    """Point the Graph API settings at a local ``_GraphStandIn`` server."""
+
+    def start_graph_stand_in(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _GraphStandIn)
+        self.server.daemon_threads = True
+        self.server.requests = []
+        self.server.payloads = []
+        self.server.script = []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}'
+
+        overrides = override_settings(
+            WHATSAPP_GRAPH_API_URL=self.url,
+            WHATSAPP_ACCESS_TOKEN='test-token',
+            WHATSAPP_PHONE_NUMBER_ID='1000',
+            WHATSAPP_HTTP_RETRIES=2,
+            WHATSAPP_HTTP_CONNECT_TIMEOUT=1,
+            WHATSAPP_HTTP_TIMEOUT=0.5,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        http_session.reset_session()
+        self.addCleanup(http_session.reset_session)
+
+
+class HttpSessionTests(GraphStandInMixin, SimpleTestCase):
+    def setUp(self):
+        self.start_graph_stand_in()
+
+    def test_service_instances_reuse_one_connection(self):
+        for _ in range(3):
+            service = WhatsAppService()
+            response = service.post_message({'to': '911234567890', 'type': 'text'})
+            self.assertEqual(response.status_code, 200)
+
+        ports = {port for _, port in self.server.requests}
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(len(ports), 1)
+
+    def test_get_is_retried_on_server_error(self):
+        self.server.script = [(503, 0), (200, 0)]
+        response = http_session.get_session().get(self.url, timeout=http_session.get_timeout())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_post_is_not_retried(self):
+        self.server.script = [(503, 0), (200, 0)]
+        response = WhatsAppService().post_message({'to': '911234567890', 'type': 'text'})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_read_timeout_comes_from_settings(self):
+        self.assertEqual(http_session.get_timeout(), (1, 0.5))
+        self.server.script = [(200, 1.5)]
+        with self.assertRaises(requests.exceptions.ReadTimeout):
+            WhatsAppService().post_message({'to': '911234567890', 'type': 'text'})
+
+
+@override_settings(WHATSAPP_OUTBOUND_QUEUE_ENABLED=True)
+class OutboundDispatcherTests(GraphStandInMixin, TestCase):
+    def setUp(self):
+        self.start_graph_stand_in()
+
+    def test_send_now_reports_delivery(self):
+        self.assertTrue(outbound_dispatcher.send_text_message_now('911234567890', 'OTP 1234'))
+
+        outbound = OutboundMessage.objects.get()
+        self.assertEqual(outbound.status, OutboundMessage.STATUS_SENT)
+        self.assertEqual(outbound.provider_message_id, 'wamid.test')
+
+    def test_send_now_reports_failure_and_leaves_retry_queued(self):
+        self.server.script = [(503, 0)]
+        self.assertFalse(outbound_dispatcher.send_text_message_now('911234567890', 'OTP 1234'))
+        self.assertEqual(OutboundMessage.objects.get().status, OutboundMessage.STATUS_PENDING)
+
+    def test_purge_only_removes_old_sent_messages(self):
+        for _ in range(2):
+            outbound_dispatcher.send_text_message_now('911234567890', 'hello')
+        outbound_dispatcher.queue_text_message('911234567890', 'pending')
+        old = OutboundMessage.objects.filter(status=OutboundMessage.STATUS_SENT).first()
+        OutboundMessage.objects.filter(id=old.id).update(sent_at=timezone.now() - timedelta(days=8))
+
+        self.assertEqual(outbound_dispatcher.purge_sent(retention_seconds=7 * 24 * 60 * 60), 1)
+        self.assertEqual(OutboundMessage.objects.count(), 2)
+
+
+@override_settings(PIPELINE_METRICS_FLUSH_INTERVAL=10)
+class PipelineMetricsTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+
+    def test_flushed_counters_are_visible_to_other_processes(self):
+        # Increments made by the inbound worker, already flushed to the shared table
+        PipelineCounter.objects.add({'pipeline.tier.fuzzy': 3})
+        metrics.incr('pipeline.tier.fuzzy')
+        self.assertEqual(metrics.snapshot('pipeline.')['pipeline.tier.fuzzy'], 4)
+
+        metrics.flush()
+        self.assertEqual(PipelineCounter.objects.get(name='pipeline.tier.fuzzy').value, 4)
+        self.assertEqual(metrics.snapshot('pipeline.')['pipeline.tier.fuzzy'], 4)
+
+    @override_settings(PIPELINE_METRICS_FLUSH_INTERVAL=0)
+    def test_disabled_flush_keeps_counters_in_process(self):
+        metrics.incr('pipeline.tier.fuzzy', 2)
+        self.assertEqual(metrics.flush(), 0)
+        self.assertFalse(PipelineCounter.objects.exists())
+        self.assertEqual(metrics.snapshot('pipeline.'), {'pipeline.tier.fuzzy': 2})
+
+
+class GeminiBatcherTests(SimpleTestCase):
+    def test_parse_accepts_array_object_and_wrapped_replies(self):
+        entry = {'id': 1, 'amount': 120, 'category': 'Food', 'description': 'lunch'}
+        for reply in (
+            json.dumps([entry]),
+            '```json\n' + json.dumps([entry]) + '\n```',
+            json.dumps(entry),
+            json.dumps({'items': [entry]}),
+            'Sure! ' + json.dumps(entry),
+        ):
+            with self.subTest(reply=reply):
+                self.assertEqual(gemini_batcher._parse_batch_response(reply), [entry])
+        self.assertEqual(gemini_batcher._parse_batch_response('no json here'), [])
+
+    def test_single_item_batch_accepts_bare_object_without_id(self):
+        reply = SimpleNamespace(text=json.dumps({'amount': 120, 'category': 'Food', 'description': 'lunch'}))
+        with mock.patch.object(gemini_batcher, 'generate_content', return_value=reply):
+            results = gemini_batcher.GeminiBatchModel('key')([{'id': 7, 'text': '120 lunch', 'categories': ['Food']}])
+        self.assertEqual(results, {7: {'amount': 120, 'category': 'Food', 'description': 'lunch'}})
+
+    def test_concurrent_requests_share_one_model_call(self):
+        calls = []
+
+        def fake_model(items):
+            calls.append(len(items))
+            return {item['id']: {'category': item['categories'][0], 'text': item['text']} for item in items}
+
+        batcher = gemini_batcher.MicroBatcher(fake_model, window_ms=200, max_batch=4)
+        futures = []
+        threads = [
+            threading.Thread(target=lambda n=n: futures.append((n, batcher.submit(f'{n} chai', [f'Cat {n}']))))
+            for n in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(calls, [4])
+        for n, future in futures:
+            self.assertEqual(future.result(timeout=1), {'category': f'Cat {n}', 'text': f'{n} chai'})
+
+    def test_model_error_reaches_every_caller(self):
+        def failing_model(items):
+            raise RuntimeError('quota')
+
+        batcher = gemini_batcher.MicroBatcher(failing_model, window_ms=0, max_batch=4)
+        with self.assertRaises(RuntimeError):
+            batcher.categorize('120 chai', ['Food'], timeout=1)
+
+
+@override_settings(EXPENSE_CLASSIFIER_LEARNING_DEFERRED=True)
+class ClassifierLearningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='classifier', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+        cls.travel = Category.objects.create(user=cls.user, name='Travel', icon='🚕')
+        for n in range(6):
+            Expense.objects.create(user=cls.user, category=cls.food, amount=100 + n, description='biryani dinner')
+            Expense.objects.create(user=cls.user, category=cls.travel, amount=200 + n, description='uber ride')
+
+    def setUp(self):
+        if not expense_classifier.available():
+            self.skipTest('numpy is not installed')
+        expense_classifier.reset_models()
+        self.addCleanup(expense_classifier.reset_models)
+        # Flushed explicitly below instead of by the background thread
+        patcher = mock.patch.object(expense_classifier.learning_buffer, '_ensure_thread')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        expense_classifier.learning_buffer.flush()
+
+    def test_first_use_trains_in_background(self):
+        with mock.patch.object(expense_classifier, 'train_user_model', wraps=expense_classifier.train_user_model) as train:
+            self.assertIsNone(expense_classifier.get_user_model(self.user.id))
+            train.assert_not_called()
+
+            expense_classifier.learning_buffer.flush()
+            train.assert_called_once_with(self.user.id)
+
+        model = expense_classifier.get_user_model(self.user.id)
+        self.assertEqual(model.n_examples, 12)
+
+    def test_new_expenses_are_folded_in_one_update(self):
+        expense_classifier.train_user_model(self.user.id)
+        key = ExpenseClassifier.key_for_user(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                Expense.objects.create(user=self.user, category=self.travel, amount=50, description='metro card')
+        self.assertEqual(ExpenseClassifier.objects.get(key=key).n_examples, 12)
+
+        with mock.patch.object(expense_classifier, 'save_model', wraps=expense_classifier.save_model) as save:
+            expense_classifier.learning_buffer.flush()
+        save.assert_called_once()
+        self.assertEqual(ExpenseClassifier.objects.get(key=key).n_examples, 15)
+        self.assertIn('metro', expense_classifier.get_user_model(self.user.id).columns)
+
+
+class CategorizationIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='index', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+
+    def setUp(self):
+        categorization_index.reset_indexes()
+        self.addCleanup(categorization_index.reset_indexes)
+
+    def test_keyword_written_by_another_process_is_seen_on_next_parse(self):
+        # The worker parses and caches the user's index.
+        self.assertEqual(ExpenseParser(self.user).parse('120 food')[0]['category'], self.food)
+
+        # The web process adds a keyword; its signal only reaches its own caches.
+        web_cache = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'web'}}
+        with override_settings(CACHES=web_cache), mock.patch.object(categorization_index, '_indexes', OrderedDict()):
+            CategoryKeyword.objects.create(category=self.food, keyword='biryani')
+
+        # The worker loads the user for the next delivery and parses again.
+        parser = ExpenseParser(User.objects.get(pk=self.user.pk))
+        result = parser.parse('250 biryani')
+        self.assertEqual(parser.last_tier, 'multi_expense')
+        self.assertEqual(result[0]['category'], self.food)
+
+    def test_warm_parse_runs_no_queries(self):
+        ExpenseParser(self.user).parse('120 food')
+        with self.assertNumQueries(0):
+            ExpenseParser(self.user).parse('80 food snacks')
+
+
+class StubGeminiMixin:
+    """Answer Gemini calls with the benchmark's deterministic stub, nothing shared."""
+
+    def start_stub_gemini(self):
+        self.gemini = StubGeminiClient()
+        overrides = override_settings(
+            GEMINI_API_KEY='test',
+            GEMINI_BATCH_ENABLED=False,
+            EXPENSE_KEYWORD_LEARNING_DEFERRED=False,
+            EXPENSE_CLASSIFIER_ENABLED=False,
+            PIPELINE_METRICS_FLUSH_INTERVAL=0,
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'stub'},
+                'gemini': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'stub-gemini'},
+            },
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch.object(gemini_client, 'build_client', return_value=self.gemini)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        for reset in (
+            categorization_index.reset_indexes,
+            global_keywords.reset_table,
+            gemini_cache.clear_local,
+            gemini_client.reset_clients,
+            gemini_client.gemini_breaker.reset,
+            metrics.reset,
+        ):
+            reset()
+            self.addCleanup(reset)
+
+
+class CategorizationPipelineTests(StubGeminiMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='pipeline', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+        cls.travel = Category.objects.create(user=cls.user, name='Travel', icon='🚕')
+        cls.other = Category.objects.create(user=cls.user, name='Other', icon='📦')
+
+    def setUp(self):
+        self.start_stub_gemini()
+
+    def test_tier_is_recorded_and_counted(self):
+        for text, tier in (('120 food', 'multi_expense'), ('80 travel', 'exact'), ('250 thali', 'gemini')):
+            with self.subTest(text=text):
+                outcome = CategorizationPipeline(self.user).run(text)
+                self.assertEqual(outcome.tier, tier)
+
+        # Gemini's answer was learned as a keyword, so the repeat stays local.
+        outcome = CategorizationPipeline(self.user).run('250 thali')
+        self.assertEqual(outcome.tier, 'multi_expense')
+        self.assertEqual(outcome.result[0]['category'], self.food)
+        self.assertEqual(self.gemini.calls, 1)
+        self.assertEqual(
+            metrics.snapshot('pipeline.tier.'),
+            {'pipeline.tier.multi_expense': 2, 'pipeline.tier.exact': 1, 'pipeline.tier.gemini': 1},
+        )
+
+    def test_max_llm_calls_caps_gemini_requests(self):
+        # Unparseable replies make the parser retry with a second prompt.
+        self.gemini.generate_content = mock.Mock(return_value=SimpleNamespace(text='not json'))
+
+        outcome = CategorizationPipeline(self.user, max_llm_calls=1).run('250 thali')
+        self.assertEqual(self.gemini.generate_content.call_count, 1)
+        self.assertEqual((outcome.llm_calls, outcome.skipped_llm_calls), (1, 1))
+        self.assertFalse(outcome.ok)
+
+        outcome = CategorizationPipeline(self.user, max_llm_calls=0).run('300 momos')
+        self.assertEqual(self.gemini.generate_content.call_count, 1)
+        self.assertEqual((outcome.llm_calls, outcome.skipped_llm_calls), (0, 1))
+
+    def test_max_latency_stops_new_gemini_requests(self):
+        outcome = CategorizationPipeline(self.user, max_latency_ms=0).run('250 thali')
+        self.assertEqual(self.gemini.calls, 0)
+        self.assertEqual((outcome.llm_calls, outcome.skipped_llm_calls), (0, 1))
+        self.assertNotEqual(outcome.tier, 'gemini')
+
+    def test_dry_run_writes_nothing_and_never_calls_gemini(self):
+        CategorizationPipeline(self.user).run('120 food')  # warm the index
+        with CaptureQueriesContext(connection) as queries:
+            for text in ('250 thali', 'spent 300 on momos today', '120 food'):
+                CategorizationPipeline(self.user, dry_run=True).run(text)
+
+        self.assertEqual(self.gemini.calls, 0)
+        writes = [q['sql'] for q in queries if not q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertEqual(writes, [])
+        self.assertFalse(CategoryKeyword.objects.exists())
+        self.assertEqual(metrics.snapshot('pipeline.skipped_llm_calls'), {'pipeline.skipped_llm_calls': 2})
+
+
+class FuzzyTierTests(StubGeminiMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='fuzzy', password='secret')
+        cls.groceries = Category.objects.create(user=cls.user, name='Groceries', icon='🛒')
+        cls.travel = Category.objects.create(user=cls.user, name='Travel', icon='🚕')
+        cls.other = Category.objects.create(user=cls.user, name='Other', icon='📦')
+
+    def setUp(self):
+        self.start_stub_gemini()
+
+    def _parse(self, text):
+        parser = ExpenseParser(self.user)
+        return parser.parse(text), parser.last_tier
+
+    def test_misspelled_category_name(self):
+        result, tier = self._parse('450 grocries')
+        self.assertEqual((tier, result['category']), ('fuzzy', self.groceries))
+        self.assertEqual(
+            metrics.snapshot('parser.fuzzy.'),
+            {'parser.fuzzy.lookups': 1, 'parser.fuzzy.hits': 1},
+        )
+
+    def test_misspelled_builtin_keyword_without_a_learned_keyword(self):
+        # No Fuel category and no learned "petrol": the built-in word maps through the fuel fallback
+        result, tier = self._parse('120 petorl')
+        self.assertEqual((tier, result['category']), ('fuzzy', self.travel))
+        self.assertEqual(self.gemini.calls, 0)
+
+    def test_word_below_threshold_misses(self):
+        result, tier = self._parse('450 grocry')
+        self.assertNotEqual(tier, 'fuzzy')
+        self.assertEqual(self.gemini.calls, 1)
+        self.assertEqual(
+            metrics.snapshot('parser.fuzzy.'),
+            {'parser.fuzzy.lookups': 1, 'parser.fuzzy.misses': 1},
+        )
+
+
+class KeywordAutomatonTests(SimpleTestCase):
+    def setUp(self):
+        self.automaton = KeywordAutomaton({
+            'gas': 'Fuel',
+            'gas bill': 'Bills',
+            'bill': 'Other',
+            'bill payment': 'Bills',
+            'swiggy': 'Food',
+            'new york pizza': 'Food',
+            'york pizza': 'Other',
+        })
+
+    def _find(self, text):
+        tokens = text.split()
+        return [(' '.join(tokens[start:end]), value) for start, end, value in self.automaton.find_longest(tokens)]
+
+    def test_reports_every_overlapping_match(self):
+        matches = sorted(self.automaton.iter_matches('gas bill payment'.split()))
+        self.assertEqual(matches, [(0, 1, 'Fuel'), (0, 2, 'Bills'), (1, 2, 'Other'), (1, 3, 'Bills')])
+
+    def test_prefers_leftmost_longest_without_overlap(self):
+        self.assertEqual(self._find('500 gas bill 200 swiggy'), [('gas bill', 'Bills'), ('swiggy', 'Food')])
+        self.assertEqual(self._find('gas bill payment'), [('gas bill', 'Bills')])
+        self.assertEqual(self._find('paid bill payment'), [('bill payment', 'Bills')])
+
+    def test_follows_failure_links_into_shorter_phrases(self):
+        self.assertEqual(self._find('old york pizza'), [('york pizza', 'Other')])
+        self.assertEqual(self._find('new new york pizza'), [('new york pizza', 'Food')])
+
+    def test_matches_whole_words_only(self):
+        self.assertEqual(self._find('gasoline billing swiggyone'), [])
+        self.assertEqual(self._find('gas'), [('gas', 'Fuel')])
+
+
+class MultiExpenseParserTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='multi', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+        cls.bills = Category.objects.create(user=cls.user, name='Bills', icon='🧾')
+        CategoryKeyword.objects.create(category=cls.bills, keyword='gas bill')
+
+    def setUp(self):
+        categorization_index.reset_indexes()
+        self.addCleanup(categorization_index.reset_indexes)
+
+    def test_multi_word_keyword_and_builtin_keyword(self):
+        parser = ExpenseParser(self.user)
+        result = parser.parse('500 gas bill 200 swiggy')
+
+        self.assertEqual(parser.last_tier, 'multi_expense')
+        self.assertEqual(
+            [(item['amount'], item['category'], item['description']) for item in result],
+            [(500, self.bills, 'gas bill'), (200, self.food, 'swiggy')],
+        )
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@override_settings(PIPELINE_METRICS_FLUSH_INTERVAL=0)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        self.clock = FakeClock()
+        patcher = mock.patch.object(circuit_breaker, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = circuit_breaker.CircuitBreaker('test', base_cooldown=30, max_cooldown=100)
+
+    def test_closed_open_half_open_closed(self):
+        self.assertEqual(self.breaker.state, circuit_breaker.STATE_CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure(Exception('429 RESOURCE_EXHAUSTED. Please retry in 5s.'))
+        self.assertEqual(self.breaker.state, circuit_breaker.STATE_OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(self.breaker.retry_after(), 5)
+
+        self.clock.advance(4.9)
+        self.assertFalse(self.breaker.allow())
+        self.clock.advance(0.1)
+        self.assertEqual(self.breaker.state, circuit_breaker.STATE_HALF_OPEN)
+
+        # Exactly one probe goes out
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, circuit_breaker.STATE_CLOSED)
+        self.assertTrue(self.breaker.allow())
+
+    def test_only_quota_errors_trip_the_breaker(self):
+        for _ in range(5):
+            self.breaker.record_failure(Exception('500 Internal error'))
+        self.assertEqual(self.breaker.state, circuit_breaker.STATE_CLOSED)
+
+        self.breaker.record_failure(SimpleNamespace(code=429))
+        self.assertEqual(self.breaker.state, circuit_breaker.STATE_OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertEqual(
+            metrics.snapshot('test.breaker.'),
+            {'test.breaker.opened': 1, 'test.breaker.rejected': 1},
+        )
+
+    def test_cooldown_doubles_on_failed_probes_up_to_the_maximum(self):
+        cooldowns = []
+        for _ in range(4):
+            self.breaker.record_failure(Exception('429 quota exceeded'))
+            cooldowns.append(self.breaker.retry_after())
+            self.clock.advance(cooldowns[-1])
+            self.assertTrue(self.breaker.allow())
+        self.assertEqual(cooldowns, [30, 60, 100, 100])
+
+        self.breaker.record_success()
+        self.breaker.record_failure(Exception('429 quota exceeded'))
+        self.assertEqual(self.breaker.retry_after(), 30)
+
+    def test_daily_quota_waits_the_maximum_cooldown(self):
+        self.breaker.record_failure(Exception('429 GenerateRequestsPerDayPerProjectPerModel quota exceeded'))
+        self.assertEqual(self.breaker.retry_after(), 100)
+
+    def test_non_quota_error_on_probe_closes_the_breaker(self):
+        self.breaker.record_failure(Exception('429 quota exceeded'))
+        self.clock.advance(30)
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure(Exception('503 Service unavailable'))
+        self.assertEqual(self.breaker.state, circuit_breaker.STATE_CLOSED)
+
+
+class MultiExpenseRecordingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='bulk', password='secret')
+        cls.food = Category.objects.create(user=cls.user, name='Food', icon='🍔')
+        cls.travel = Category.objects.create(user=cls.user, name='Travel', icon='🚕')
+        # Today's rollup rows already exist, so each category costs one UPDATE
+        for category in (cls.food, cls.travel):
+            Expense.objects.create(user=cls.user, category=category, amount=10, description='earlier')
+
+    def setUp(self):
+        categorization_index.reset_indexes()
+        self.addCleanup(categorization_index.reset_indexes)
+        ExpenseParser(self.user).parse('1 food')  # warm the index
+
+    def test_three_items_are_inserted_in_one_statement(self):
+        with CaptureQueriesContext(connection) as queries:
+            reply = process_user_message(self.user, '120 food 60 uber 40 swiggy')
+
+        inserts = [q['sql'] for q in queries if q['sql'].startswith('INSERT INTO "expenses"')]
+        self.assertEqual(len(inserts), 1)
+        # Savepoint, the insert, one rollup update per category, release
+        self.assertEqual(len(queries), 5)
+
+        self.assertEqual(
+            reply,
+            '✅ Recorded 3 expenses:\n'
+            '• ₹120 - 🍔 Food (food)\n'
+            '• ₹60 - 🚕 Travel (uber)\n'
+            '• ₹40 - 🍔 Food (swiggy)\n'
+            '\n'
+            '💰 Total: ₹220.00',
+        )
+        totals = dict(DailySpend.objects.filter(user=self.user).values_list('category_id', 'total'))
+        self.assertEqual(totals, {self.food.id: 170, self.travel.id: 70})
+
+    def test_rollup_failure_rolls_back_the_insert(self):
+        with mock.patch.object(DailySpend.objects, 'apply', side_effect=RuntimeError('rollup down')):
+            with self.assertRaises(RuntimeError):
+                process_user_message(self.user, '120 food 60 uber 40 swiggy')
+
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 2)
+        self.assertEqual(rollups.find_drift(), [])
+
+
+class ReadReceiptTests(GraphStandInMixin, SimpleTestCase):
+    def setUp(self):
+        self.start_graph_stand_in()
+
+    def _read_ids(self):
+        return sorted(payload['message_id'] for payload in self.server.payloads if payload.get('status') == 'read')
+
+    def test_receipts_within_the_window_collapse_to_one_call_per_conversation(self):
+        coalescer = ReadReceiptCoalescer(flush_interval=0.3)
+        for n in range(5):
+            coalescer.mark_read('911111111111', f'wamid.a{n}', timestamp=1000 + n)
+        # An older message delivered late does not replace the newest one
+        coalescer.mark_read('911111111111', 'wamid.late', timestamp=999)
+        coalescer.mark_read('922222222222', 'wamid.b0', timestamp=1000)
+
+        deadline = time.monotonic() + 5
+        while len(self.server.requests) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        time.sleep(0.1)
+
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self._read_ids(), ['wamid.a4', 'wamid.b0'])
+
+    def test_pending_receipts_are_sent_when_the_process_exits(self):
+        script = (
+            'import django; django.setup()\n'
+            'from whatsapp_integration.read_receipts import read_receipts\n'
+            "read_receipts.mark_read('911111111111', 'wamid.exit', 1000)\n"
+        )
+        env = dict(
+            os.environ,
+            DJANGO_SETTINGS_MODULE='expense_tracker.settings',
+            WHATSAPP_GRAPH_API_URL=self.url,
+            WHATSAPP_ACCESS_TOKEN='test-token',
+            WHATSAPP_PHONE_NUMBER_ID='1000',
+            # Far longer than the process lives: only the exit hook can send it
+            WHATSAPP_READ_RECEIPT_FLUSH_INTERVAL='3600',
+        )
+        subprocess.run(
+            [sys.executable, '-c', script],
+            cwd=settings.BASE_DIR,
+            env=env,
+            check=True,
+            timeout=60,
+            capture_output=True,
+        )
+
+        self.assertEqual(self._read_ids(), ['wamid.exit'])
+
+
+@override_settings(
+    GEMINI_CACHE_ENABLED=True,
+    PIPELINE_METRICS_FLUSH_INTERVAL=0,
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'single-flight'},
+        'gemini': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'single-flight-gemini'},
+    },
+)
+class GeminiSingleFlightTests(SimpleTestCase):
+    def setUp(self):
+        gemini_cache.clear_local()
+        self.addCleanup(gemini_cache.clear_local)
+        self.key = gemini_cache.make_key('tier3', 'chai', ['Food'])
+        self.release = threading.Event()
+        self.calls = []
+
+    def _compute(self, result):
+        def compute():
+            self.calls.append(threading.current_thread().name)
+            self.release.wait(5)
+            return result
+        return compute
+
+    def _start(self, count, compute):
+        results = []
+
+        def call():
+            try:
+                results.append(gemini_cache.get_or_compute(self.key, compute))
+            except Exception as e:
+                results.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, results
+
+    def _wait_for_callers(self, count):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            flight = gemini_cache._inflight.get(self.key)
+            if flight and flight.callers == count:
+                return
+            time.sleep(0.01)
+        self.fail(f'expected {count} callers in flight')
+
+    def test_uncached_result_is_computed_once_for_every_waiter(self):
+        threads, results = self._start(4, self._compute(None))
+        self._wait_for_callers(4)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results, [None] * 4)
+        self.assertNotIn(self.key, gemini_cache._inflight)
+
+    def test_late_caller_joins_the_flight(self):
+        threads, results = self._start(2, self._compute(None))
+        self._wait_for_callers(2)
+
+        # Arrives while the first computation is still running.
+        late, late_results = self._start(1, self._compute({'category': 'Food'}))
+        self._wait_for_callers(3)
+        self.release.set()
+        for thread in threads + late:
+            thread.join(5)
+
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(results + late_results, [None] * 3)
+
+    def test_waiter_retries_after_a_failed_computation(self):
+        def failing():
+            self.calls.append('failed')
+            self.release.wait(5)
+            raise RuntimeError('quota')
+
+        failed, errors = self._start(1, failing)
+        self._wait_for_callers(1)
+        threads, results = self._start(1, self._compute({'category': 'Food'}))
+        self._wait_for_callers(2)
+        self.release.set()
+        for thread in failed + threads:
+            thread.join(5)
+
+        self.assertEqual(len(self.calls), 2)
+        self.assertIsInstance(errors[0], RuntimeError)
+        self.assertEqual(results, [{'category': 'Food'}])
+        self.assertEqual(gemini_cache.lookup(self.key), {'category': 'Food'})
@@ -6,4 +6,5 @@ app_name = 'whatsapp_integration'
 urlpatterns = [
     path('webhook/', views.whatsapp_webhook, name='webhook'),
     path('test/', views.webhook_test, name='test'),  # Test endpoint to verify routing
+    path('metrics/', views.pipeline_metrics, name='metrics'),
 ]
@@ -2,17 +2,25 @@ import json
 import logging
 
 from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import DatabaseError, transaction
 from django.http import HttpResponse, JsonResponse
-from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from expenses.models import Category, Expense
-from users.services import get_or_create_whatsapp_user
+from dashboard import snapshots as dashboard_snapshots
+from expenses.models import Expense
+from expenses.services import bulk_record_expenses
+from users.services import get_or_create_whatsapp_user, get_or_create_whatsapp_users, normalize_whatsapp_number
 
+from . import metrics
 from .exceptions import AICategoriaztionException, AmountNotFoundException, OCRException
-from .ai_categorization_service import categorize_with_ai
-from .expense_handler import ExpenseParser, StatementGenerator, handle_login_command
+from .categorization_pipeline import CategorizationPipeline
+from .expense_handler import StatementGenerator, handle_login_command
+from .inbound_queue import enqueue_payload
+from .message_ledger import claim_message, complete_message
+from .outbound_dispatcher import queue_text_message
+from .read_receipts import read_receipts
 from .receipt_processor import process_receipt
 from .whatsapp_service import WhatsAppService
 
@@ -50,6 +58,12 @@ def webhook_test(request):
     return HttpResponse('Webhook test OK')
 
 
+@staff_member_required
+def pipeline_metrics(request):
+    """Pipeline counters (fuzzy hit rate, Gemini calls, ...) summed across web and worker processes."""
+    return JsonResponse({**metrics.snapshot(), **dashboard_snapshots.stats()})
+
+
 @csrf_exempt
 @require_http_methods(['GET', 'POST'])
 def whatsapp_webhook(request):
@@ -81,54 +95,109 @@ def verify_webhook(request):
 def handle_webhook(request):
     try:
         data = json.loads(request.body)
+    except json.JSONDecodeError:
+        logger.error('Invalid JSON payload')
+        return HttpResponse(status=200)
 
-        entry = data.get('entry', [])
-        if not entry:
+    try:
+        if not getattr(settings, 'WHATSAPP_INBOUND_QUEUE_ENABLED', True):
+            process_webhook_payload(data)
             return HttpResponse(status=200)
 
-        changes = entry[0].get('changes', [])
-        if not changes:
-            return HttpResponse(status=200)
+        # Sent/delivered/read status callbacks far outnumber real messages and
+        # the worker would only discard them, so they are never queued.
+        if has_messages(data):
+            inbound = enqueue_payload(data)
+            logger.info('Queued webhook delivery as inbound message %s', inbound.id)
+        return HttpResponse(status=200)
 
-        value = changes[0].get('value', {})
+    except Exception:
+        logger.exception('Unhandled webhook error')
+        return HttpResponse(status=200)
 
-        if 'messages' not in value:
-            return HttpResponse(status=200)
 
-        messages = value.get('messages', [])
-        if not messages:
-            return HttpResponse(status=200)
+SUPPORTED_MESSAGE_TYPES = ('text', 'image')
 
-        message = messages[0]
+
+def iter_webhook_messages(data):
+    """Yield every message in a delivery, across all entries and changes."""
+    for entry in data.get('entry') or []:
+        for change in entry.get('changes') or []:
+            value = change.get('value') or {}
+
+            statuses = value.get('statuses') or []
+            if statuses:
+                logger.info('Skipping %d status update(s)', len(statuses))
+
+            for message in value.get('messages') or []:
+                yield message
+
+
+def has_messages(data):
+    """True when a delivery carries at least one message (not just status updates)."""
+    return any(
+        (change.get('value') or {}).get('messages')
+        for entry in data.get('entry') or []
+        for change in entry.get('changes') or []
+    )
+
+
+def process_webhook_payload(data, claimed_by=''):
+    """
+    Process every new message in a delivery.
+
+    ``claimed_by`` identifies this delivery in the processed-message ledger so a
+    retry of the same delivery can take over the claims of an attempt that died.
+    """
+    messages_by_sender = {}
+
+    for message in iter_webhook_messages(data):
         message_type = message.get('type')
-        
-        # Allow text and image messages; ignore other types
-        if message_type == 'text':
-            message_text = message.get('text', {}).get('body', '').strip()
-            if not message_text:
-                return HttpResponse(status=200)
-            logger.info('Processing text message: %s', message_text)
-            process_message(message)
-            return HttpResponse(status=200)
-        
-        elif message_type == 'image':
-            logger.info('Processing image message')
-            process_message(message)
-            return HttpResponse(status=200)
-        
-        # Silently ignore other message types (audio, video, document, etc.)
-        logger.info('Ignoring unsupported message type: %s', message_type)
-        return HttpResponse(status=200)
 
-    except json.JSONDecodeError:
-        logger.error('Invalid JSON payload')
-        return HttpResponse(status=200)
+        # Allow text and image messages; ignore audio, video, document, etc.
+        if message_type not in SUPPORTED_MESSAGE_TYPES:
+            logger.info('Ignoring unsupported message type: %s', message_type)
+            continue
+
+        if message_type == 'text' and not message.get('text', {}).get('body', '').strip():
+            continue
+
+        if not message.get('from'):
+            continue
+
+        if not claim_message(message.get('id'), claimed_by=claimed_by):
+            logger.info('Skipping duplicate delivery of message %s', message.get('id'))
+            continue
+
+        messages_by_sender.setdefault(message['from'], []).append(message)
+
+    if not messages_by_sender:
+        return
+
+    process_message_batch(messages_by_sender)
+
+
+def process_message_batch(messages_by_sender):
+    """Process grouped messages, resolving every sender's user in one go."""
+    total = sum(len(messages) for messages in messages_by_sender.values())
+    logger.info('Processing %d message(s) from %d sender(s)', total, len(messages_by_sender))
+
+    try:
+        users = get_or_create_whatsapp_users(messages_by_sender.keys())
     except Exception:
-        logger.exception('Unhandled webhook error')
-        return HttpResponse(status=200)
+        logger.exception('Failed resolving users for webhook batch')
+        users = {}
 
+    for from_number, messages in messages_by_sender.items():
+        user, was_created = users.get(normalize_whatsapp_number(from_number), (None, False))
+        for message in messages:
+            process_message(message, user=user, was_created=was_created)
+            complete_message(message.get('id'))
+            # Only the first message from a new sender triggers the welcome text.
+            was_created = False
 
-def process_message(message):
+
+def process_message(message, user=None, was_created=False):
     message_type = message.get('type')
     from_number = message.get('from')
     message_id = message.get('id')
@@ -138,9 +207,10 @@ def process_message(message):
     whatsapp_service = WhatsAppService()
 
     try:
-        user, was_created = get_or_create_whatsapp_user(from_number)
+        if user is None:
+            user, was_created = get_or_create_whatsapp_user(from_number)
         if was_created:
-            whatsapp_service.send_message(from_number, get_welcome_message())
+            queue_text_message(from_number, get_welcome_message())
 
         if message_type == 'text':
             text = message.get('text', {}).get('body', '').strip()
@@ -148,14 +218,17 @@ def process_message(message):
                 return
 
             logger.info('Message text: %s', text)
-            response_text = process_user_message(user, text)
-            whatsapp_service.send_message(from_number, with_techspark_footer(response_text))
+            # The expenses and the reply commit together, so a retried delivery
+            # never records the message twice.
+            with transaction.atomic():
+                response_text = process_user_message(user, text)
+                queue_text_message(from_number, with_techspark_footer(response_text))
             return
 
         if message_type == 'image':
             image_id = message.get('image', {}).get('id')
             if not image_id:
-                whatsapp_service.send_message(
+                queue_text_message(
                     from_number,
                     with_techspark_footer('❌ Receipt image is missing media details.')
                 )
@@ -163,7 +236,7 @@ def process_message(message):
 
             image_path = whatsapp_service.download_media(image_id)
             if not image_path:
-                whatsapp_service.send_message(
+                queue_text_message(
                     from_number,
                     with_techspark_footer('❌ Could not download receipt image.')
                 )
@@ -172,7 +245,7 @@ def process_message(message):
             try:
                 expense = process_receipt(image_path, user)
 
-                whatsapp_service.send_message(
+                queue_text_message(
                     from_number,
                     with_techspark_footer(
                         "✅ Receipt scanned!\n"
@@ -181,9 +254,11 @@ def process_message(message):
                         f"📝 {expense.description}"
                     )
                 )
+            except DatabaseError:
+                raise
             except Exception:
                 logger.exception('Failed processing receipt with Gemini image parser')
-                whatsapp_service.send_message(
+                queue_text_message(
                     from_number,
                     with_techspark_footer(
                         "📷 Couldn't read this receipt clearly.\n"
@@ -194,15 +269,19 @@ def process_message(message):
 
         logger.info('Ignoring unsupported message type: %s', message_type)
 
+    except DatabaseError:
+        # Infrastructure failure: let the inbound queue retry the delivery
+        # rather than apologising for a message that would succeed later.
+        raise
     except Exception:
         logger.exception('Error processing message')
-        whatsapp_service.send_message(
+        queue_text_message(
             from_number,
             with_techspark_footer('❌ Unable to process your message right now.')
         )
     finally:
         if message_id:
-            whatsapp_service.mark_message_read(message_id)
+            read_receipts.mark_read(from_number, message_id, message.get('timestamp'))
 
 
 def process_user_message(user, text):
@@ -233,24 +312,13 @@ def process_user_message(user, text):
     if text_lower == 'categories':
         return get_categories_message(user)
 
-    parser = ExpenseParser(user)
-    result = parser.parse(text)
+    result = CategorizationPipeline(user).run(text).result
 
     if not result:
         return get_help_message()
 
     if isinstance(result, list):
-        created_expenses = []
-        for item in result:
-            expense = Expense.objects.create(
-                user=user,
-                category=item['category'],
-                amount=item['amount'],
-                description=item['description'],
-                date=item['date'],
-                source='whatsapp',
-            )
-            created_expenses.append(expense)
+        created_expenses = bulk_record_expenses(user, result)
 
         if not created_expenses:
             return get_help_message()
@@ -263,9 +331,8 @@ def process_user_message(user, text):
             )
 
         lines = []
-        total = 0
+        total = sum(expense.amount for expense in created_expenses)
         for expense in created_expenses:
-            total += float(expense.amount)
             lines.append(
                 f"• {user.currency_symbol}{expense.amount} - {expense.category.icon} {expense.category.name} ({expense.description})"
             )
@@ -277,36 +344,6 @@ def process_user_message(user, text):
         )
 
     if 'error' in result:
-        if result.get('error') == 'category_not_found':
-            category_names = list(
-                Category.objects.filter(user=user, is_active=True).values_list('name', flat=True)
-            )
-            ai_result = categorize_with_ai(text, category_names=category_names)
-
-            ai_amount = ai_result.get('amount')
-            ai_category_name = ai_result.get('category')
-            ai_description = (ai_result.get('description') or '').strip() or text[:120]
-
-            ai_category = Category.objects.filter(
-                user=user,
-                name__iexact=ai_category_name,
-                is_active=True,
-            ).first()
-
-            if ai_category and ai_amount and float(ai_amount) > 0:
-                expense = Expense.objects.create(
-                    user=user,
-                    category=ai_category,
-                    amount=ai_amount,
-                    description=ai_description,
-                    date=timezone.now().date(),
-                    source='whatsapp',
-                )
-                return (
-                    f'✅ Recorded: {user.currency_symbol}{expense.amount} '
-                    f'under {expense.category.icon} {expense.category.name}'
-                )
-
         return f"❌ {result['message']}"
 
     expense = Expense.objects.create(
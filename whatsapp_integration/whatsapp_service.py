@@ -5,6 +5,8 @@ import hmac
 import hashlib
 from django.conf import settings
 
+from .http_session import get_graph_api_url, get_session, get_timeout
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,7 +24,9 @@ class WhatsAppService:
             logger.error("WhatsApp Business API credentials are not configured properly")
         
         # Meta API endpoint
-        self.api_url = f"https://graph.facebook.com/v22.0/{self.phone_number_id}/messages"
+        self.graph_api_url = get_graph_api_url()
+        self.api_url = f"{self.graph_api_url}/{self.phone_number_id}/messages"
+        self.session = get_session()
         self.headers = {
             "Authorization": f"Bearer {self.access_token}",
             "Content-Type": "application/json"
@@ -45,35 +49,74 @@ class WhatsAppService:
         
         return formatted
     
+    def build_text_payload(self, to_number, message):
+        """Build the Graph API payload for a text message, or None for an invalid number"""
+        if message and not message.strip().endswith('— *TechSpark*') and not message.strip().endswith('XpenseDiary by TechSpark'):
+            message = f"{message}\n\n— *TechSpark*"
+
+        # Format phone number
+        to_number = self.format_phone_number(to_number)
+        if not to_number:
+            return None
+
+        return {
+            "messaging_product": "whatsapp",
+            "recipient_type": "individual",
+            "to": to_number,
+            "type": "text",
+            "text": {
+                "body": message
+            }
+        }
+
+    def build_template_payload(self, to_number, template_name, language_code='en', parameters=None):
+        """Build the Graph API payload for a template message, or None for an invalid number"""
+        to_number = self.format_phone_number(to_number)
+        if not to_number:
+            return None
+
+        payload = {
+            "messaging_product": "whatsapp",
+            "to": to_number,
+            "type": "template",
+            "template": {
+                "name": template_name,
+                "language": {
+                    "code": language_code
+                }
+            }
+        }
+
+        # Add parameters if provided
+        if parameters:
+            payload["template"]["parameters"] = {
+                "body": {
+                    "parameters": parameters
+                }
+            }
+
+        return payload
+
+    def post_message(self, payload):
+        """POST a prepared payload to the messages endpoint and return the raw response"""
+        return self.session.post(
+            self.api_url,
+            json=payload,
+            headers=self.headers,
+            timeout=get_timeout()
+        )
+
     def send_message(self, to_number, message):
         """Send a text message to a WhatsApp number using Meta API"""
         try:
-            if message and not message.strip().endswith('— *TechSpark*') and not message.strip().endswith('XpenseDiary by TechSpark'):
-                message = f"{message}\n\n— *TechSpark*"
-
-            # Format phone number
-            to_number = self.format_phone_number(to_number)
-            if not to_number:
+            payload = self.build_text_payload(to_number, message)
+            if not payload:
                 logger.error("Invalid phone number provided")
                 return None
-            
-            payload = {
-                "messaging_product": "whatsapp",
-                "recipient_type": "individual",
-                "to": to_number,
-                "type": "text",
-                "text": {
-                    "body": message
-                }
-            }
+            to_number = payload["to"]
             
             logger.info(f"Sending message to {to_number}...")
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self.headers,
-                timeout=10
-            )
+            response = self.post_message(payload)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -98,38 +141,14 @@ class WhatsAppService:
     def send_template_message(self, to_number, template_name, language_code='en', parameters=None):
         """Send a template message"""
         try:
-            to_number = self.format_phone_number(to_number)
-            if not to_number:
+            payload = self.build_template_payload(to_number, template_name, language_code, parameters)
+            if not payload:
                 logger.error("Invalid phone number provided")
                 return None
-            
-            payload = {
-                "messaging_product": "whatsapp",
-                "to": to_number,
-                "type": "template",
-                "template": {
-                    "name": template_name,
-                    "language": {
-                        "code": language_code
-                    }
-                }
-            }
-            
-            # Add parameters if provided
-            if parameters:
-                payload["template"]["parameters"] = {
-                    "body": {
-                        "parameters": parameters
-                    }
-                }
+            to_number = payload["to"]
             
             logger.info(f"Sending template message to {to_number}: {template_name}")
-            response = requests.post(
-                self.api_url,
-                json=payload,
-                headers=self.headers,
-                timeout=10
-            )
+            response = self.post_message(payload)
             
             if response.status_code == 200:
                 response_data = response.json()
@@ -155,8 +174,8 @@ class WhatsAppService:
             return None
 
         try:
-            media_info_url = f"https://graph.facebook.com/v22.0/{media_id}"
-            info_response = requests.get(media_info_url, headers=self.headers, timeout=10)
+            media_info_url = f"{self.graph_api_url}/{media_id}"
+            info_response = self.session.get(media_info_url, headers=self.headers, timeout=get_timeout())
 
             if info_response.status_code != 200:
                 logger.error("Failed to fetch media info for %s: %s %s", media_id, info_response.status_code, info_response.text)
@@ -170,27 +189,28 @@ class WhatsAppService:
                 logger.error("Media download URL missing for %s", media_id)
                 return None
 
-            download_response = requests.get(download_url, headers=self.headers, timeout=30, stream=True)
-            if download_response.status_code != 200:
-                logger.error("Failed to download media %s: %s %s", media_id, download_response.status_code, download_response.text)
-                return None
+            # Closing the streamed response hands its connection back to the pool.
+            with self.session.get(download_url, headers=self.headers, timeout=get_timeout(30), stream=True) as download_response:
+                if download_response.status_code != 200:
+                    logger.error("Failed to download media %s: %s %s", media_id, download_response.status_code, download_response.text)
+                    return None
 
-            extension_map = {
-                'image/jpeg': '.jpg',
-                'image/jpg': '.jpg',
-                'image/png': '.png',
-                'image/webp': '.webp',
-            }
-            file_extension = extension_map.get(mime_type, '.jpg')
+                extension_map = {
+                    'image/jpeg': '.jpg',
+                    'image/jpg': '.jpg',
+                    'image/png': '.png',
+                    'image/webp': '.webp',
+                }
+                file_extension = extension_map.get(mime_type, '.jpg')
 
-            receipts_dir = Path(settings.MEDIA_ROOT) / 'whatsapp_receipts'
-            receipts_dir.mkdir(parents=True, exist_ok=True)
+                receipts_dir = Path(settings.MEDIA_ROOT) / 'whatsapp_receipts'
+                receipts_dir.mkdir(parents=True, exist_ok=True)
 
-            file_path = receipts_dir / f'{media_id}{file_extension}'
-            with open(file_path, 'wb') as file_handle:
-                for chunk in download_response.iter_content(chunk_size=8192):
-                    if chunk:
-                        file_handle.write(chunk)
+                file_path = receipts_dir / f'{media_id}{file_extension}'
+                with open(file_path, 'wb') as file_handle:
+                    for chunk in download_response.iter_content(chunk_size=8192):
+                        if chunk:
+                            file_handle.write(chunk)
 
             logger.info("Media %s downloaded to %s", media_id, file_path)
             return str(file_path.resolve())
@@ -205,15 +225,13 @@ class WhatsAppService:
     def mark_message_read(self, message_id):
         """Mark a message as read"""
         try:
-            url = f"https://graph.facebook.com/v22.0/{self.phone_number_id}/messages"
-            
             payload = {
                 "messaging_product": "whatsapp",
                 "status": "read",
                 "message_id": message_id
             }
             
-            response = requests.post(url, json=payload, headers=self.headers, timeout=10)
+            response = self.post_message(payload)
             
             if response.status_code == 200:
                 logger.info(f"Message {message_id} marked as read")